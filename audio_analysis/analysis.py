@@ -4,25 +4,167 @@ This module provides the AudioAnalysis class and utility functions for processin
 It includes functionalities for reading audio files, applying filters, changing speed, reversing audio, and saving outputs.
 """
 
-import numpy as np
-from scipy.io import wavfile
-from scipy.fft import rfft, rfftfreq
+from functools import lru_cache
 
-from .plotlib import plot_amplitude_time, plot_amplitude_frequency, plot_spectrogram
+import numpy as np
+from .fft_backend import rfft, irfft, rfftfreq, fft_length, infer_fft_length, as_real, precision_dtype
+from .iir import LOW_PASS_ORDER, sos_filter
+from .instrumentation import span
+from .mixer import Mixer
+from .resample import change_speed
+from .stft import NFFT, Spectrogram, resolve_hop, spectrogram, spectrogram_axes
+from .sweep import MEMORY_BUDGET, band_stop_masks, low_pass_masks, sweep_spectrum
+from .wavio import read_wav, write_wav
 
 class AudioAnalysis:
     """
     AudioAnalysis class for processing audio signals.
     
+    The spectrum and frequency grid are computed the first time they are read and cached on
+    the instance. Assigning new `data` or `rate` invalidates them; modifying `data` in place
+    does not, so assign a new array instead. Spectra are computed over `n_fft` samples, which
+    is the signal length, or the next fast length when padding is enabled in fft_backend;
+    filtered signals are trimmed back to the original length.
+    
+    `precision` selects the working precision (see fft_backend): in 'single' precision spectra
+    are complex64 and every derived signal is float32. The samples read from a file keep their
+    integer type until they are transformed.
+    
+    Multi-channel audio is held as a (frames, channels) array, as read from the file. Every
+    operation works on the time axis 0 for all channels at once, so spectra are (bins, channels)
+    arrays computed in one batched transform over the interleaved samples.
+    
+    With a `cache` (cache.AnalysisCache), a file is decoded once, and its spectrum, filter
+    results and speed changes are stored under the file's content hash and loaded
+    memory-mapped by later analyses; arrays loaded from the cache are read-only.
+    
     Attributes:
         rate (int): Sampling rate of the audio.
-        data (np.ndarray): Audio data.
-        amplitude (np.ndarray): Amplitude spectrum of the audio.
+        data (np.ndarray): Audio data, (frames,) or (frames, channels).
+        amplitude (np.ndarray): Amplitude spectrum of the audio, (bins,) or (bins, channels).
         frequency (np.ndarray): Frequency spectrum of the audio.
+        magnitude (np.ndarray): Magnitude of the amplitude spectrum.
+        n_fft (int): Transform length of the spectrum.
+        precision (str): 'single', 'double', or None to follow the fft_backend real_dtype option.
+        cache (AnalysisCache): Persistent cache of results, or None.
     """
 
-    def __init__(self, path=None, audio_data=None) -> None:
-        self.rate, self.data, self.amplitude, self.frequency = self.read_voice(path=path, audio_data=audio_data)
+    def __init__(self, path=None, audio_data=None, precision=None, cache=None) -> None:
+        self.precision = precision
+        self.cache = cache
+        self._rate = None
+        self._data = None
+        self._content_key = None
+        self._invalidate()
+        rate, data, amplitude, frequency = self.read_voice(path=path, audio_data=audio_data)
+        # Reading through the cache identifies the content; assigning data would forget it
+        content_key = self._content_key
+        self.rate, self.data = rate, data
+        self._content_key = content_key
+        if amplitude is not None:
+            self.amplitude = amplitude
+        if frequency is not None:
+            self.frequency = frequency
+
+    @property
+    def rate(self):
+        return self._rate
+
+    @rate.setter
+    def rate(self, value):
+        self._rate = value
+        self._invalidate()
+
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._content_key = None
+        self._invalidate()
+
+    @property
+    def n_fft(self):
+        if self._n_fft is None:
+            if self._amplitude is not None:
+                self._n_fft = infer_fft_length(len(self._amplitude), len(self._data))
+            else:
+                self._n_fft = fft_length(len(self._data))
+        return self._n_fft
+
+    @property
+    def amplitude(self):
+        if self._amplitude is None:
+            self._amplitude = self._cached('rfft', lambda: rfft(self._data, n=self.n_fft, axis=0, precision=self.precision),
+                                           n_fft=self.n_fft)
+        return self._amplitude
+
+    @amplitude.setter
+    def amplitude(self, value):
+        self._amplitude = value
+        self._magnitude = None
+        self._n_fft = None
+
+    @property
+    def frequency(self):
+        if self._frequency is None:
+            self._frequency = frequency_grid(self.n_fft, self._rate)
+        return self._frequency
+
+    @frequency.setter
+    def frequency(self, value):
+        self._frequency = value
+
+    @property
+    def magnitude(self):
+        if self._magnitude is None:
+            self._magnitude = np.abs(self.amplitude)
+        return self._magnitude
+
+    def _invalidate(self):
+        self._n_fft = None
+        self._amplitude = None
+        self._frequency = None
+        self._magnitude = None
+        self._spectrograms = {}
+
+    def spectrogram(self, nfft=NFFT, hop=None, window='hann', max_columns=None):
+        """
+        Spectrogram of the audio, computed once per set of parameters and shared by every caller.
+        
+        Args:
+            nfft (int): Length of each segment.
+            hop (int): Hop between segments; defaults to nfft / 2.
+            window (str): Window name.
+            max_columns (int): Largest number of segments; the hop grows to respect it.
+        
+        Returns:
+            stft.Spectrogram: power (frequencies x segments), frequencies, segment centre times
+        """
+        hop = resolve_hop(len(self._data), nfft, hop, max_columns)
+        key = (nfft, hop, window)
+        if key not in self._spectrograms:
+            def compute():
+                return spectrogram(self._data, self._rate, nfft=nfft, hop=hop, window=window,
+                                   precision=self.precision).power
+            # detrend='none' in the key keeps entries cached by the old, detrending spectrogram from being reused
+            power = self._cached('stft', compute, nfft=nfft, hop=hop, window=window, rate=int(self._rate),
+                                 detrend='none')
+            self._spectrograms[key] = Spectrogram(power, *spectrogram_axes(len(self._data), self._rate, nfft, hop))
+        return self._spectrograms[key]
+
+    def _result_key(self, operation, **params):
+        if self.cache is None or self._content_key is None:
+            return None
+        return self.cache.key(self._content_key, operation, precision=precision_dtype(self.precision).name, **params)
+
+    def _cached(self, operation, compute, **params):
+        key = self._result_key(operation, **params)
+        if key is None:
+            return compute()
+        return self.cache.get_or_compute(key, compute)
 
     def read_voice(self, path, audio_data):
         """
@@ -30,37 +172,81 @@ class AudioAnalysis:
         
         Args:
             path (str): Path to the audio file.
-            audio_data (dict): Dictionary containing rate, data, amplitude, and frequency.
+            audio_data (dict): Dictionary containing rate and data, and optionally amplitude and frequency.
         
         Returns:
-            tuple: rate, data, amplitude, frequency
+            tuple: rate, data, amplitude, frequency (amplitude and frequency are None when
+                they have not been computed yet)
         """
         if path:
-            rate, data = wavfile.read(path)
-            amplitude = rfft(data)
-            frequency = rfftfreq(len(data), 1 / rate)
-            return rate, data, amplitude, frequency
+            with span('read', path=str(path)) as stage:
+                if self.cache is not None:
+                    rate, data, self._content_key = self.cache.read(path)
+                else:
+                    rate, data = read_wav(path)
+                stage.arrays(data=data)
+            return rate, data, None, None
         if audio_data:
-            return audio_data['rate'], audio_data['data'], audio_data['amplitude'], audio_data['frequency']
+            return audio_data['rate'], audio_data['data'], audio_data.get('amplitude'), audio_data.get('frequency')
+
+    def with_speed(self, speed_factor, method='polyphase'):
+        """
+        Create the analysis of the audio played at a different speed.
+        
+        The returned analysis keeps the original sampling rate; its spectrum is only
+        computed if it is read.
+        
+        Args:
+            speed_factor (float): Factor by which to change the speed.
+            method (str): Resampling method, see resample.change_speed.
+        
+        Returns:
+            AudioAnalysis: Analysis of the speed-changed audio.
+        """
+        def compute():
+            data = self.data if method != 'polyphase' else as_real(self.data, self.precision)
+            return change_speed(data, speed_factor, method)
+
+        with span('change_speed', speed_factor=speed_factor, method=method) as stage:
+            data = self._cached('speed', compute, speed_factor=speed_factor, method=method)
+            stage.arrays(data=data)
+        changed = AudioAnalysis(audio_data={'rate': self.rate, 'data': data}, precision=self.precision, cache=self.cache)
+        changed._content_key = self._result_key('speed', speed_factor=speed_factor, method=method)
+        return changed
 
-    def change_speed(self, speed_factor):
+    def reversed(self):
+        """
+        Create the analysis of the reversed audio.
+        
+        Reversing a real signal does not change its magnitude spectrum, so an already
+        computed magnitude is shared instead of being transformed again.
+        
+        Returns:
+            AudioAnalysis: Analysis of the reversed audio.
+        """
+        reversed_audio = AudioAnalysis(audio_data={'rate': self.rate, 'data': self.data[::-1]}, precision=self.precision,
+                                       cache=self.cache)
+        reversed_audio._content_key = self._result_key('reversed')
+        if self._magnitude is not None or self._amplitude is not None:
+            reversed_audio._magnitude = self.magnitude
+        reversed_audio._frequency = self._frequency
+        return reversed_audio
+
+    def change_speed(self, speed_factor, method='polyphase'):
         """
         Change the speed of the audio.
         
         Args:
             speed_factor (float): Factor by which to change the speed.
+            method (str): 'polyphase' (default) for filtered resampling, 'decimate' for the
+                fast integer path or 'nearest' for nearest-sample picking.
         
         Returns:
             tuple: changed_data, new_amplitude, new_frequency, new_rate
         """
-        indices = np.round(np.arange(0, len(self.data), speed_factor)).astype(int)
-        indices = indices[indices < len(self.data)]
-        changed_data = self.data[indices]
-
-        new_amplitude = np.abs(rfft(changed_data))
-        new_frequency = rfftfreq(len(changed_data), 1 / self.rate)
+        changed = self.with_speed(speed_factor, method)
         new_rate = int(self.rate / speed_factor)
-        return changed_data, new_amplitude, new_frequency, new_rate
+        return changed.data, changed.magnitude, changed.frequency, new_rate
 
     def reverse_voice(self):
         """
@@ -69,9 +255,8 @@ class AudioAnalysis:
         Returns:
             tuple: new_data, new_amplitude
         """
-        new_data = self.data[::-1]
-        new_amplitude = np.abs(rfft(new_data))
-        return new_data, new_amplitude
+        reversed_audio = self.reversed()
+        return reversed_audio.data, reversed_audio.magnitude
 
     def low_pass_filter(self, cutoff_freq):
         """
@@ -83,8 +268,15 @@ class AudioAnalysis:
         Returns:
             np.ndarray: Filtered amplitude
         """
-        filtered_amplitude = np.where(self.frequency > cutoff_freq, 0, self.amplitude)
-        return filtered_amplitude
+        def compute():
+            amplitude = self.amplitude
+            with span('mask', kind='low_pass') as stage:
+                mask = along_frames(low_pass_mask(self.frequency, cutoff_freq), amplitude.ndim)
+                filtered_amplitude = np.where(mask, 0, amplitude)
+                stage.arrays(amplitude=filtered_amplitude)
+            return filtered_amplitude
+
+        return self._cached('low_pass', compute, cutoff_freq=float(cutoff_freq), rate=int(self.rate), n_fft=self.n_fft)
 
     def band_stop_filter(self, band_freq, band_width):
         """
@@ -97,16 +289,15 @@ class AudioAnalysis:
         Returns:
             tuple: filtered_amplitude, filtered_data
         """
-        low_cutoff = band_freq - band_width / 2
-        high_cutoff = band_freq + band_width / 2
-        filtered_amplitude = np.where((self.frequency >= low_cutoff) & (self.frequency <= high_cutoff), 0, self.amplitude)
-        filtered_data = np.fft.irfft(filtered_amplitude)
-        return filtered_amplitude, filtered_data
+        return self.apply_filter_bank(get_filter_bank([band_freq], [band_width]))
 
     def multi_band_stop_filter(self, band_freqs: list, band_widths: list):
         """
         Apply multiple band-stop filters to the audio data.
         
+        The bands are compiled into a BandStopFilterBank that is cached and reused for
+        identical band lists.
+        
         Args:
             band_freqs (list): List of central frequencies for the stop bands.
             band_widths (list): List of widths for the stop bands.
@@ -114,59 +305,307 @@ class AudioAnalysis:
         Returns:
             tuple: filtered_amplitude, filtered_data
         """
-        filtered_amplitude = self.amplitude.copy()
-        for band_freq, band_width in zip(band_freqs, band_widths):
-            low_cutoff = band_freq - band_width / 2
-            high_cutoff = band_freq + band_width / 2
-            band_mask = (self.frequency >= low_cutoff) & (self.frequency <= high_cutoff)
-            filtered_amplitude[band_mask] = 0
-        filtered_data = np.fft.irfft(filtered_amplitude)
+        return self.apply_filter_bank(get_filter_bank(band_freqs, band_widths))
+
+    def apply_filter_bank(self, filter_bank):
+        """
+        Apply a compiled band-stop filter bank to the audio data.
+        
+        Args:
+            filter_bank (BandStopFilterBank): Filter bank to apply.
+        
+        Returns:
+            tuple: filtered_amplitude, filtered_data
+        """
+        def compute():
+            amplitude = self.amplitude
+            with span('mask', kind='band_stop', bands=len(filter_bank.bands)) as stage:
+                filtered_amplitude = filter_bank.apply(amplitude.copy(), self.n_fft, self.rate)
+                stage.arrays(amplitude=filtered_amplitude)
+            return filtered_amplitude
+
+        params = {'bands': filter_bank.bands.tolist(), 'rate': int(self.rate), 'n_fft': self.n_fft}
+        filtered_amplitude = self._cached('band_stop', compute, **params)
+        filtered_data = self._cached('band_stop_data', lambda: self.amp_to_data(filtered_amplitude), **params)
         return filtered_amplitude, filtered_data
 
+    def sos_filter(self, cutoff_freq=None, band_freqs=(), band_widths=(), order=LOW_PASS_ORDER):
+        """
+        Filter the audio data in the time domain with notch and low-pass sections, see iir.sos_filter.
+        
+        An alternative to low_pass_filter and multi_band_stop_filter that takes the same arguments but
+        needs no transform of the signal and does not ring.
+        
+        Args:
+            cutoff_freq (float): Cutoff frequency for the low-pass filter, or None.
+            band_freqs (list): List of central frequencies for the stop bands.
+            band_widths (list): List of widths for the stop bands.
+            order (int): Order of the low-pass filter.
+        
+        Returns:
+            np.ndarray: Filtered data
+        """
+        def compute():
+            return sos_filter(self.data, self.rate, cutoff_freq, band_freqs, band_widths, order, precision=self.precision)
+
+        return self._cached('sos', compute, cutoff_freq=None if cutoff_freq is None else float(cutoff_freq),
+                            band_freqs=[float(freq) for freq in band_freqs],
+                            band_widths=[float(width) for width in band_widths], order=order, rate=int(self.rate))
+
+    def sweep_low_pass(self, cutoff_freqs, memory_budget=MEMORY_BUDGET, workers=-1, lazy=False):
+        """
+        Apply a sweep of low-pass filters to the audio data in one batched transform, see sweep.sweep_spectrum.
+        
+        Args:
+            cutoff_freqs (list): Cutoff frequency of each point.
+            memory_budget (int): Bytes allowed for the spectra and signals of one chunk; None for no limit.
+            workers (int): Threads of the inverse transform; -1 uses all cores.
+            lazy (bool): Return an iterator over the filtered signals instead of one stacked array.
+        
+        Returns:
+            np.ndarray or iterator: Filtered data of each point, stacked along a new first axis.
+        """
+        return self._sweep(low_pass_masks(self.frequency, cutoff_freqs), memory_budget, workers, lazy)
+
+    def sweep_band_stop(self, band_settings, memory_budget=MEMORY_BUDGET, workers=-1, lazy=False):
+        """
+        Apply a sweep of multi-band stop filters to the audio data in one batched transform, see sweep.sweep_spectrum.
+        
+        Args:
+            band_settings (list): (band_freqs, band_widths) of each point.
+            memory_budget (int): Bytes allowed for the spectra and signals of one chunk; None for no limit.
+            workers (int): Threads of the inverse transform; -1 uses all cores.
+            lazy (bool): Return an iterator over the filtered signals instead of one stacked array.
+        
+        Returns:
+            np.ndarray or iterator: Filtered data of each point, stacked along a new first axis.
+        """
+        return self._sweep(band_stop_masks(self.frequency, band_settings), memory_budget, workers, lazy)
+
+    def _sweep(self, masks, memory_budget, workers, lazy):
+        return sweep_spectrum(self.amplitude, masks, n=self.n_fft, length=len(self.data), precision=self.precision,
+                              memory_budget=memory_budget, workers=workers, lazy=lazy)
+
+    def amp_to_data(self, amplitude):
+        """
+        Convert a spectrum of this audio back to audio data of the original length.
+        
+        Args:
+            amplitude (np.ndarray): Amplitude spectrum computed over n_fft samples.
+        
+        Returns:
+            np.ndarray: Audio data.
+        """
+        return irfft(amplitude, n=self.n_fft, length=len(self.data), axis=0, precision=self.precision)
+
+class BandStopFilterBank:
+    """
+    Set of band-stop filters compiled once and applied to many spectra.
+    
+    Overlapping bands are merged, and the bins covered by each band are resolved from the
+    bin spacing and cached per (length, rate), so applying the bank only zeros contiguous
+    slices of the spectrum without building its frequency grid.
+    
+    Attributes:
+        bands (np.ndarray): Merged (low_cutoff, high_cutoff) pairs, sorted by frequency.
+    """
+
+    def __init__(self, band_freqs, band_widths) -> None:
+        band_freqs = np.asarray(band_freqs, dtype=float)
+        band_widths = np.asarray(band_widths, dtype=float)
+        edges = np.column_stack((band_freqs - band_widths / 2, band_freqs + band_widths / 2))
+        edges = edges[np.argsort(edges[:, 0], kind='stable')]
+        merged = []
+        for low_cutoff, high_cutoff in edges:
+            if merged and low_cutoff <= merged[-1][1]:
+                merged[-1][1] = max(merged[-1][1], high_cutoff)
+            else:
+                merged.append([low_cutoff, high_cutoff])
+        self.bands = np.array(merged, dtype=float).reshape(-1, 2)
+        self._ranges = {}
+
+    def bin_ranges(self, length, rate):
+        """
+        Resolve the bands to bin index ranges of a spectrum.
+        
+        Args:
+            length (int): Transform length of the spectrum.
+            rate (int): Sampling rate.
+        
+        Returns:
+            list: (start, stop) slice bounds of each band.
+        """
+        key = (length, rate)
+        ranges = self._ranges.get(key)
+        if ranges is None:
+            # Spacing of the bins as rfftfreq computes it, so that edges falling on a bin resolve as in band_stop_mask
+            step = 1 / (length * (1 / rate))
+            low, high = self.bands[:, 0], self.bands[:, 1]
+            # First bin at or above the low edge, and first bin above the high edge; rounding moves them by one at most
+            starts = np.ceil(low / step)
+            starts -= (starts - 1) * step >= low
+            starts += starts * step < low
+            stops = np.floor(high / step) + 1
+            stops -= (stops - 1) * step > high
+            stops += stops * step <= high
+            starts, stops = (np.clip(bounds, 0, length // 2 + 1) for bounds in (starts, stops))
+            ranges = [(int(start), int(stop)) for start, stop in zip(starts, stops) if stop > start]
+            self._ranges[key] = ranges
+        return ranges
+
+    def apply(self, amplitude, length, rate):
+        """
+        Zero the stop bands of a spectrum in place.
+        
+        Args:
+            amplitude (np.ndarray): Amplitude spectrum of a signal, with frequency on axis 0.
+            length (int): Transform length of the spectrum.
+            rate (int): Sampling rate.
+        
+        Returns:
+            np.ndarray: The same amplitude array.
+        """
+        for start, stop in self.bin_ranges(length, rate):
+            amplitude[start:stop] = 0
+        return amplitude
+
+def get_filter_bank(band_freqs, band_widths):
+    """
+    Get the cached filter bank for a list of stop bands.
+    
+    Args:
+        band_freqs (list): List of central frequencies for the stop bands.
+        band_widths (list): List of widths for the stop bands.
+    
+    Returns:
+        BandStopFilterBank: Compiled filter bank.
+    """
+    return _cached_filter_bank(tuple(map(float, band_freqs)), tuple(map(float, band_widths)))
+
+@lru_cache(maxsize=64)
+def _cached_filter_bank(band_freqs, band_widths):
+    return BandStopFilterBank(band_freqs, band_widths)
+
+# A grid takes 4 bytes per sample of the signal (635 MB for an hour at 44.1 kHz), so only the grids of the
+# few signal shapes in use are kept
+@lru_cache(maxsize=4)
+def frequency_grid(length, rate):
+    """
+    Frequency grid of the real spectrum of a signal, shared between analyses of the same shape.
+    
+    Args:
+        length (int): Transform length of the spectrum.
+        rate (int): Sampling rate.
+    
+    Returns:
+        np.ndarray: Read-only frequency grid.
+    """
+    frequency = rfftfreq(length, rate)
+    frequency.flags.writeable = False
+    return frequency
+
+def along_frames(mask, ndim):
+    """
+    Shape a per-bin mask so that it broadcasts over the channels of a spectrum.
+    
+    Args:
+        mask (np.ndarray): Mask over the frequency grid.
+        ndim (int): Number of dimensions of the spectrum.
+    
+    Returns:
+        np.ndarray: View of the mask with trailing axes of length 1.
+    """
+    return mask.reshape(mask.shape + (1,) * (ndim - 1))
+
+def low_pass_mask(frequency, cutoff_freq):
+    """
+    Build the stop mask of a low-pass filter.
+    
+    Args:
+        frequency (np.ndarray): Frequency grid of the spectrum.
+        cutoff_freq (float): Cutoff frequency for the low-pass filter.
+    
+    Returns:
+        np.ndarray: Boolean mask, True for the bins to zero.
+    """
+    return frequency > cutoff_freq
+
+def band_stop_mask(frequency, band_freqs, band_widths):
+    """
+    Build the stop mask of one or more band-stop filters.
+    
+    Args:
+        frequency (np.ndarray): Frequency grid of the spectrum.
+        band_freqs (list): List of central frequencies for the stop bands.
+        band_widths (list): List of widths for the stop bands.
+    
+    Returns:
+        np.ndarray: Boolean mask, True for the bins to zero.
+    """
+    mask = np.zeros(len(frequency), dtype=bool)
+    for band_freq, band_width in zip(band_freqs, band_widths):
+        low_cutoff = band_freq - band_width / 2
+        high_cutoff = band_freq + band_width / 2
+        mask |= (frequency >= low_cutoff) & (frequency <= high_cutoff)
+    return mask
+
 def mix_voices(data_list, rate_list):
     """
     Mix multiple audio signals together.
     
+    Signals whose rate differs from the first one are resampled to it, and the mix is
+    truncated to the shortest signal. Use mixer.Mixer directly to mix files from disk,
+    set per-source gains or write the mix as it is produced.
+    
     Args:
-        data_list (list): List of audio data arrays.
+        data_list (list): List of audio data arrays, (frames,) or (frames, channels); multi-channel
+            signals are mixed channel by channel and mono signals are added to every channel.
         rate_list (list): List of sampling rates for the audio data.
     
     Returns:
-        tuple: rate, mixed_data
+        tuple: rate, mixed_data (float32)
     """
-    min_length = min(len(data) for data in data_list)
-    mixed_data = np.zeros(min_length)
-
-    for data in data_list:
-        mixed_data += data[:min_length]
-
-    mixed_data /= len(data_list)
-    return rate_list[0], mixed_data
+    with span('mix', sources=len(data_list)) as stage:
+        mixer = Mixer(rate_list[0], length='shortest')
+        for data, rate in zip(data_list, rate_list):
+            mixer.add_source(data, rate=rate, gain=1 / len(data_list))
+        mixed = mixer.mix()
+        stage.arrays(data=mixed)
+    return rate_list[0], mixed
 
 def write_voice(data, rate, path):
     """
-    Write audio data to a WAV file.
+    Write audio data to a 16-bit WAV file.
+    
+    Samples are rounded and clipped to the 16-bit range block by block, see wavio.write_wav.
     
     Args:
         data (np.ndarray): Audio data.
         rate (int): Sampling rate.
         path (str): Path to save the WAV file.
     """
-    wavfile.write(path, rate, data.astype(np.int16))
+    with span('write_voice', path=str(path)) as stage:
+        write_wav(path, rate, data, dtype=np.int16)
+        stage.arrays(data=data)
 
-def amp_to_data(amplitude):
+def amp_to_data(amplitude, length=None, precision=None):
     """
     Convert amplitude spectrum back to audio data.
     
     Args:
-        amplitude (np.ndarray): Amplitude spectrum.
+        amplitude (np.ndarray): Amplitude spectrum, (bins,) or (bins, channels).
+        length (int): Length of the original audio. When given, the transform length is
+            inferred from it and any padding is trimmed; otherwise an even length is assumed.
+        precision (str): Working precision, see fft_backend.precision_dtype.
     
     Returns:
         np.ndarray: Audio data.
     """
-    return np.fft.irfft(amplitude)
+    if length is None:
+        return irfft(amplitude, axis=0, precision=precision)
+    return irfft(amplitude, n=infer_fft_length(len(amplitude), length), length=length, axis=0, precision=precision)
 
-def save_outputs(amplitude, data, frequency, rate, file_dir_name):
+def save_outputs(amplitude, data, frequency, rate, file_dir_name, spec=None, dpi=None):
     """
     Save audio data and generate plots for amplitude and spectrogram.
     
@@ -176,8 +615,16 @@ def save_outputs(amplitude, data, frequency, rate, file_dir_name):
         frequency (np.ndarray): Frequency spectrum.
         rate (int): Sampling rate.
         file_dir_name (str): Directory name to save the files.
+        spec (stft.Spectrogram): Spectrogram of the data, such as AudioAnalysis.spectrogram(max_columns=
+            plotlib.plot_columns(dpi)); computed if not given.
+        dpi (int): Resolution of the plots; defaults to plotlib.DPI, and plotlib.OUTPUT_DPI renders faster.
     """
-    write_voice(data, rate, f"{file_dir_name}.wav")
-    plot_amplitude_time(data, rate, file_name=f"{file_dir_name}_data.png")
-    plot_spectrogram(data, rate, file_name=f"{file_dir_name}_spectogram.png")
-    plot_amplitude_frequency(amplitude, frequency, file_name=f"{file_dir_name}_amplitude.png")
+    # Plotting, and matplotlib with it, is only imported once outputs are saved
+    from .plotlib import DPI, plot_amplitude_time, plot_amplitude_frequency, plot_spectrogram
+
+    dpi = dpi or DPI
+    with span('save_outputs', output=str(file_dir_name)):
+        write_voice(data, rate, f"{file_dir_name}.wav")
+        plot_amplitude_time(data, rate, file_name=f"{file_dir_name}_data.png", dpi=dpi)
+        plot_spectrogram(data, rate, file_name=f"{file_dir_name}_spectogram.png", dpi=dpi, spec=spec)
+        plot_amplitude_frequency(amplitude, frequency, file_name=f"{file_dir_name}_amplitude.png", dpi=dpi)
@@ -1,13 +1,31 @@
 """
 audio_playback.py
-This module provides functions for recording and playing back audio using the sounddevice library.
+This module provides functions for recording and playing back audio using the sounddevice library, and a
+real-time duplex processing stream.
+A ProcessingStream runs a chain of block processors (filters, gain, mixing) from an input to an output in
+the audio callback. Every buffer it uses is allocated before the stream starts, so callbacks only fill them,
+apart from the result of scipy's sosfilt in FilterStage, which is one new block per callback;
+the stream reports its latency and counts underruns, overruns and late callbacks. The audio I/O is pluggable:
+SoundDeviceIO drives the stream from a real device, and SimulatedIO drives it in-process from an array, so
+the processing can be run and checked where no audio device exists. sounddevice is only imported when a
+device is used.
 """
 
-import sounddevice as sd
+import threading
+import time
+from math import gcd
+
 import numpy as np
 from scipy.io.wavfile import write
 
-def record_audio(duration=15, rate=44100, filename="sample_audio"):
+from .iir import LOW_PASS_ORDER, SOSFilter
+from .resample import resample
+from .wavio import read_wav
+
+BLOCK_SIZE = 256
+
+
+def record_audio(duration=15, rate=44100, filename="sample_audio", channels=1):
     """
     Record audio from the microphone.
     
@@ -15,9 +33,13 @@ def record_audio(duration=15, rate=44100, filename="sample_audio"):
         duration (int): Duration of the recording in seconds.
         rate (int): Sampling rate.
         filename (str): Filename to save the recorded audio.
+        channels (int): Number of input channels; multi-channel recordings are saved as one
+            interleaved WAV file.
     """
+    import sounddevice as sd
+
     print("Recording...")
-    audio_data = sd.rec(int(duration * rate), samplerate=rate, channels=1, dtype='int16')
+    audio_data = sd.rec(int(duration * rate), samplerate=rate, channels=channels, dtype='int16')
     sd.wait()
     print("Recording finished.")
     write(f"{filename}.wav", rate, audio_data)
@@ -28,11 +50,334 @@ def play_audio(audio_data, rate):
     Play audio data.
     
     Args:
-        audio_data (np.ndarray): Audio data to play.
+        audio_data (np.ndarray): Audio data to play, (frames,) or (frames, channels).
         rate (int): Sampling rate.
     """
+    import sounddevice as sd
+
     print("Playing back...")
     sd.play(audio_data, rate)
     sd.wait()
     print("Playback finished.")
 
+
+class Gain:
+    """
+    Scale the block by a constant factor.
+    """
+
+    def __init__(self, gain) -> None:
+        self.gain = gain
+
+    def prepare(self, rate, block_size, channels):
+        pass
+
+    def process(self, block, out):
+        np.multiply(block, self.gain, out=out)
+
+
+class FilterStage:
+    """
+    Apply an iir.SOSFilter with its state carried between callbacks.
+
+    The cascade itself runs in scipy's sosfilt, which has no output argument: it returns its result in a
+    new array of one block, allocated on every callback and copied into the stream's buffer. Every other
+    buffer, including the filter state and the cast sections, is reused.
+    """
+
+    def __init__(self, cutoff_freq=None, band_freqs=(), band_widths=(), order=LOW_PASS_ORDER) -> None:
+        self.cutoff_freq = cutoff_freq
+        self.band_freqs = band_freqs
+        self.band_widths = band_widths
+        self.order = order
+        self.audio_filter = None
+
+    def prepare(self, rate, block_size, channels):
+        self.audio_filter = SOSFilter.design(rate, self.cutoff_freq, self.band_freqs, self.band_widths, self.order,
+                                             precision='single')
+
+    def process(self, block, out):
+        out[:] = self.audio_filter.process(block)
+
+
+class MixStage:
+    """
+    Mix a recorded source into the stream; a mono source goes into every channel.
+
+    The source is converted to float32, scaled by the gain and resampled to the stream rate once, when
+    the stream is prepared, and held in memory, so each callback only adds the next slice of it into the
+    stream's buffer without allocating. The source takes 4 bytes per sample and channel at the stream rate.
+
+    Attributes:
+        source (str or np.ndarray): Path to a WAV file, or audio data with one channel or as many as the
+            stream, (frames,) or (frames, channels).
+        rate (int): Sampling rate of audio data; resampled to the stream rate when it differs.
+        gain (float): Factor applied to the source; stream samples are floats in [-1, 1], so 16-bit
+            sources need a gain of about 1 / 32768.
+    """
+
+    def __init__(self, source, rate=None, gain=1.0) -> None:
+        self.source = source
+        self.rate = rate
+        self.gain = gain
+        self._data = None
+        self._position = 0
+
+    def prepare(self, rate, block_size, channels):
+        if isinstance(self.source, np.ndarray):
+            source_rate, data = self.rate or rate, self.source
+        else:
+            source_rate, data = read_wav(self.source)
+        data = data.reshape(len(data), -1)
+        if data.shape[1] not in (1, channels):
+            raise ValueError(f"Cannot mix a source with {data.shape[1]} channels into {channels} channels")
+        data = np.multiply(data, self.gain, dtype=np.float32)
+        if source_rate != rate:
+            divisor = gcd(int(rate), int(source_rate))
+            data = resample(data, int(rate) // divisor, int(source_rate) // divisor)
+        self._data = np.ascontiguousarray(data, dtype=np.float32)
+        self._position = 0
+
+    def process(self, block, out):
+        count = min(len(out), len(self._data) - self._position)
+        np.add(block[:count], self._data[self._position:self._position + count], out=out[:count])
+        if count < len(out) and out is not block:
+            out[count:] = block[count:]
+        self._position += count
+
+
+class StreamStats:
+    """
+    Timing statistics of a processing stream.
+
+    Attributes:
+        blocks (int): Number of callbacks.
+        frames (int): Number of frames processed.
+        underruns (int): Callbacks flagged with an input or output underflow.
+        overruns (int): Callbacks flagged with an input or output overflow.
+        late (int): Callbacks whose processing took longer than the duration of their block.
+        max_callback (float): Longest processing time of a callback in seconds.
+        total_callback (float): Total processing time in seconds.
+        latency (float): Input plus output latency of the I/O plus one block, in seconds.
+    """
+
+    def __init__(self) -> None:
+        self.blocks = 0
+        self.frames = 0
+        self.underruns = 0
+        self.overruns = 0
+        self.late = 0
+        self.max_callback = 0.0
+        self.total_callback = 0.0
+        self.latency = 0.0
+
+    def to_dict(self):
+        """
+        Statistics as a plain dictionary, with the mean callback time.
+        """
+        stats = dict(vars(self))
+        stats['mean_callback'] = self.total_callback / self.blocks if self.blocks else 0.0
+        return stats
+
+
+class ProcessingStream:
+    """
+    Duplex stream that runs a chain of processors block by block.
+
+    Each processor has prepare(rate, block_size, channels), called once before the stream starts, and
+    process(block, out), which writes the processed block into out. Blocks are float32 arrays of shape
+    (frames, channels); the chain alternates between two preallocated buffers.
+
+    Attributes:
+        rate (int): Sampling rate.
+        block_size (int): Frames per callback.
+        channels (int): Number of input and output channels.
+        processors (list): Processing chain, applied in order.
+        stats (StreamStats): Statistics of the current run.
+    """
+
+    def __init__(self, processors, rate=44100, block_size=BLOCK_SIZE, channels=1) -> None:
+        self.rate = rate
+        self.block_size = block_size
+        self.channels = channels
+        self.processors = list(processors)
+        self.stats = StreamStats()
+        self._buffers = None
+        self._period = block_size / rate
+
+    def prepare(self):
+        """
+        Allocate the buffers and prepare every processor; called by run().
+        """
+        self._buffers = [np.zeros((self.block_size, self.channels), dtype=np.float32) for _ in range(2)]
+        for processor in self.processors:
+            processor.prepare(self.rate, self.block_size, self.channels)
+        self.stats = StreamStats()
+
+    def callback(self, indata, outdata, frames, time_info, status):
+        """
+        Process one block; the signature is the one of sounddevice.Stream callbacks.
+        """
+        start = time.perf_counter()
+        stats = self.stats
+        if status:
+            if status.input_underflow or status.output_underflow:
+                stats.underruns += 1
+            if status.input_overflow or status.output_overflow:
+                stats.overruns += 1
+        block = indata
+        for index, processor in enumerate(self.processors):
+            out = self._buffers[index % 2][:frames]
+            processor.process(block, out)
+            block = out
+        outdata[:] = block
+        elapsed = time.perf_counter() - start
+        stats.blocks += 1
+        stats.frames += frames
+        stats.total_callback += elapsed
+        if elapsed > stats.max_callback:
+            stats.max_callback = elapsed
+        if elapsed > frames / self.rate:
+            stats.late += 1
+
+    def run(self, io, duration=None):
+        """
+        Run the stream until the duration has elapsed or the input ends.
+
+        Args:
+            io: I/O layer, such as SoundDeviceIO or SimulatedIO.
+            duration (float): Seconds to run; None runs until the input of the I/O ends.
+
+        Returns:
+            StreamStats: Statistics of the run.
+        """
+        self.prepare()
+        io_latency = io.run(self, duration)
+        self.stats.latency = sum(io_latency) + self._period
+        return self.stats
+
+
+class StreamStatus:
+    """
+    Status flags of one simulated callback, with the attributes of sounddevice.CallbackFlags.
+    """
+
+    def __init__(self, output_underflow=False) -> None:
+        self.input_underflow = False
+        self.input_overflow = False
+        self.output_underflow = output_underflow
+        self.output_overflow = False
+
+    def __bool__(self):
+        return self.output_underflow
+
+
+class SoundDeviceIO:
+    """
+    Drive a processing stream from an audio device through sounddevice.
+
+    Attributes:
+        device: Input and output device, see sounddevice.Stream; None for the defaults.
+        latency (str or float): Requested latency, 'low' by default.
+    """
+
+    def __init__(self, device=None, latency='low') -> None:
+        self.device = device
+        self.latency = latency
+
+    def run(self, stream, duration=None):
+        """
+        Run the stream on the device.
+
+        Args:
+            stream (ProcessingStream): Stream to drive.
+            duration (float): Seconds to run; None runs until interrupted.
+
+        Returns:
+            tuple: Input and output latency reported by the device, in seconds.
+        """
+        import sounddevice as sd
+
+        done = threading.Event()
+        with sd.Stream(samplerate=stream.rate, blocksize=stream.block_size, channels=stream.channels,
+                       dtype='float32', device=self.device, latency=self.latency, callback=stream.callback) as device:
+            try:
+                done.wait(duration)
+            except KeyboardInterrupt:
+                pass
+            return tuple(device.latency)
+
+
+class SimulatedIO:
+    """
+    Drive a processing stream in-process from an array, for use without an audio device.
+
+    The input is cut into blocks that are passed to the callback one after the other, through the same
+    buffers each time, and the output is collected into a preallocated array. In real-time mode every block
+    is delivered one block period after the previous one, and a callback that overruns its period is flagged
+    as an output underflow on the next one, as a device would.
+
+    Attributes:
+        data (np.ndarray): Input samples, (frames,) or (frames, channels), floats in [-1, 1].
+        realtime (bool): Pace the callbacks at the stream's rate instead of running as fast as possible.
+        latency (tuple): Input and output latency to report, in seconds.
+        output (np.ndarray): Output of the last run, (frames, channels).
+    """
+
+    def __init__(self, data, realtime=False, latency=(0.0, 0.0)) -> None:
+        data = np.asarray(data, dtype=np.float32)
+        self.data = data.reshape(len(data), -1)
+        self.realtime = realtime
+        self.latency = latency
+        self.output = None
+
+    def run(self, stream, duration=None):
+        """
+        Run the stream over the input.
+
+        Args:
+            stream (ProcessingStream): Stream to drive.
+            duration (float): Seconds of input to process; None processes all of it.
+
+        Returns:
+            tuple: The configured input and output latency.
+        """
+        if self.data.shape[1] != stream.channels:
+            raise ValueError(f"Input has {self.data.shape[1]} channels, the stream {stream.channels}")
+        frames = len(self.data) if duration is None else min(len(self.data), int(duration * stream.rate))
+        self.output = np.zeros((frames, stream.channels), dtype=np.float32)
+        indata = np.zeros((stream.block_size, stream.channels), dtype=np.float32)
+        outdata = np.zeros_like(indata)
+        period = stream.block_size / stream.rate
+        deadline = time.perf_counter()
+        late = False
+        for start in range(0, frames, stream.block_size):
+            count = min(stream.block_size, frames - start)
+            if self.realtime:
+                deadline += period
+                time.sleep(max(deadline - time.perf_counter(), 0))
+            indata[:count] = self.data[start:start + count]
+            begin = time.perf_counter()
+            stream.callback(indata[:count], outdata[:count], count, None, StreamStatus(output_underflow=late))
+            late = time.perf_counter() - begin > period
+            self.output[start:start + count] = outdata[:count]
+        return self.latency
+
+
+def process_live(processors, duration=None, rate=44100, block_size=BLOCK_SIZE, channels=1, device=None):
+    """
+    Process the microphone to the speakers in real time.
+
+    Args:
+        processors (list): Processing chain, for example [FilterStage(band_freqs=[1000], band_widths=[14]), Gain(0.8)].
+        duration (float): Seconds to run; None runs until interrupted.
+        rate (int): Sampling rate.
+        block_size (int): Frames per callback; smaller blocks lower the latency.
+        channels (int): Number of channels.
+        device: Input and output device, see sounddevice.Stream.
+
+    Returns:
+        StreamStats: Latency and timing statistics of the run.
+    """
+    stream = ProcessingStream(processors, rate=rate, block_size=block_size, channels=channels)
+    return stream.run(SoundDeviceIO(device), duration)
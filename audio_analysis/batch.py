@@ -0,0 +1,465 @@
+"""
+batch.py
+This module provides a command line entry point for processing many WAV files in parallel.
+Each file goes through the same pipeline as main.py: optional noise filtering, speed changes and reversal,
+with the results saved by save_outputs. Files are spread across a process pool, finished files are skipped
+on the next run, and per-file timings and failures are reported. The outputs of each file are saved under the
+path of its directory relative to the common directory of the inputs, so files with the same name in different
+directories do not overwrite each other.
+
+Usage:
+    python -m audio_analysis.batch recordings/ -o processed/ --bands 1000,5000,7000 --band-widths 14,14,14 \
+        --speed 2 --speed 0.5 --reverse --workers 32
+"""
+
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
+from functools import partial
+from pathlib import Path
+
+import numpy as np
+
+from .analysis import AudioAnalysis, get_filter_bank, low_pass_mask, save_outputs, write_voice
+from .cache import AnalysisCache
+from .fft_backend import PRECISIONS, fft_options, set_fft_options
+from .features import FeatureExtractor, full_scale_of
+from .instrumentation import recording, span, write_chrome_trace
+from .pyramid import SIDECAR_SUFFIX, Pyramid
+from .resample import SPEED_METHODS
+
+DEFAULT_SPEC = {
+    'band_freqs': [],
+    'band_widths': [],
+    'cutoff_freq': None,
+    'speed_factors': [],
+    'speed_method': 'polyphase',
+    'filter_backend': 'fft',
+    'reverse': False,
+    'outputs': ['wav', 'plots'],
+    'fft_pad': False,
+    'precision': 'double',
+    'plot_dpi': None,
+}
+
+OUTPUT_KINDS = ('wav', 'plots', 'lod', 'features')
+FILTER_BACKENDS = ('fft', 'iir')
+
+
+def load_spec(spec=None, **overrides):
+    """
+    Build a validated pipeline spec.
+
+    Args:
+        spec (dict or str): Pipeline spec, or path to a JSON file containing one.
+        **overrides: Spec keys that take precedence over the ones in spec (None values are ignored).
+
+    Returns:
+        dict: Pipeline spec with every key of DEFAULT_SPEC.
+    """
+    if isinstance(spec, (str, os.PathLike)):
+        with open(spec) as spec_file:
+            spec = json.load(spec_file)
+    merged = dict(DEFAULT_SPEC, **(spec or {}))
+    merged.update({key: value for key, value in overrides.items() if value is not None})
+
+    unknown = set(merged) - set(DEFAULT_SPEC)
+    if unknown:
+        raise ValueError(f"Unknown pipeline keys: {', '.join(sorted(unknown))}")
+    if len(merged['band_freqs']) != len(merged['band_widths']):
+        raise ValueError("band_freqs and band_widths must have the same length")
+    if any(factor <= 0 for factor in merged['speed_factors']):
+        raise ValueError("Speed factors must be positive")
+    if merged['speed_method'] not in SPEED_METHODS:
+        raise ValueError(f"speed_method must be one of {SPEED_METHODS}")
+    if merged['filter_backend'] not in FILTER_BACKENDS:
+        raise ValueError(f"filter_backend must be one of {FILTER_BACKENDS}")
+    if merged['precision'] not in PRECISIONS:
+        raise ValueError(f"precision must be one of {tuple(PRECISIONS)}")
+    if merged['plot_dpi'] is not None and merged['plot_dpi'] <= 0:
+        raise ValueError("plot_dpi must be positive")
+    bad_outputs = set(merged['outputs']) - set(OUTPUT_KINDS)
+    if bad_outputs or not merged['outputs']:
+        raise ValueError(f"outputs must be a non-empty subset of {OUTPUT_KINDS}")
+    return merged
+
+
+def find_inputs(patterns):
+    """
+    Expand directories, glob patterns and file paths into a sorted list of WAV files.
+    Directories are not searched recursively; use a '**' glob pattern for that.
+
+    Args:
+        patterns (list): Directories, glob patterns or file paths.
+
+    Returns:
+        list: Paths of the WAV files found, without duplicates.
+    """
+    found = set()
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            found.update(p for p in path.iterdir() if p.is_file() and p.suffix.lower() == '.wav')
+        elif path.is_file():
+            found.add(path)
+        else:
+            found.update(Path(p) for p in glob.glob(pattern, recursive=True) if Path(p).is_file())
+    return sorted(found)
+
+
+def spec_digest(spec):
+    """
+    Hash a pipeline spec so that finished outputs are only reused for the same pipeline.
+
+    Args:
+        spec (dict): Pipeline spec.
+
+    Returns:
+        str: Hex digest of the spec.
+    """
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+
+def input_root(inputs):
+    """
+    Common directory of the input files, under which their relative paths are mirrored in the output directory.
+
+    Args:
+        inputs (list): Source WAV files.
+
+    Returns:
+        Path: Deepest directory containing every input, or None when there are no inputs.
+    """
+    if not inputs:
+        return None
+    return Path(os.path.commonpath([Path(path).resolve().parent for path in inputs]))
+
+
+def output_dir(path, out_dir, root):
+    """
+    Directory of the outputs of one file: its directory relative to the root of the inputs, under out_dir.
+
+    Args:
+        path (Path): Source WAV file.
+        out_dir (Path): Output directory.
+        root (Path): Common directory of the inputs, see input_root.
+
+    Returns:
+        Path: Directory to save the outputs and marker of the file in.
+    """
+    return Path(out_dir) / Path(path).resolve().parent.relative_to(root)
+
+
+def source_stamp(path):
+    """
+    Size and modification time of a source file, stored in its marker to notice when the file changes.
+
+    Args:
+        path (Path): Source WAV file.
+
+    Returns:
+        dict: 'size' in bytes and 'mtime_ns'.
+    """
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def marker_path(path, out_dir):
+    """
+    Path of the marker written once every output of a file is complete.
+
+    Args:
+        path (Path): Source WAV file.
+        out_dir (Path): Output directory of the file, see output_dir.
+
+    Returns:
+        Path: Marker file path.
+    """
+    return Path(out_dir) / f"{Path(path).stem}.done.json"
+
+
+def is_complete(path, out_dir, spec):
+    """
+    Check whether a file was already processed with the same pipeline.
+
+    Args:
+        path (Path): Source WAV file.
+        out_dir (Path): Output directory of the file, see output_dir.
+        spec (dict): Pipeline spec.
+
+    Returns:
+        bool: True when the marker exists, matches the spec and the source file as it is now, and all its
+            outputs exist.
+    """
+    marker = marker_path(path, out_dir)
+    try:
+        with open(marker) as marker_file:
+            done = json.load(marker_file)
+        source = source_stamp(path)
+    except (OSError, ValueError):
+        return False
+    return done.get('spec') == spec_digest(spec) and done.get('source') == source and all(Path(out_dir, name).exists() for name in done.get('outputs', []))
+
+
+def process_file(path, out_dir, spec, trace=False, cache=None):
+    """
+    Run the pipeline on one file. Intended to run in a worker process.
+
+    Args:
+        path (Path): Source WAV file.
+        out_dir (Path): Output directory of the file, see output_dir.
+        spec (dict): Pipeline spec.
+        trace (bool): Record the pipeline stages into record['spans'].
+        cache (AnalysisCache): Cache of decoded audio and spectra shared by the workers, or None.
+
+    Returns:
+        dict: Report record with file, status, seconds, outputs and error.
+    """
+    start = time.perf_counter()
+    record = {'file': str(path), 'status': 'done', 'seconds': 0.0, 'outputs': [], 'error': None}
+    with recording() if trace else nullcontext() as recorder:
+        try:
+            with fft_options(pad=spec['fft_pad'], real_dtype=spec['precision']), span('file', path=str(path)):
+                run_pipeline(path, out_dir, spec, record, cache)
+        except Exception as error:
+            record['status'] = 'failed'
+            record['error'] = f"{type(error).__name__}: {error}"
+            record['traceback'] = traceback.format_exc()
+    if recorder:
+        record['spans'] = recorder.to_records()
+    record['seconds'] = time.perf_counter() - start
+    return record
+
+
+def run_pipeline(path, out_dir, spec, record, cache=None):
+    """
+    Save every output of the pipeline for one file and write its marker, which records the spec and the
+    size and modification time the source had when it was read.
+
+    Args:
+        path (Path): Source WAV file.
+        out_dir (Path): Output directory of the file, see output_dir; created when missing.
+        spec (dict): Pipeline spec.
+        record (dict): Report record; the saved outputs are appended to record['outputs'].
+        cache (AnalysisCache): Cache of decoded audio and spectra, or None.
+    """
+    stem = Path(path).stem
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    source = source_stamp(path)
+    audio = AudioAnalysis(path=path, cache=cache)
+    # Band energies are measured at the stop bands, to check how much of them is left
+    extractor = FeatureExtractor(band_freqs=spec['band_freqs'], band_widths=spec['band_widths'])
+    # Derived signals are floats on the scale of the source's samples, so levels are relative to its full scale
+    full_scale = full_scale_of(audio.data.dtype)
+
+    def save(name, amplitude, data, frequency, rate, analysis=None):
+        # analysis: AudioAnalysis of data, whose spectrogram is plotted instead of being computed again
+        file_dir_name = Path(out_dir) / name
+        if 'plots' in spec['outputs']:
+            from .plotlib import OUTPUT_DPI, plot_columns
+
+            dpi = spec['plot_dpi'] or OUTPUT_DPI
+            spectrogram = analysis.spectrogram(max_columns=plot_columns(dpi)) if analysis is not None else None
+            save_outputs(amplitude, data, frequency, rate, file_dir_name=file_dir_name, spec=spectrogram, dpi=dpi)
+            record['outputs'] += [f"{name}{suffix}" for suffix in
+                                  ('.wav', '_data.png', '_spectogram.png', '_amplitude.png')]
+        else:
+            write_voice(data, rate, f"{file_dir_name}.wav")
+            record['outputs'].append(f"{name}.wav")
+        if 'lod' in spec['outputs']:
+            Pyramid.build(f"{file_dir_name}.wav")
+            record['outputs'].append(f"{name}.wav{SIDECAR_SUFFIX}")
+        if 'features' in spec['outputs']:
+            np.savez(f"{file_dir_name}_features.npz", **extractor.extract(data, rate, full_scale))
+            record['outputs'].append(f"{name}_features.npz")
+
+    if (spec['band_freqs'] or spec['cutoff_freq'] is not None) and spec['filter_backend'] == 'iir':
+        data = audio.sos_filter(spec['cutoff_freq'], spec['band_freqs'], spec['band_widths'])
+        audio = AudioAnalysis(audio_data={'rate': audio.rate, 'data': data})
+        # The spectrum is only transformed when it is plotted
+        plots = 'plots' in spec['outputs']
+        save(f"{stem}_clean", audio.amplitude if plots else None, data, audio.frequency if plots else None, audio.rate,
+             audio)
+    elif spec['band_freqs'] or spec['cutoff_freq'] is not None:
+        amplitude = audio.amplitude.copy()
+        with span('mask'):
+            if spec['band_freqs']:
+                get_filter_bank(spec['band_freqs'], spec['band_widths']).apply(amplitude, audio.n_fft, audio.rate)
+            if spec['cutoff_freq'] is not None:
+                amplitude[low_pass_mask(audio.frequency, spec['cutoff_freq'])] = 0
+        data = audio.amp_to_data(amplitude)
+        audio = AudioAnalysis(audio_data={'rate': audio.rate, 'data': data,
+                                          'amplitude': amplitude, 'frequency': audio.frequency})
+        save(f"{stem}_clean", amplitude, data, audio.frequency, audio.rate, audio)
+
+    for speed_factor in spec['speed_factors']:
+        data, amplitude, frequency, _ = audio.change_speed(speed_factor, spec['speed_method'])
+        save(f"{stem}_speed_x{speed_factor:g}", amplitude, data, frequency, audio.rate)
+
+    if spec['reverse']:
+        data, amplitude = audio.reverse_voice()
+        save(f"{stem}_reversed", amplitude, data, audio.frequency, audio.rate)
+
+    marker = marker_path(path, out_dir)
+    with open(f"{marker}.tmp", 'w') as marker_file:
+        json.dump({'spec': spec_digest(spec), 'source': source, 'outputs': record['outputs']}, marker_file)
+    os.replace(f"{marker}.tmp", marker)
+
+
+def run_batch(inputs, out_dir, spec, workers=None, max_in_flight=None, resume=True, on_record=None,
+              fft_workers=None, trace=False, cache=None):
+    """
+    Process files in parallel with a bounded number of queued jobs.
+
+    A file whose worker dies is reported as failed, along with the other files queued in the broken pool, and
+    the remaining files are processed by a new pool.
+
+    Args:
+        inputs (list): Source WAV files.
+        out_dir (str): Output directory.
+        spec (dict): Pipeline spec.
+        workers (int): Number of worker processes (defaults to the CPU count).
+        max_in_flight (int): Maximum number of submitted but unfinished files (defaults to twice the workers).
+        resume (bool): Whether to skip files already processed with the same spec.
+        on_record (callable): Called with each report record as it becomes available.
+        fft_workers (int): Number of threads each worker uses per transform.
+        trace (bool): Record the stages of every file into its record's 'spans'.
+        cache (AnalysisCache): Cache of decoded audio and spectra shared by the workers, or None.
+
+    Returns:
+        list: Report records, one per input file.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max(max_in_flight or 2 * workers, 1)
+    root = input_root(inputs)
+    records = []
+
+    def report(record):
+        records.append(record)
+        if on_record:
+            on_record(record)
+
+    def start_pool():
+        return ProcessPoolExecutor(max_workers=workers, initializer=partial(set_fft_options, workers=fft_workers))
+
+    pending = iter(inputs)
+    in_flight = {}
+    executor = start_pool()
+    try:
+        while True:
+            while len(in_flight) < max_in_flight:
+                path = next(pending, None)
+                if path is None:
+                    break
+                file_dir = output_dir(path, out_dir, root)
+                if resume and is_complete(path, file_dir, spec):
+                    report({'file': str(path), 'status': 'skipped', 'seconds': 0.0, 'outputs': [], 'error': None})
+                    continue
+                try:
+                    future = executor.submit(process_file, path, file_dir, spec, trace, cache)
+                except BrokenProcessPool:
+                    executor.shutdown()
+                    executor = start_pool()
+                    future = executor.submit(process_file, path, file_dir, spec, trace, cache)
+                in_flight[future] = path
+            if not in_flight:
+                break
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in finished:
+                path = in_flight.pop(future)
+                try:
+                    record = future.result()
+                except Exception as error:
+                    # The worker died or its result could not be sent back; the other files carry on
+                    broken = broken or isinstance(error, BrokenProcessPool)
+                    record = {'file': str(path), 'status': 'failed', 'seconds': 0.0, 'outputs': [],
+                              'error': f"{type(error).__name__}: {error}"}
+                report(record)
+            if broken:
+                # A worker that dies breaks the whole pool and fails every file in it; the rest go to a new pool
+                executor.shutdown()
+                executor = start_pool()
+    finally:
+        executor.shutdown()
+    return records
+
+
+def parse_floats(text):
+    return [float(value) for value in text.split(',') if value.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process WAV files in parallel.")
+    parser.add_argument('inputs', nargs='+', help="Directories, glob patterns or WAV files.")
+    parser.add_argument('-o', '--out-dir', required=True, help="Directory to save the outputs.")
+    parser.add_argument('--spec', help="JSON pipeline spec; command line options override it.")
+    parser.add_argument('--bands', type=parse_floats, dest='band_freqs', help="Comma-separated stop band centres (Hz).")
+    parser.add_argument('--band-widths', type=parse_floats, dest='band_widths', help="Comma-separated stop band widths (Hz).")
+    parser.add_argument('--low-pass', type=float, dest='cutoff_freq', help="Low-pass cutoff frequency (Hz).")
+    parser.add_argument('--speed', type=float, action='append', dest='speed_factors', help="Speed factor; may be repeated.")
+    parser.add_argument('--filter-backend', choices=FILTER_BACKENDS,
+                        help="Spectral masks (fft, default) or time-domain notch and low-pass sections (iir).")
+    parser.add_argument('--speed-method', choices=SPEED_METHODS, help="How speed changes resample (default: polyphase).")
+    parser.add_argument('--reverse', action='store_true', default=None, help="Save the reversed audio.")
+    parser.add_argument('--outputs', type=lambda text: text.split(','), help="Comma-separated outputs: wav, plots, lod (pyramid sidecar of each WAV), features.")
+    parser.add_argument('-j', '--workers', type=int, help="Number of worker processes (default: CPU count).")
+    parser.add_argument('--max-in-flight', type=int, help="Maximum queued files (default: twice the workers).")
+    parser.add_argument('--fft-workers', type=int, help="Threads per transform in each worker process.")
+    parser.add_argument('--fft-pad', action='store_true', default=None, help="Pad transforms to fast lengths.")
+    parser.add_argument('--precision', choices=sorted(PRECISIONS), help="Working precision of transforms and outputs.")
+    parser.add_argument('--plot-dpi', type=float, dest='plot_dpi', help="Resolution of the plots (default: 100; 300 for print).")
+    parser.add_argument('--no-resume', dest='resume', action='store_false', help="Reprocess files that are already done.")
+    parser.add_argument('--report', help="Write the per-file report to this JSON file.")
+    parser.add_argument('--cache', help="Directory of a cache of decoded audio and spectra reused across runs.")
+    parser.add_argument('--cache-size', type=float, default=8, help="Size limit of the cache in GiB (default: 8).")
+    parser.add_argument('--trace', help="Write a Chrome trace of every file's processing stages to this JSON file.")
+    args = parser.parse_args(argv)
+
+    try:
+        spec = load_spec(args.spec, band_freqs=args.band_freqs, band_widths=args.band_widths,
+                         cutoff_freq=args.cutoff_freq, speed_factors=args.speed_factors,
+                         speed_method=args.speed_method, filter_backend=args.filter_backend,
+                         reverse=args.reverse, outputs=args.outputs, fft_pad=args.fft_pad,
+                         precision=args.precision, plot_dpi=args.plot_dpi)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+    inputs = find_inputs(args.inputs)
+    if not inputs:
+        parser.error("No WAV files found.")
+
+    def print_record(record):
+        line = f"{record['status']:>7}  {record['seconds']:8.2f}s  {record['file']}"
+        if record['error']:
+            line += f"  {record['error']}"
+        print(line, flush=True)
+
+    start = time.perf_counter()
+    records = run_batch(inputs, args.out_dir, spec, workers=args.workers, max_in_flight=args.max_in_flight,
+                        resume=args.resume, on_record=print_record, fft_workers=args.fft_workers,
+                        trace=bool(args.trace),
+                        cache=AnalysisCache(args.cache, int(args.cache_size * 2 ** 30)) if args.cache else None)
+    counts = {status: sum(record['status'] == status for record in records) for status in ('done', 'skipped', 'failed')}
+    print(f"{counts['done']} done, {counts['skipped']} skipped, {counts['failed']} failed "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    if args.trace:
+        write_chrome_trace([span for record in records for span in record.pop('spans', [])], args.trace)
+    if args.report:
+        with open(args.report, 'w') as report_file:
+            json.dump({'spec': spec, 'records': records}, report_file, indent=2)
+    return 1 if counts['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,319 @@
+"""
+cache.py
+This module provides a persistent, content-addressed cache of decoded audio, spectra and derived signals.
+Entries are keyed by a hash of the source file's content plus the operation and its parameters, and are
+stored as .npy files that are memory-mapped read-only when loaded, so a repeated analysis skips both
+decoding and the transform and pages in only what it reads. Entries are written to a temporary file and
+renamed into place, and the total size of the entries is kept as a running count under a file lock, so the
+directory is only scanned, and the least recently used entries removed, once the count passes the size
+limit; one cache directory can be shared by many worker processes.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+from .wavio import read_wav
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+HASH_CHUNK = 1 << 20
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Hold an exclusive lock on a file, shared between processes.
+
+    Args:
+        path (str): Path of the lock file; created if missing.
+    """
+    with open(path, 'a+b') as lock_file:
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def content_hash(path):
+    """
+    Hash the content of a file.
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        str: Hex digest.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """
+    On-disk cache of arrays keyed by content and parameters.
+
+    Attributes:
+        directory (Path): Directory holding the entries.
+        max_bytes (int): Size limit; the least recently used entries are evicted beyond it.
+    """
+
+    def __init__(self, directory, max_bytes=8 << 30) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock_path = self.directory / '.lock'
+        self._size_path = self.directory / '.size'
+        self._hashes = {}
+
+    def key(self, *parts, **params):
+        """
+        Build an entry key.
+
+        Args:
+            *parts: Content hash of the source and operation names.
+            **params: Operation parameters; they must be JSON serializable.
+
+        Returns:
+            str: Hex digest identifying the entry.
+        """
+        text = json.dumps([parts, params], sort_keys=True, default=str)
+        return hashlib.blake2b(text.encode(), digest_size=20).hexdigest()
+
+    def source_key(self, path):
+        """
+        Content hash of a source file.
+
+        The hash is remembered, in memory and in the cache, for the file's path, size and modification
+        time, so an unchanged file is only hashed once.
+
+        Args:
+            path (str): Path to the file.
+
+        Returns:
+            str: Content hash.
+        """
+        stat = os.stat(path)
+        identity = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+        source = self._hashes.get(identity)
+        if source is None:
+            memo = self.key('path', *identity)
+            meta = self.get_meta(memo)
+            source = meta['hash'] if meta else content_hash(path)
+            if not meta:
+                self.put_meta(memo, {'hash': source})
+            self._hashes[identity] = source
+        return source
+
+    def _entry(self, key, suffix):
+        return self.directory / f"{key}{suffix}"
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _write(self, path, write):
+        handle, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as tmp_file:
+                write(tmp_file)
+            size = os.path.getsize(tmp_path)
+            with file_lock(self._lock_path):
+                total = self._counted_size()
+                try:
+                    total -= os.path.getsize(path)
+                except OSError:
+                    pass
+                os.replace(tmp_path, path)
+                total += size
+                self._size_path.write_text(str(total))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        if total > self.max_bytes:
+            self.evict()
+
+    def _counted_size(self):
+        # Running total of the entries shared by every process; read under the lock, and counted again
+        # from the directory when it is missing or unreadable
+        try:
+            return int(self._size_path.read_text())
+        except (OSError, ValueError):
+            return self.size()
+
+    def get(self, key):
+        """
+        Load an array entry.
+
+        Args:
+            key (str): Entry key.
+
+        Returns:
+            np.ndarray: Read-only memory-mapped array, or None if the entry is missing.
+        """
+        path = self._entry(key, '.npy')
+        try:
+            array = np.load(path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        self._touch(path)
+        return array
+
+    def put(self, key, array):
+        """
+        Store an array entry.
+
+        Args:
+            key (str): Entry key.
+            array (np.ndarray): Array to store.
+
+        Returns:
+            np.ndarray: The stored array, memory-mapped read-only.
+        """
+        path = self._entry(key, '.npy')
+        self._write(path, lambda tmp_file: np.save(tmp_file, np.asarray(array)))
+        stored = self.get(key)
+        return stored if stored is not None else array
+
+    def get_meta(self, key):
+        """
+        Load a JSON entry.
+
+        Args:
+            key (str): Entry key.
+
+        Returns:
+            dict: Stored value, or None if the entry is missing.
+        """
+        path = self._entry(key, '.json')
+        try:
+            with open(path) as meta_file:
+                meta = json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+        self._touch(path)
+        return meta
+
+    def put_meta(self, key, meta):
+        """
+        Store a JSON entry.
+
+        Args:
+            key (str): Entry key.
+            meta (dict): JSON serializable value.
+        """
+        self._write(self._entry(key, '.json'), lambda tmp_file: tmp_file.write(json.dumps(meta).encode()))
+
+    def get_or_compute(self, key, compute):
+        """
+        Load an array entry, computing and storing it if it is missing.
+
+        Args:
+            key (str): Entry key.
+            compute (callable): Called without arguments to produce the array.
+
+        Returns:
+            np.ndarray: Read-only memory-mapped array.
+        """
+        array = self.get(key)
+        if array is None:
+            array = self.put(key, compute())
+        return array
+
+    def read(self, path):
+        """
+        Read a WAV file through the cache.
+
+        Args:
+            path (str): Path to the audio file.
+
+        Returns:
+            tuple: rate, data (read-only memory-mapped), content hash of the file
+        """
+        source = self.source_key(path)
+        key = self.key(source, 'read')
+        meta = self.get_meta(key)
+        data = self.get(key) if meta else None
+        if data is None:
+            rate, samples = read_wav(path)
+            data = self.put(key, samples)
+            self.put_meta(key, {'rate': int(rate)})
+            return rate, data, source
+        return meta['rate'], data, source
+
+    def size(self):
+        """
+        Total size of the entries in bytes.
+        """
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def _entries(self):
+        return [entry for entry in os.scandir(self.directory)
+                if entry.is_file() and entry.name.endswith(('.npy', '.json'))]
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the cache fits in max_bytes.
+
+        Returns:
+            int: Number of bytes freed.
+        """
+        with file_lock(self._lock_path):
+            entries = []
+            for entry in self._entries():
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            freed = 0
+            for _, size, path in sorted(entries):
+                if total - freed <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    # Still mapped by a reader on platforms that cannot unlink open files
+                    continue
+                freed += size
+            # The scan also corrects the running count for entries changed outside the cache
+            self._size_path.write_text(str(total - freed))
+        return freed
+
+    def clear(self):
+        """
+        Remove every entry.
+        """
+        with file_lock(self._lock_path):
+            for entry in self._entries():
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+            self._size_path.unlink(missing_ok=True)
+        self._hashes.clear()
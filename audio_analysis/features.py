@@ -0,0 +1,299 @@
+"""
+features.py
+This module provides frame-level features for quality checks of recordings and processed outputs.
+A FeatureExtractor cuts the signal into overlapping frames once, computes the time-domain features (RMS, peak,
+clipping, zero crossings) on those frames and the spectral features (centroid, rolloff, flatness and the energy
+in given bands, such as the notches of multi_band_stop_filter) on one shared transform per frame. Blocks of a
+file are consumed as they are read, so long recordings are processed in bounded memory, and the result is one
+compact float32 table with a column per feature.
+
+Usage:
+    extractor = FeatureExtractor(band_freqs=[1000, 5000, 7000], band_widths=[14, 14, 14])
+    table = extractor.extract_file('recording.wav')
+    table['time'], table['rms'], table['band_1000']
+    table = extractor.extract_audio(AudioAnalysis(path='recording.wav'))
+"""
+
+import numpy as np
+
+from .fft_backend import as_real, rfft, rfftfreq
+from .instrumentation import span
+from .stft import CHUNK_FRAMES, stft_frames, stft_window
+from .wavio import iter_blocks
+
+TIME_FEATURES = ('rms', 'peak', 'clipping', 'zero_crossing_rate')
+SPECTRAL_FEATURES = ('centroid', 'rolloff', 'flatness', 'bands')
+FEATURES = TIME_FEATURES + SPECTRAL_FEATURES
+DEFAULT_FEATURES = ('rms', 'peak', 'clipping', 'centroid', 'rolloff', 'bands')
+FRAME_LENGTH = 2048
+# Full scale of float samples; float data in this repository holds 16-bit sample values
+FLOAT_FULL_SCALE = 32768.0
+
+
+def full_scale_of(dtype):
+    """
+    Largest magnitude representable by a sample type.
+
+    Args:
+        dtype (np.dtype): Sample type.
+
+    Returns:
+        float: 2 ** (bits - 1) for integer types, FLOAT_FULL_SCALE for floating point.
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'u':
+        return float(2 ** (8 * dtype.itemsize - 1))
+    if dtype.kind == 'i':
+        return float(-np.iinfo(dtype).min)
+    return FLOAT_FULL_SCALE
+
+
+def band_bins(freqs, band_freq, band_width):
+    """
+    Bins of a frame spectrum that measure a band.
+
+    Band edges are inclusive, as in band_stop_mask. A band narrower than the bin spacing, such as a 14 Hz
+    notch in 2048-sample frames at 44.1 kHz (21.5 Hz per bin), still covers the bin nearest its centre, so
+    its energy is measured at the frame's resolution rather than read as zero.
+
+    Args:
+        freqs (np.ndarray): Frequency grid of the frame spectrum.
+        band_freq (float): Centre of the band.
+        band_width (float): Width of the band.
+
+    Returns:
+        tuple: start and stop bin indices.
+    """
+    start = np.searchsorted(freqs, band_freq - band_width / 2, side='left')
+    stop = np.searchsorted(freqs, band_freq + band_width / 2, side='right')
+    nearest = int(np.abs(freqs - band_freq).argmin())
+    return min(start, nearest), max(stop, nearest + 1)
+
+
+class FeatureTable(dict):
+    """
+    Columns of frame-level features by name, each a float32 view into one (columns, frames) array.
+
+    Attributes:
+        array (np.ndarray): The stacked columns, in the order of the keys.
+    """
+
+    def __init__(self, columns, array) -> None:
+        super().__init__(zip(columns, array))
+        self.array = array
+
+
+class FeatureExtractor:
+    """
+    Configurable set of frame-level features computed in one pass.
+
+    Level features are relative to the full scale of the samples, so an RMS of 1 is a full-scale square wave;
+    band energies are the mean-square level within each band on the same scale.
+
+    Attributes:
+        features (tuple): Features to compute, from FEATURES.
+        frame_length (int): Samples per frame, also the transform length.
+        hop (int): Samples between the starts of consecutive frames.
+        window (str): Window applied before the transform.
+        band_freqs (list): Centres of the bands whose energy is measured ('bands' feature); each band
+            covers at least the bin nearest its centre, see band_bins.
+        band_widths (list): Widths of those bands.
+        rolloff (float): Fraction of the spectral energy below the rolloff frequency.
+        clip_level (float): Fraction of full scale at which a sample counts as clipped.
+        chunk_frames (int): Frames transformed per call; bounds the temporary memory.
+    """
+
+    def __init__(self, features=DEFAULT_FEATURES, frame_length=FRAME_LENGTH, hop=None, window='hann',
+                 band_freqs=(), band_widths=(), rolloff=0.85, clip_level=0.999, chunk_frames=CHUNK_FRAMES) -> None:
+        unknown = set(features) - set(FEATURES)
+        if unknown:
+            raise ValueError(f"Unknown features: {', '.join(sorted(unknown))}, expected some of {FEATURES}")
+        if len(band_freqs) != len(band_widths):
+            raise ValueError("band_freqs and band_widths must have the same length")
+        self.features = tuple(feature for feature in FEATURES if feature in features)
+        self.frame_length = frame_length
+        self.hop = hop or frame_length // 2
+        self.window = window
+        self.band_freqs = [float(freq) for freq in band_freqs]
+        self.band_widths = [float(width) for width in band_widths]
+        self.rolloff = rolloff
+        self.clip_level = clip_level
+        self.chunk_frames = chunk_frames
+
+    def params(self):
+        """
+        Parameters that determine the result, for cache keys.
+        """
+        return {'features': list(self.features), 'frame_length': self.frame_length, 'hop': self.hop,
+                'window': self.window, 'band_freqs': self.band_freqs, 'band_widths': self.band_widths,
+                'rolloff': self.rolloff, 'clip_level': self.clip_level}
+
+    @property
+    def columns(self):
+        """
+        Names of the columns of the result, starting with the frame centre 'time'.
+        """
+        columns = ['time']
+        for feature in self.features:
+            if feature == 'bands':
+                columns += [f"band_{freq:g}" for freq in self.band_freqs]
+            else:
+                columns.append(feature)
+        return columns
+
+    def extract(self, data, rate, full_scale=None, block_size=1 << 16):
+        """
+        Compute the features of a signal.
+
+        Args:
+            data (np.ndarray): Audio data, (frames,) or (frames, channels); memory-mapped data is read block by block.
+            rate (int): Sampling rate.
+            full_scale (float): Full scale of the samples; defaults to full_scale_of(data.dtype).
+            block_size (int): Samples read per block.
+
+        Returns:
+            FeatureTable: One column per feature, one row per frame.
+        """
+        blocks = (data[start:start + block_size] for start in range(0, len(data), block_size))
+        return self.extract_blocks(blocks, rate, full_scale or full_scale_of(data.dtype))
+
+    def extract_audio(self, audio, full_scale=None):
+        """
+        Compute the features of an AudioAnalysis, through its cache when it has one.
+
+        Args:
+            audio (AudioAnalysis): Audio to analyse.
+            full_scale (float): Full scale of the samples; defaults to full_scale_of(audio.data.dtype).
+
+        Returns:
+            FeatureTable: One column per feature, one row per frame.
+        """
+        full_scale = full_scale or full_scale_of(audio.data.dtype)
+        array = audio._cached('features', lambda: self.extract(audio.data, audio.rate, full_scale).array,
+                              full_scale=full_scale, rate=int(audio.rate), **self.params())
+        return FeatureTable(self.columns, array)
+
+    def extract_file(self, path, block_size=1 << 16):
+        """
+        Compute the features of a WAV file, reading it block by block.
+
+        Args:
+            path (str): Path to the audio file.
+            block_size (int): Samples read per block.
+
+        Returns:
+            FeatureTable: One column per feature, one row per frame.
+        """
+        rate, dtype, blocks = iter_blocks(path, block_size)
+        with span('features', path=str(path)):
+            return self.extract_blocks(blocks, rate, full_scale_of(dtype))
+
+    def extract_blocks(self, blocks, rate, full_scale=FLOAT_FULL_SCALE):
+        """
+        Compute the features of a signal given as consecutive blocks of samples.
+
+        Frames that span two blocks are completed from the next block; samples after the last complete
+        frame are ignored, and a signal shorter than one frame is zero-padded to one frame.
+
+        Args:
+            blocks (iterable): Blocks of samples, (frames,) or (frames, channels).
+            rate (int): Sampling rate.
+            full_scale (float): Full scale of the samples.
+
+        Returns:
+            FeatureTable: One column per feature, one row per frame.
+        """
+        tables = []
+        pending = None
+        frames = 0
+        for block in blocks:
+            block = np.asarray(block)
+            block = block.reshape(len(block), -1)
+            pending = block if pending is None or not len(pending) else np.concatenate((pending, block))
+            if len(pending) < self.frame_length:
+                continue
+            count = (len(pending) - self.frame_length) // self.hop + 1
+            tables.append(self._table(pending[:(count - 1) * self.hop + self.frame_length], rate, full_scale, frames))
+            frames += count
+            pending = pending[count * self.hop:]
+        if not frames:
+            samples = np.zeros((self.frame_length, 1 if pending is None else pending.shape[1]))
+            if pending is not None:
+                samples[:len(pending)] = pending
+            tables.append(self._table(samples, rate, full_scale, 0))
+        array = tables[0] if len(tables) == 1 else np.concatenate(tables, axis=1)
+        return FeatureTable(self.columns, array)
+
+    def _table(self, samples, rate, full_scale, first):
+        # Features of the complete frames of (samples, channels), frame indices starting at first
+        length, hop = self.frame_length, self.hop
+        count = (len(samples) - length) // hop + 1
+        starts = np.arange(count) * hop
+        table = np.empty((len(self.columns), count), dtype=np.float32)
+        table[0] = ((first + np.arange(count)) * hop + length / 2) / rate
+        row = 1
+
+        def frame_sums(per_sample):
+            # Sum of a per-sample series over every frame, through its running sum
+            totals = np.concatenate(([0], np.cumsum(per_sample, dtype=np.int64)))
+            return totals[starts + length] - totals[starts]
+
+        samples = as_real(samples)
+        mono = (samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]) / full_scale
+        frames = stft_frames(mono, length, hop)
+        for feature in self.features:
+            if feature == 'rms':
+                table[row] = np.sqrt(np.einsum('ij,ij->i', frames, frames) / length)
+            elif feature == 'peak':
+                table[row] = stft_frames(np.abs(samples).max(axis=1), length, hop).max(axis=1) / full_scale
+            elif feature == 'clipping':
+                table[row] = frame_sums((np.abs(samples) >= self.clip_level * full_scale).sum(axis=1))
+            elif feature == 'zero_crossing_rate':
+                crossings = np.concatenate(([False], np.signbit(mono[1:]) != np.signbit(mono[:-1])))
+                table[row] = (frame_sums(crossings) - crossings[starts]) / (length - 1)
+            else:
+                break
+            row += 1
+        if row < len(table):
+            self._spectral(frames, rate, table[row:])
+        return table
+
+    def _spectral(self, frames, rate, table):
+        # Spectral features, one transform per frame, chunk_frames frames at a time
+        length = self.frame_length
+        taps = stft_window(self.window, length).astype(frames.dtype, copy=False)
+        # Frame-sized grids are built here rather than through analysis.frequency_grid, whose few cached grids
+        # are kept for the spectra of whole signals
+        freqs = rfftfreq(length, rate)
+        bands = [band_bins(freqs, freq, width) for freq, width in zip(self.band_freqs, self.band_widths)]
+        # Power spectral density times the bin width: the mean-square level carried by each bin
+        scale = 1 / (length * (taps ** 2).sum())
+        with span('features.spectral', frames=len(frames)):
+            for start in range(0, len(frames), self.chunk_frames):
+                spectrum = rfft(frames[start:start + self.chunk_frames] * taps, axis=1)
+                power = spectrum.real ** 2 + spectrum.imag ** 2
+                power *= scale
+                power[:, 1:-1 if length % 2 == 0 else None] *= 2
+                total = power.sum(axis=1)
+                silent = total <= 0
+                safe_total = np.where(silent, 1, total)
+                columns = slice(start, start + len(power))
+                row = 0
+                for feature in self.features:
+                    if feature == 'centroid':
+                        table[row, columns] = np.where(silent, 0, power @ freqs / safe_total)
+                    elif feature == 'rolloff':
+                        below = (np.cumsum(power, axis=1) < self.rolloff * total[:, None]).sum(axis=1)
+                        table[row, columns] = np.where(silent, 0, freqs[np.minimum(below, len(freqs) - 1)])
+                    elif feature == 'flatness':
+                        floor = np.finfo(power.dtype).tiny
+                        geometric = np.exp(np.log(np.maximum(power, floor)).mean(axis=1))
+                        table[row, columns] = np.where(silent, 0, geometric / (safe_total / power.shape[1]))
+                    elif feature == 'bands':
+                        for band_start, band_stop in bands:
+                            table[row, columns] = power[:, band_start:band_stop].sum(axis=1)
+                            row += 1
+                        continue
+                    else:
+                        continue
+                    row += 1
@@ -0,0 +1,226 @@
+"""
+fft_backend.py
+This module provides the FFT layer shared by the analysis code.
+All transforms go through scipy.fft with a configurable number of worker threads. Signals can be zero-padded
+to a fast (5-smooth) length so that transform time does not depend on how the signal length factors; the
+inverse transform trims the padding again. Padding is off by default because it turns the circular
+filtering of the exact-length spectrum into linear filtering, which changes filter results near the ends
+of a signal.
+
+Transforms run in a working precision, 'double' (float64 / complex128, the default) or 'single'
+(float32 / complex64). Integer samples are converted to the working real type, floating samples and
+spectra wider than the working precision are narrowed to it, and narrower ones are kept, so single
+precision halves the memory of every signal and spectrum from the first transform to the last.
+"""
+
+from contextlib import contextmanager
+
+import numpy as np
+import scipy.fft
+
+from .instrumentation import span
+
+_options = {
+    'workers': None,
+    'pad': False,
+    'real_dtype': np.float64,
+}
+
+PRECISIONS = {
+    'double': np.float64,
+    'single': np.float32,
+}
+
+
+def get_fft_options():
+    """
+    Get the current FFT options.
+
+    Returns:
+        dict: workers, pad and real_dtype.
+    """
+    return dict(_options)
+
+
+def set_fft_options(**options):
+    """
+    Change the FFT options for the whole process.
+
+    Args:
+        workers (int): Number of threads used by each transform; None uses one thread, -1 uses all cores.
+        pad (bool): Whether spectra are computed over a zero-padded fast length.
+        real_dtype (np.dtype or str): Working precision of transforms: float64 or float32, 'double' or 'single'.
+
+    Returns:
+        dict: The previous options.
+    """
+    unknown = set(options) - set(_options)
+    if unknown:
+        raise ValueError(f"Unknown FFT options: {', '.join(sorted(unknown))}")
+    if 'real_dtype' in options:
+        options['real_dtype'] = precision_dtype(options['real_dtype']).type
+    previous = get_fft_options()
+    _options.update(options)
+    return previous
+
+
+def precision_dtype(precision=None):
+    """
+    Real floating type of a working precision.
+
+    Args:
+        precision (str or np.dtype): 'single', 'double' or a floating type; None uses the real_dtype option.
+
+    Returns:
+        np.dtype: float32 or float64.
+    """
+    if precision is None:
+        return np.dtype(_options['real_dtype'])
+    dtype = np.dtype(PRECISIONS.get(precision, precision) if isinstance(precision, str) else precision)
+    if dtype not in (np.float32, np.float64):
+        raise ValueError(f"Unknown precision {precision!r}, expected one of {tuple(PRECISIONS)}")
+    return dtype
+
+
+def as_real(data, precision=None):
+    """
+    Convert samples to the working precision.
+
+    Integer samples are converted to the working real type and wider floating samples are narrowed
+    to it; samples already at or below the working precision are returned unchanged.
+
+    Args:
+        data (np.ndarray): Real signal.
+        precision (str or np.dtype): Working precision, see precision_dtype.
+
+    Returns:
+        np.ndarray: Floating signal.
+    """
+    data = np.asarray(data)
+    dtype = precision_dtype(precision)
+    if data.dtype.kind in 'iub' or (data.dtype.kind == 'f' and data.dtype.itemsize > dtype.itemsize):
+        return data.astype(dtype)
+    return data
+
+
+def as_complex(amplitude, precision=None):
+    """
+    Narrow a spectrum to the complex type of the working precision.
+
+    Args:
+        amplitude (np.ndarray): Complex spectrum.
+        precision (str or np.dtype): Working precision, see precision_dtype.
+
+    Returns:
+        np.ndarray: Spectrum, complex64 in single precision.
+    """
+    amplitude = np.asarray(amplitude)
+    dtype = np.result_type(precision_dtype(precision), np.complex64)
+    if amplitude.dtype.itemsize > dtype.itemsize:
+        return amplitude.astype(dtype)
+    return amplitude
+
+
+@contextmanager
+def fft_options(**options):
+    """
+    Temporarily change the FFT options.
+
+    Args:
+        **options: Options accepted by set_fft_options.
+    """
+    previous = set_fft_options(**options)
+    try:
+        yield
+    finally:
+        _options.clear()
+        _options.update(previous)
+
+
+def fft_length(length):
+    """
+    Transform length used for a signal of the given length.
+
+    Args:
+        length (int): Number of samples in the signal.
+
+    Returns:
+        int: The next fast length when padding is enabled, otherwise length.
+    """
+    if _options['pad'] and length > 0:
+        return scipy.fft.next_fast_len(length, real=True)
+    return length
+
+
+def infer_fft_length(bins, length):
+    """
+    Find the transform length a spectrum with the given number of bins was computed with.
+
+    Args:
+        bins (int): Number of bins of the real spectrum.
+        length (int): Number of samples in the signal.
+
+    Returns:
+        int: Transform length.
+    """
+    for candidate in (length, scipy.fft.next_fast_len(length, real=True) if length > 0 else length):
+        if candidate // 2 + 1 == bins:
+            return candidate
+    return 2 * (bins - 1)
+
+
+def rfft(data, n=None, axis=-1, precision=None):
+    """
+    Real-input FFT.
+
+    Args:
+        data (np.ndarray): Real signal.
+        n (int): Transform length; the signal is zero-padded or truncated to it.
+        axis (int): Axis to transform over.
+        precision (str or np.dtype): Working precision, see precision_dtype.
+
+    Returns:
+        np.ndarray: Complex spectrum, complex64 for single precision signals.
+    """
+    with span('rfft') as stage:
+        data = as_real(data, precision)
+        amplitude = scipy.fft.rfft(data, n=n, axis=axis, workers=_options['workers'])
+        stage.arrays(data=data, amplitude=amplitude)
+    return amplitude
+
+
+def irfft(amplitude, n=None, length=None, axis=-1, precision=None):
+    """
+    Inverse of rfft.
+
+    Args:
+        amplitude (np.ndarray): Complex spectrum.
+        n (int): Transform length; defaults to 2 * (bins - 1).
+        length (int): Number of samples to keep, to remove padding added by rfft.
+        axis (int): Axis to transform over.
+        precision (str or np.dtype): Working precision, see precision_dtype.
+
+    Returns:
+        np.ndarray: Real signal, float32 for single precision spectra.
+    """
+    with span('irfft') as stage:
+        amplitude = as_complex(amplitude, precision)
+        data = scipy.fft.irfft(amplitude, n=n, axis=axis, workers=_options['workers'])
+        if length is not None and length < data.shape[axis]:
+            data = data[(slice(None),) * (axis % data.ndim) + (slice(length),)]
+        stage.arrays(amplitude=amplitude, data=data)
+    return data
+
+
+def rfftfreq(n, rate):
+    """
+    Frequency grid of a real spectrum.
+
+    Args:
+        n (int): Transform length.
+        rate (int): Sampling rate.
+
+    Returns:
+        np.ndarray: Frequency of each bin.
+    """
+    return scipy.fft.rfftfreq(n, 1 / rate)
@@ -0,0 +1,236 @@
+"""
+instrumentation.py
+This module provides opt-in timing and memory instrumentation of the processing stages.
+The analysis code marks its stages (reading, transforms, masking, resampling, conversion, writing and
+plotting) with span(). While no recording is active a span does nothing; inside recording() every span
+records its wall time, the sizes of the arrays it reports, and, when memory tracking is requested, the
+bytes it allocated through Python and NumPy. Spans nest per thread, and the records can be exported as
+plain dictionaries or as a Chrome trace (chrome://tracing, Perfetto).
+"""
+
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+_recorder = None
+
+
+class Recorder:
+    """
+    Collects the spans of one recording.
+
+    Attributes:
+        memory (bool): Whether allocations are tracked with tracemalloc.
+        records (list): Finished spans, in the order they ended.
+    """
+
+    def __init__(self, memory=False) -> None:
+        self.memory = memory
+        self.records = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_id = 0
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _new_id(self):
+        with self._lock:
+            self._next_id += 1
+            return self._next_id
+
+    def _add(self, record):
+        with self._lock:
+            self.records.append(record)
+
+    def to_records(self):
+        """
+        Get the finished spans sorted by start time.
+
+        Returns:
+            list: One dict per span with id, parent, name, depth, pid, tid, start, seconds, attrs and,
+                when memory is tracked, allocated_bytes and peak_bytes.
+        """
+        return sorted(self.records, key=lambda record: record['start'])
+
+
+class Span:
+    """
+    A timed stage. Use it through span().
+
+    Attributes:
+        name (str): Name of the stage.
+        attrs (dict): Values recorded with the span.
+    """
+
+    def __init__(self, recorder, name, attrs) -> None:
+        self.recorder = recorder
+        self.name = name
+        self.attrs = attrs
+        self._peak = 0
+
+    def arrays(self, **arrays):
+        """
+        Record the shape, dtype and size of arrays handled by the stage.
+
+        Args:
+            **arrays: Arrays by name.
+        """
+        for name, array in arrays.items():
+            if array is not None:
+                self.attrs[name] = {'shape': list(getattr(array, 'shape', ())), 'dtype': str(getattr(array, 'dtype', '')),
+                                    'nbytes': int(getattr(array, 'nbytes', 0))}
+
+    def __enter__(self):
+        stack = self.recorder._stack()
+        self._parent = stack[-1] if stack else None
+        self._id = self.recorder._new_id()
+        if self.recorder.memory and tracemalloc.is_tracing():
+            self._start_memory, peak = tracemalloc.get_traced_memory()
+            if self._parent:
+                self._parent._peak = max(self._parent._peak, peak)
+            tracemalloc.reset_peak()
+        stack.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self._start
+        self.recorder._stack().pop()
+        record = {'id': self._id, 'parent': self._parent._id if self._parent else None, 'name': self.name,
+                  'depth': len(self.recorder._stack()), 'pid': os.getpid(), 'tid': threading.get_ident(),
+                  'start': self._start, 'seconds': seconds, 'attrs': self.attrs}
+        if self.recorder.memory and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(self._peak, peak)
+            record['allocated_bytes'] = current - self._start_memory
+            record['peak_bytes'] = peak - self._start_memory
+            if self._parent:
+                self._parent._peak = max(self._parent._peak, peak)
+        self.recorder._add(record)
+        return False
+
+
+class _NullSpan:
+    def arrays(self, **arrays):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, **attrs):
+    """
+    Mark a stage of processing.
+
+    Args:
+        name (str): Name of the stage.
+        **attrs: Values to record with the span, for example the number of frames.
+
+    Returns:
+        Span: Context manager; its arrays() method records array sizes. When no recording is
+            active a shared no-op span is returned.
+    """
+    recorder = _recorder
+    if recorder is None:
+        return _NULL_SPAN
+    return Span(recorder, name, attrs)
+
+
+def traced(name=None):
+    """
+    Decorator that runs a function inside a span.
+
+    Args:
+        name (str): Name of the span; defaults to the function name.
+    """
+    def decorator(function):
+        span_name = name or function.__name__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return function(*args, **kwargs)
+            with span(span_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def is_recording():
+    return _recorder is not None
+
+
+@contextmanager
+def recording(memory=False):
+    """
+    Record the spans of everything run inside the block.
+
+    Args:
+        memory (bool): Also track allocations with tracemalloc; this slows processing down noticeably.
+
+    Yields:
+        Recorder: The recorder collecting the spans.
+    """
+    global _recorder
+    previous = _recorder
+    recorder = Recorder(memory=memory)
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    _recorder = recorder
+    try:
+        yield recorder
+    finally:
+        _recorder = previous
+        if started_tracing:
+            tracemalloc.stop()
+
+
+def chrome_trace(records):
+    """
+    Convert span records to the Chrome trace event format.
+
+    Records of several processes, such as those collected by a batch run, can be combined in one trace.
+
+    Args:
+        records (list): Span records, as returned by Recorder.to_records.
+
+    Returns:
+        dict: Trace with one complete ('X') event per span, times in microseconds.
+    """
+    origin = min((record['start'] for record in records), default=0.0)
+    events = []
+    for record in records:
+        args = dict(record['attrs'])
+        for key in ('allocated_bytes', 'peak_bytes'):
+            if key in record:
+                args[key] = record[key]
+        events.append({'name': record['name'], 'ph': 'X', 'pid': record['pid'], 'tid': record['tid'],
+                       'ts': (record['start'] - origin) * 1e6, 'dur': record['seconds'] * 1e6, 'args': args})
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def write_chrome_trace(records, path):
+    """
+    Write span records as a Chrome trace JSON file.
+
+    Args:
+        records (list): Span records.
+        path (str): Path of the trace file.
+    """
+    with open(path, 'w') as trace_file:
+        json.dump(chrome_trace(records), trace_file)
@@ -0,0 +1,160 @@
+"""
+mixer.py
+This module provides a streaming mixer for combining many audio sources.
+Sources can be arrays in memory or WAV files on disk; they are pulled block by block, resampled to the
+mix rate when their rate differs, scaled by a per-source gain and accumulated in place into one reused
+block, so memory depends on the block size and number of sources rather than on the duration.
+"""
+
+from math import gcd
+
+import numpy as np
+
+from .resample import PolyphaseResampler
+from .wavio import read_wav, write_blocks
+
+
+class _Source:
+    """
+    One input of the mixer, delivering samples at the mix rate.
+    """
+
+    def __init__(self, blocks, channels, gain, resampler=None) -> None:
+        self.channels = channels
+        self.gain = gain
+        self._blocks = blocks
+        self._resampler = resampler
+        self._pending = np.zeros((0,) + channels)
+        self._exhausted = False
+
+    def _next_chunk(self):
+        if self._exhausted:
+            return None
+        block = next(self._blocks, None)
+        if block is None:
+            self._exhausted = True
+            return self._resampler.flush() if self._resampler else None
+        return self._resampler.process(block) if self._resampler else block
+
+    def add_into(self, out, scratch):
+        """
+        Add the next len(out) samples, scaled by the gain, into out.
+
+        A mono source is added to every channel of a multi-channel mix.
+
+        Returns:
+            int: Number of samples added; less than len(out) once the source is exhausted.
+        """
+        filled = 0
+        while filled < len(out):
+            if not len(self._pending):
+                chunk = self._next_chunk()
+                if chunk is None:
+                    break
+                self._pending = chunk
+                continue
+            take = min(len(self._pending), len(out) - filled)
+            pending = self._pending[:take]
+            if pending.ndim < out.ndim:
+                pending = pending.reshape(pending.shape + (1,) * (out.ndim - pending.ndim))
+            if self.gain == 1:
+                np.add(out[filled:filled + take], pending, out=out[filled:filled + take], casting='same_kind')
+            else:
+                np.multiply(pending, self.gain, out=scratch[:take], casting='same_kind')
+                out[filled:filled + take] += scratch[:take]
+            self._pending = self._pending[take:]
+            filled += take
+        return filled
+
+
+class Mixer:
+    """
+    Streaming mixer of audio sources with different rates and gains.
+
+    Attributes:
+        rate (int): Sampling rate of the mix.
+        block_size (int): Number of samples produced per block.
+        length (str): 'shortest' to stop with the shortest source, 'longest' to continue until
+            every source is exhausted.
+        dtype (np.dtype): Floating type of the mix blocks.
+    """
+
+    def __init__(self, rate, block_size=1 << 16, length='shortest', dtype=np.float32) -> None:
+        if length not in ('shortest', 'longest'):
+            raise ValueError("length must be 'shortest' or 'longest'")
+        self.rate = rate
+        self.block_size = block_size
+        self.length = length
+        self.dtype = np.dtype(dtype)
+        self._sources = []
+
+    def add_source(self, source, rate=None, gain=1.0):
+        """
+        Add a source to the mix.
+
+        Args:
+            source (str or np.ndarray): Path to a WAV file, or audio data, (frames,) or (frames, channels). Sources
+                with channels must all have the same number; mono sources are added to every channel.
+            rate (int): Sampling rate of audio data; read from the file for paths and defaults to the mix rate.
+            gain (float): Factor applied to the source's samples.
+        """
+        if isinstance(source, np.ndarray):
+            rate = rate or self.rate
+        else:
+            rate, source = read_wav(source)
+        channels = source.shape[1:]
+        widest = max((other.channels for other in self._sources), key=len, default=())
+        if channels and widest and channels != widest:
+            raise ValueError(f"Cannot mix sources with {channels[0]} and {widest[0]} channels")
+        blocks = (source[start:start + self.block_size] for start in range(0, len(source), self.block_size))
+        resampler = None
+        if rate != self.rate:
+            divisor = gcd(int(self.rate), int(rate))
+            resampler = PolyphaseResampler(int(self.rate) // divisor, int(rate) // divisor)
+        self._sources.append(_Source(blocks, channels, gain, resampler))
+
+    def blocks(self):
+        """
+        Generate the mix block by block.
+
+        The same array is reused for every block, so copy a block to keep it past the next one.
+
+        Returns:
+            generator: Blocks of mixed samples.
+        """
+        if not self._sources:
+            return
+        channels = max((source.channels for source in self._sources), key=len)
+        block = np.empty((self.block_size,) + channels, dtype=self.dtype)
+        scratch = np.empty((self.block_size,) + channels, dtype=self.dtype)
+        while True:
+            block[:] = 0
+            counts = [source.add_into(block, scratch) for source in self._sources]
+            produced = min(counts) if self.length == 'shortest' else max(counts)
+            if produced:
+                yield block[:produced]
+            if produced < self.block_size:
+                return
+
+    def mix(self):
+        """
+        Mix every source in memory.
+
+        Returns:
+            np.ndarray: Mixed audio data.
+        """
+        blocks = [block.copy() for block in self.blocks()]
+        return np.concatenate(blocks) if blocks else np.zeros(0, dtype=self.dtype)
+
+    def write(self, out_path, dtype=np.int16):
+        """
+        Write the mix to a WAV file as it is produced.
+
+        Args:
+            out_path (str): Path to save the WAV file.
+            dtype (np.dtype): Integer sample type of the file.
+
+        Returns:
+            int: Number of samples written.
+        """
+        return write_blocks(out_path, self.rate, dtype, self.blocks())
@@ -0,0 +1,324 @@
+"""
+pipeline.py
+This module provides a lazy pipeline of AudioAnalysis operations.
+Operations are recorded as a graph of nodes and only run when the requested outputs are computed. Before
+running, the graph is turned into a plan that does the least work for the requested outputs:
+consecutive spectral masks are merged into one mask applied in a single pass, a spectrum or signal is
+only transformed when an output or a later operation reads it, branches that fan out from a node share
+its results, and reversal is a view of the samples whose spectrum and magnitude are derived from the
+parent's spectrum instead of being transformed again.
+
+Usage:
+    pipeline = Pipeline(AudioAnalysis(path='potc.wav'))
+    clean = pipeline.source.band_stop([1000, 5000, 7000], [14, 14, 14])
+    pipeline.output('clean', clean, 'amplitude', 'data')
+    pipeline.output('fast', clean.change_speed(2), 'data', 'magnitude')
+    pipeline.output('reversed', clean.reverse(), 'data', 'magnitude')
+    results = pipeline.run()
+"""
+
+import numpy as np
+
+from .analysis import along_frames, frequency_grid, get_filter_bank, low_pass_mask
+from .fft_backend import as_real, fft_length, get_fft_options, irfft, rfft
+from .instrumentation import span
+from .resample import change_speed
+
+FIELDS = ('data', 'amplitude', 'magnitude', 'frequency')
+
+
+class Node:
+    """
+    One operation of a pipeline. Nodes are created by the methods of the source node and of
+    other nodes, and are immutable.
+
+    Attributes:
+        op (str): 'source', 'mask', 'speed' or 'reverse'.
+        parent (Node): Input of the operation, None for the source.
+        params (dict): Parameters of the operation.
+    """
+
+    def __init__(self, pipeline, op, parent=None, **params) -> None:
+        self.pipeline = pipeline
+        self.op = op
+        self.parent = parent
+        self.params = params
+        self.depth = parent.depth + 1 if parent else 0
+
+    def __repr__(self):
+        params = ', '.join(f"{key}={value!r}" for key, value in self.params.items() if key != 'bank')
+        return f"{self.op}({params})"
+
+    def low_pass(self, cutoff_freq):
+        """
+        Zero every frequency above cutoff_freq.
+        """
+        return Node(self.pipeline, 'mask', self, kind='low_pass', cutoff_freq=cutoff_freq)
+
+    def band_stop(self, band_freqs, band_widths):
+        """
+        Zero one or more frequency bands.
+        """
+        return Node(self.pipeline, 'mask', self, kind='band_stop', band_freqs=list(band_freqs),
+                    band_widths=list(band_widths), bank=get_filter_bank(band_freqs, band_widths))
+
+    def change_speed(self, speed_factor, method='polyphase'):
+        """
+        Play the audio faster or slower at the same rate, see resample.change_speed.
+        """
+        return Node(self.pipeline, 'speed', self, speed_factor=speed_factor, method=method)
+
+    def reverse(self):
+        """
+        Reverse the audio.
+        """
+        return Node(self.pipeline, 'reverse', self)
+
+
+class Pipeline:
+    """
+    Lazy pipeline of operations on one audio source.
+
+    Attributes:
+        audio (AudioAnalysis): Source audio; its precision is used throughout, and a spectrum it
+            already holds is used instead of transforming the source again.
+        source (Node): Node of the source audio, the start of every chain of operations.
+        outputs (dict): Requested outputs by name, as (node, fields).
+    """
+
+    def __init__(self, audio) -> None:
+        self.audio = audio
+        self.source = Node(self, 'source')
+        self.outputs = {}
+
+    def output(self, name, node, *fields):
+        """
+        Request outputs of a node.
+
+        Args:
+            name (str): Key of the node's results in run().
+            node (Node): Node of this pipeline.
+            *fields (str): Any of 'data', 'amplitude', 'magnitude' and 'frequency'; defaults to 'data'.
+        """
+        if node.pipeline is not self:
+            raise ValueError("node belongs to another pipeline")
+        fields = fields or ('data',)
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown output fields: {', '.join(sorted(unknown))}, expected some of {FIELDS}")
+        self.outputs[name] = (node, fields)
+        return node
+
+    def plan(self):
+        """
+        Plan the steps that compute the requested outputs.
+
+        Returns:
+            list: Steps in execution order, as (action, node, extra) tuples. Actions are 'rfft', 'irfft',
+                'mask' (extra: the mask nodes merged into one pass and the node whose spectrum they apply
+                to), 'speed', 'reverse', 'reverse_spectrum' and 'magnitude'.
+        """
+        # The first pass finds every spectrum the outputs need; the second plans the steps knowing them, so a
+        # reversal takes its spectrum from its parent's whenever anything else needs the parent's spectrum,
+        # whatever the order in which the outputs are planned
+        needed = self._demand(_Planner(self.audio)).spectra()
+        return self._demand(_Planner(self.audio, needed)).steps
+
+    def _demand(self, planner):
+        # Shallow nodes first, so that intermediates shared by deeper outputs are planned once
+        for node, fields in sorted(self.outputs.values(), key=lambda output: output[0].depth):
+            for field in fields:
+                if field == 'data':
+                    planner.need_data(node)
+                elif field == 'amplitude':
+                    planner.need_spectrum(node)
+                elif field == 'magnitude':
+                    planner.need_magnitude(node)
+        return planner
+
+    def transform_count(self):
+        """
+        Number of rfft and irfft transforms the plan runs.
+        """
+        return sum(action in ('rfft', 'irfft') for action, _, _ in self.plan())
+
+    def run(self):
+        """
+        Compute the requested outputs.
+
+        Returns:
+            dict: For each output name, a dict with the requested fields plus 'rate' and 'n_fft'.
+        """
+        state = _State(self.audio)
+        for action, node, extra in self.plan():
+            with span(f"pipeline.{action}", node=repr(node)):
+                getattr(state, action)(node, extra)
+        results = {}
+        for name, (node, fields) in self.outputs.items():
+            result = {'rate': self.audio.rate, 'n_fft': state.n_fft(node)}
+            result.update((field, state.value(node, field)) for field in fields)
+            results[name] = result
+        return results
+
+
+class _Planner:
+    """
+    Demand-driven planning: each need_* method adds the steps that produce a value unless it is
+    already produced by an earlier step. `needed` holds the nodes whose spectrum an earlier pass found
+    to be needed, which a reversal may then derive its spectrum from.
+    """
+
+    def __init__(self, audio, needed=()) -> None:
+        self.steps = []
+        self.have = set()
+        self.needed = set(needed)
+        self.source_spectrum = audio._amplitude is not None
+        self.source_padded = audio.n_fft != len(audio.data)
+        self.padding = get_fft_options()['pad']
+
+    def _add(self, action, node, extra=None, produces=None):
+        self.steps.append((action, node, extra))
+        self.have.add((node, produces))
+
+    def spectra(self):
+        """
+        Nodes whose spectrum the planned steps produce.
+        """
+        return {node for node, produces in self.have if produces == 'spectrum'}
+
+    def need_data(self, node):
+        if (node, 'data') in self.have or node.op == 'source':
+            return
+        if node.op == 'mask':
+            self.need_spectrum(node)
+            self._add('irfft', node, produces='data')
+        else:
+            self.need_data(node.parent)
+            self._add(node.op, node, produces='data')
+
+    def need_spectrum(self, node):
+        if (node, 'spectrum') in self.have or (node.op == 'source' and self.source_spectrum):
+            return
+        if node.op == 'mask':
+            masks = [node]
+            base = node.parent
+            while base.op == 'mask' and (base, 'spectrum') not in self.have:
+                masks.append(base)
+                base = base.parent
+            self.need_spectrum(base)
+            self._add('mask', node, (base, masks[::-1]), produces='spectrum')
+        elif node.op == 'reverse' and self._has_spectrum(node.parent) and self._exact_spectrum(node.parent):
+            self._add('reverse_spectrum', node, produces='spectrum')
+        elif node.op == 'reverse' and node.parent in self.needed and self._exact_spectrum(node.parent):
+            self.need_spectrum(node.parent)
+            self._add('reverse_spectrum', node, produces='spectrum')
+        else:
+            self.need_data(node)
+            self._add('rfft', node, produces='spectrum')
+
+    def need_magnitude(self, node):
+        # Reversal does not change the magnitude spectrum
+        while node.op == 'reverse' and self._exact_spectrum(node.parent):
+            node = node.parent
+        if (node, 'magnitude') in self.have:
+            return
+        self.need_spectrum(node)
+        self._add('magnitude', node, produces='magnitude')
+
+    def _exact_spectrum(self, node):
+        # A masked spectrum over padded samples also describes the padding that irfft trims, so the
+        # spectrum of the reversed samples can only be derived from it when nothing was padded
+        masked = False
+        while node.op in ('mask', 'reverse'):
+            masked = masked or node.op == 'mask'
+            node = node.parent
+        padded = self.source_padded if node.op == 'source' else self.padding
+        return not (masked and padded)
+
+    def _has_spectrum(self, node):
+        return (node, 'spectrum') in self.have or (node.op == 'source' and self.source_spectrum)
+
+
+class _State:
+    """
+    Values produced while running a plan.
+    """
+
+    def __init__(self, audio) -> None:
+        self.audio = audio
+        self.values = {'data': {}, 'spectrum': {}, 'magnitude': {}}
+        self._n_fft = {}
+
+    def data(self, node):
+        if node.op == 'source':
+            return self.audio.data
+        return self.values['data'][node]
+
+    def spectrum(self, node):
+        if node.op == 'source':
+            return self.values['spectrum'].get(node, self.audio._amplitude)
+        return self.values['spectrum'][node]
+
+    def value(self, node, field):
+        if field == 'data':
+            return self.data(node)
+        if field == 'amplitude':
+            return self.spectrum(node)
+        if field == 'frequency':
+            return frequency_grid(self.n_fft(node), self.audio.rate)
+        while node not in self.values['magnitude']:
+            node = node.parent
+        return self.values['magnitude'][node]
+
+    def length(self, node):
+        while node.op in ('mask', 'reverse'):
+            node = node.parent
+        return len(self.data(node))
+
+    def n_fft(self, node):
+        while node.op in ('mask', 'reverse'):
+            node = node.parent
+        if node not in self._n_fft:
+            self._n_fft[node] = self.audio.n_fft if node.op == 'source' else fft_length(len(self.data(node)))
+        return self._n_fft[node]
+
+    def rfft(self, node, extra):
+        self.values['spectrum'][node] = rfft(self.data(node), n=self.n_fft(node), axis=0,
+                                             precision=self.audio.precision)
+
+    def irfft(self, node, extra):
+        self.values['data'][node] = irfft(self.spectrum(node), n=self.n_fft(node), length=self.length(node), axis=0,
+                                          precision=self.audio.precision)
+
+    def mask(self, node, extra):
+        base, masks = extra
+        spectrum = self.spectrum(base)
+        n_fft, rate = self.n_fft(node), self.audio.rate
+        frequency = frequency_grid(n_fft, rate)
+        stop = np.zeros(len(frequency), dtype=bool)
+        for mask_node in masks:
+            if mask_node.params['kind'] == 'low_pass':
+                stop |= low_pass_mask(frequency, mask_node.params['cutoff_freq'])
+            else:
+                for start, end in mask_node.params['bank'].bin_ranges(n_fft, rate):
+                    stop[start:end] = True
+        self.values['spectrum'][node] = np.where(along_frames(stop, spectrum.ndim), 0, spectrum)
+
+    def speed(self, node, extra):
+        data = self.data(node.parent)
+        if node.params['method'] == 'polyphase':
+            data = as_real(data, self.audio.precision)
+        self.values['data'][node] = change_speed(data, node.params['speed_factor'], node.params['method'])
+
+    def reverse(self, node, extra):
+        self.values['data'][node] = self.data(node.parent)[::-1]
+
+    def reverse_spectrum(self, node, extra):
+        # x[L-1-n] has the spectrum conj(X[k]) * exp(-2j pi k (L-1) / N), with or without padding
+        spectrum = self.spectrum(node.parent)
+        n_fft, length = self.n_fft(node), self.length(node)
+        phase = np.exp(-2j * np.pi * (np.arange(len(spectrum)) * (length - 1) % n_fft) / n_fft)
+        self.values['spectrum'][node] = np.conj(spectrum) * along_frames(phase.astype(spectrum.dtype), spectrum.ndim)
+
+    def magnitude(self, node, extra):
+        self.values['magnitude'][node] = np.abs(self.spectrum(node))
@@ -1,15 +1,101 @@
 """
 plotlib.py
 This module provides functions to plot various aspects of audio data, including amplitude over time, amplitude-frequency spectrum, and spectrograms.
+Series are reduced to min/max envelopes at the output pixel width before plotting, and figures that are only
+saved are rendered on standalone Agg canvases that are never registered with pyplot, so nothing accumulates
+across calls and no display is needed.
 """
 
-import matplotlib.pyplot as plt
+import matplotlib.style
 import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 
-plt.style.use('Solarize_Light2')
+from .instrumentation import traced
+from .stft import spectrogram
 
+STYLE = 'Solarize_Light2'
+matplotlib.style.use(STYLE)
 
-def plot_amplitude_frequency(amplitude, frequency, show=False, file_name=None, title="Amplitude-Frequency"):
+FIGSIZE = (10, 4)
+DPI = 300
+# Resolution of the plots saved by batch runs and the service, which opt into it for speed; DPI stays available
+OUTPUT_DPI = 100
+# zlib level for saved PNGs; encoding dominates the save time at higher levels
+PNG_COMPRESS_LEVEL = 1
+
+
+def envelope(x, y, width):
+    """
+    Reduce a series to the min/max envelope of `width` buckets.
+
+    Plotting the envelope draws the same image as plotting every point, because each bucket covers
+    at most one pixel column.
+
+    Args:
+        x (np.ndarray): Sorted x values.
+        y (np.ndarray): y values, (points,) or (points, channels) for one line per channel.
+        width (int): Number of buckets, usually the plot width in pixels.
+
+    Returns:
+        tuple: x, y of at most 2 * width points.
+    """
+    y = np.real(y)
+    if len(y) <= 2 * width:
+        return x, y
+    bucket = -(-len(y) // width)
+    full = len(y) // bucket * bucket
+    buckets = y[:full].reshape(-1, bucket, *y.shape[1:])
+    lows, highs = buckets.min(axis=1), buckets.max(axis=1)
+    starts = x[:full:bucket]
+    if full < len(y):
+        lows = np.concatenate((lows, y[full:].min(axis=0, keepdims=True)))
+        highs = np.concatenate((highs, y[full:].max(axis=0, keepdims=True)))
+        starts = np.append(starts, x[full])
+    return np.repeat(starts, 2), np.stack((lows, highs), axis=1).reshape(-1, *y.shape[1:])
+
+
+def _figure(show, figsize=FIGSIZE):
+    if show:
+        # pyplot and its interactive backend are only needed to show figures
+        import matplotlib.pyplot as plt
+        return plt.figure(figsize=figsize)
+    figure = Figure(figsize=figsize)
+    FigureCanvasAgg(figure)
+    return figure
+
+
+def _finish(figure, show, file_name, dpi):
+    if file_name:
+        options = {'pil_kwargs': {'compress_level': PNG_COMPRESS_LEVEL}} if str(file_name).lower().endswith('.png') else {}
+        figure.savefig(file_name, dpi=dpi, bbox_inches='tight', **options)
+    if show:
+        import matplotlib.pyplot as plt
+        plt.show()
+        plt.close(figure)
+
+
+def _pixel_width(ax, dpi):
+    return max(int(ax.get_position().width * ax.figure.get_figwidth() * dpi), 1)
+
+
+def plot_columns(dpi=DPI, figsize=FIGSIZE):
+    """
+    Pixel width of the axes of a single plot, the number of spectrogram columns worth computing for it.
+
+    Args:
+        dpi (int): Resolution of the saved plot.
+        figsize (tuple): Figure size in inches.
+
+    Returns:
+        int: Pixel columns of the axes.
+    """
+    params = matplotlib.rcParams
+    return max(int((params['figure.subplot.right'] - params['figure.subplot.left']) * figsize[0] * dpi), 1)
+
+
+@traced()
+def plot_amplitude_frequency(amplitude, frequency, show=False, file_name=None, title="Amplitude-Frequency", ax=None, dpi=DPI):
     """
     Plot the amplitude-frequency spectrum.
 
@@ -19,20 +105,66 @@ def plot_amplitude_frequency(amplitude, frequency, show=False, file_name=None, t
         show (bool): Whether to display the plot.
         file_name (str): Filename to save the plot.
         title (str): Title of the plot.
+        ax (matplotlib.axes.Axes): Axes to draw into instead of a new figure.
+        dpi (int): Resolution of the saved plot.
     """
-    plt.figure(figsize=(10, 4))
-    plt.plot(frequency, amplitude)
-    plt.xlabel('Frequency (Hz)')
-    plt.ylabel('Amplitude')
-    plt.title(title)
-    plt.grid(True)
-    if show:
-        plt.show()
-    if file_name:
-        plt.savefig(file_name, dpi=300, bbox_inches='tight')
+    figure = None if ax else _figure(show)
+    ax = ax or figure.add_subplot()
+    ax.plot(*envelope(np.asarray(frequency), np.asarray(amplitude), _pixel_width(ax, dpi)))
+    ax.set_xlabel('Frequency (Hz)')
+    ax.set_ylabel('Amplitude')
+    ax.set_title(title)
+    ax.grid(True)
+    if figure:
+        _finish(figure, show, file_name, dpi)
+
+
+def draw_waveform(ax, view, title="Waveform"):
+    """
+    Draw a waveform summary, such as a pyramid view, into axes.
+
+    Each channel is drawn as the band between the block minima and maxima with its RMS band inside.
+
+    Args:
+        ax (matplotlib.axes.Axes): Axes to draw into.
+        view (pyramid.WaveformView): Waveform summary to draw.
+        title (str): Title of the plot.
+    """
+    for channel in range(view.lows.shape[1]):
+        lows, highs, rms = view.lows[:, channel], view.highs[:, channel], view.rms[:, channel]
+        # Fixed colours, so a channel keeps its colour when the view is redrawn
+        color = f"C{channel}"
+        if view.block == 1:
+            ax.plot(view.times, lows, color=color, linewidth=0.8)
+            continue
+        ax.fill_between(view.times, lows, highs, step='post', color=color, linewidth=0, alpha=0.5)
+        ax.fill_between(view.times, -rms, rms, step='post', color=color, linewidth=0, alpha=0.8)
+    ax.set_xlabel('Time')
+    ax.set_ylabel('Amplitude')
+    ax.set_title(title)
 
 
-def plot_spectrogram(data, rate, show=False, file_name=None, title="Spectrogram"):
+def draw_spectrogram(ax, spec, title="Spectrogram", colorbar=True):
+    """
+    Draw a computed spectrogram into axes.
+
+    Args:
+        ax (matplotlib.axes.Axes): Axes to draw into.
+        spec (stft.Spectrogram): Spectrogram to draw.
+        title (str): Title of the plot.
+        colorbar (bool): Whether to add a colour bar.
+    """
+    im = ax.imshow(spec.to_db(), origin='lower', aspect='auto', extent=spec.extent(), interpolation='nearest')
+    ax.set_xlabel('Time')
+    ax.set_ylabel('Frequency')
+    ax.set_title(title)
+    if colorbar:
+        cbar = ax.figure.colorbar(im, ax=ax)
+        cbar.set_label('Intensity (dB)')
+
+
+@traced()
+def plot_spectrogram(data, rate, show=False, file_name=None, title="Spectrogram", ax=None, dpi=DPI, spec=None):
     """
     Plot the spectrogram of the audio data.
 
@@ -42,22 +174,23 @@ def plot_spectrogram(data, rate, show=False, file_name=None, title="Spectrogram"
         show (bool): Whether to display the plot.
         file_name (str): Filename to save the plot.
         title (str): Title of the plot.
+        ax (matplotlib.axes.Axes): Axes to draw into instead of a new figure.
+        dpi (int): Resolution of the saved plot.
+        spec (stft.Spectrogram): Spectrogram already computed, for example by AudioAnalysis.spectrogram;
+            by default one column per output pixel is computed.
     """
-    plt.figure(figsize=(10, 4))
-    Pxx, freqs, bins, im = plt.specgram(data, Fs=rate)
-    plt.xlabel('Time')
-    plt.ylabel('Frequency')
-    plt.title(title)
-    plt.grid(True)
-    cbar = plt.colorbar(im)
-    cbar.set_label('Intensity (dB)')
-    if show:
-        plt.show()
-    if file_name:
-        plt.savefig(file_name, dpi=300, bbox_inches='tight')
+    figure = None if ax else _figure(show)
+    ax = ax or figure.add_subplot()
+    if spec is None:
+        spec = spectrogram(data, rate, max_columns=_pixel_width(ax, dpi))
+    draw_spectrogram(ax, spec, title)
+    ax.grid(True)
+    if figure:
+        _finish(figure, show, file_name, dpi)
 
 
-def plot_amplitude_time(data, rate, show=False, file_name=None, title="Amplitude-Time"):
+@traced()
+def plot_amplitude_time(data, rate, show=False, file_name=None, title="Amplitude-Time", ax=None, dpi=DPI):
     """
     Plot the amplitude of the audio data over time.
 
@@ -67,20 +200,22 @@ def plot_amplitude_time(data, rate, show=False, file_name=None, title="Amplitude
         show (bool): Whether to display the plot.
         file_name (str): Filename to save the plot.
         title (str): Title of the plot.
+        ax (matplotlib.axes.Axes): Axes to draw into instead of a new figure.
+        dpi (int): Resolution of the saved plot.
     """
-    plt.figure(figsize=(10, 4))
+    figure = None if ax else _figure(show)
+    ax = ax or figure.add_subplot()
     time = np.arange(0, len(data)) / rate
-    plt.plot(time, data)
-    plt.xlabel('Time')
-    plt.ylabel('Amplitude')
-    plt.title(title)
-    if show:
-        plt.show()
-    if file_name:
-        plt.savefig(file_name, dpi=300, bbox_inches='tight')
+    ax.plot(*envelope(time, np.asarray(data), _pixel_width(ax, dpi)))
+    ax.set_xlabel('Time')
+    ax.set_ylabel('Amplitude')
+    ax.set_title(title)
+    if figure:
+        _finish(figure, show, file_name, dpi)
 
 
-def subplot_spec_amp(data, rate, amplitude, frequency, show=False, file_name=None, title="Spectrogram and Amplitude-Frequency"):
+@traced()
+def subplot_spec_amp(data, rate, amplitude, frequency, show=False, file_name=None, title="Spectrogram and Amplitude-Frequency", dpi=DPI):
     """
     Create a subplot with the spectrogram and amplitude-frequency spectrum.
 
@@ -92,13 +227,11 @@ def subplot_spec_amp(data, rate, amplitude, frequency, show=False, file_name=Non
         show (bool): Whether to display the plot.
         file_name (str): Filename to save the plot.
         title (str): Title of the subplot.
+        dpi (int): Resolution of the saved plot.
     """
-    fig, axs = plt.subplots(1, 2, figsize=(12, 6))
-    plt.subplot(1, 2, 1)
-    plot_amplitude_frequency(amplitude, frequency, title="Amplitude-Frequency")
-    plt.subplot(1, 2, 2)
-    plot_spectrogram(data, rate, title="Spectrogram")
-    if show:
-        plt.show()
-    if file_name:
-        plt.savefig(file_name, dpi=300, bbox_inches='tight')
+    figure = _figure(show, figsize=(12, 6))
+    axs = figure.subplots(1, 2)
+    figure.suptitle(title)
+    plot_amplitude_frequency(amplitude, frequency, title="Amplitude-Frequency", ax=axs[0], dpi=dpi)
+    plot_spectrogram(data, rate, title="Spectrogram", ax=axs[1], dpi=dpi)
+    _finish(figure, show, file_name, dpi)
@@ -0,0 +1,356 @@
+"""
+pyramid.py
+This module provides level-of-detail pyramids for viewing long recordings.
+A pyramid holds, for every power-of-two block size, the minimum, maximum and RMS of each block of the
+waveform, and a spectrogram whose columns are averaged down by powers of two. It is built once, block by
+block, and stored as .npy files in a sidecar directory next to the WAV file that are memory-mapped when
+opened. A view of any time window then reads the coarsest level that still has a value per output pixel,
+so its cost grows with the number of pixels rather than with the length of the file.
+
+Usage:
+    pyramid = Pyramid.load('recording.wav')
+    wave = pyramid.waveform(3600.0, 3660.0, pixels=1600)
+    spec = pyramid.spectrogram(0.0, pyramid.duration, pixels=1600)
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+
+from .instrumentation import span
+from .stft import NFFT, Spectrogram, spectrogram, spectrogram_axes
+from .wavio import read_wav
+
+SIDECAR_SUFFIX = '.lod'
+FORMAT_VERSION = 1
+# Samples per block at the finest waveform level
+BASE_BLOCK = 64
+# Samples read per step while building
+BUILD_CHUNK = 1 << 20
+
+
+class WaveformView(NamedTuple):
+    """
+    Waveform summary over a time window.
+
+    Attributes:
+        times (np.ndarray): Start time of each block in seconds.
+        lows (np.ndarray): Minimum of each block, (blocks, channels).
+        highs (np.ndarray): Maximum of each block, (blocks, channels).
+        rms (np.ndarray): Root mean square of each block, (blocks, channels).
+        block (int): Samples per block; with 1 every block is a single sample and lows, highs are the samples.
+    """
+    times: np.ndarray
+    lows: np.ndarray
+    highs: np.ndarray
+    rms: np.ndarray
+    block: int
+
+
+def sidecar_path(path):
+    """
+    Directory of the pyramid of a WAV file.
+    """
+    return Path(f"{path}{SIDECAR_SUFFIX}")
+
+
+def _read_samples(path):
+    rate, data = read_wav(path)
+    return rate, data.reshape(len(data), -1)
+
+
+def _source_identity(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _block_counts(length, block):
+    counts = np.full(-(-length // block), block)
+    if length % block:
+        counts[-1] = length % block
+    return counts
+
+
+class Pyramid:
+    """
+    Memory-mapped level-of-detail pyramid of a WAV file. Use Pyramid.load, Pyramid.open or Pyramid.build.
+
+    Attributes:
+        path (Path): Source WAV file.
+        rate (int): Sampling rate.
+        length (int): Number of frames of the source.
+        channels (int): Number of channels of the source.
+        block (int): Samples per block at the finest waveform level; level k uses block << k.
+        nfft (int): Segment length of the spectrogram.
+        hop (int): Hop of the finest spectrogram level; level k averages 2 ** k of its columns.
+    """
+
+    def __init__(self, path, directory, meta) -> None:
+        self.path = Path(path)
+        self.directory = Path(directory)
+        self.meta = meta
+        self.rate = meta['rate']
+        self.length = meta['length']
+        self.channels = meta['channels']
+        self.block = meta['block']
+        self.nfft = meta['nfft']
+        self.hop = meta['hop']
+        self._samples = None
+
+        def load(name):
+            return np.load(self.directory / f"{name}.npy", mmap_mode='r')
+
+        self.wave_levels = [(load(f"min_{level}"), load(f"max_{level}"), load(f"rms_{level}"))
+                            for level in range(meta['wave_levels'])]
+        self.spec_levels = [load(f"stft_{level}") for level in range(meta['spec_levels'])]
+
+    @property
+    def duration(self):
+        return self.length / self.rate
+
+    @classmethod
+    def open(cls, path, directory=None):
+        """
+        Open the stored pyramid of a WAV file.
+
+        Args:
+            path (str): Source WAV file.
+            directory (str): Sidecar directory; defaults to the path with SIDECAR_SUFFIX appended.
+
+        Returns:
+            Pyramid: The pyramid, or None when it is missing, from another format version or older than the file.
+        """
+        directory = Path(directory or sidecar_path(path))
+        try:
+            with open(directory / 'meta.json') as meta_file:
+                meta = json.load(meta_file)
+        except (OSError, ValueError):
+            return None
+        if meta.get('version') != FORMAT_VERSION or meta.get('source') != _source_identity(path):
+            return None
+        return cls(path, directory, meta)
+
+    @classmethod
+    def load(cls, path, directory=None, **build_options):
+        """
+        Open the stored pyramid of a WAV file, building it first when it is missing or stale.
+
+        Args:
+            path (str): Source WAV file.
+            directory (str): Sidecar directory.
+            **build_options: Passed to Pyramid.build.
+
+        Returns:
+            Pyramid: The pyramid.
+        """
+        return cls.open(path, directory) or cls.build(path, directory, **build_options)
+
+    @classmethod
+    def build(cls, path, directory=None, block=BASE_BLOCK, nfft=NFFT, hop=None, chunk=BUILD_CHUNK):
+        """
+        Build the pyramid of a WAV file and store it.
+
+        The source is memory-mapped and summarised chunk by chunk, and every level is written to a memory-mapped
+        file, so building needs little memory whatever the length of the file. The sidecar is written to a
+        temporary directory and moved into place when complete.
+
+        Args:
+            path (str): Source WAV file.
+            directory (str): Sidecar directory; defaults to the path with SIDECAR_SUFFIX appended.
+            block (int): Samples per block at the finest waveform level; a power of two.
+            nfft (int): Segment length of the spectrogram.
+            hop (int): Hop of the finest spectrogram level; defaults to nfft / 2.
+            chunk (int): Number of samples summarised per step.
+
+        Returns:
+            Pyramid: The new pyramid.
+        """
+        if block < 1 or block & (block - 1):
+            raise ValueError(f"block must be a power of two, got {block}")
+        directory = Path(directory or sidecar_path(path))
+        identity = _source_identity(path)
+        rate, data = _read_samples(path)
+        hop = hop or nfft // 2
+        chunk = max(chunk // block, 1) * block
+        tmp_dir = Path(tempfile.mkdtemp(dir=directory.parent, prefix=f".{directory.name}."))
+        try:
+            with span('pyramid', path=str(path), frames=len(data)):
+                wave_levels = _build_waveform(tmp_dir, data, block, chunk)
+                spec_levels = _build_spectrogram(tmp_dir, data, rate, nfft, hop, chunk)
+            meta = {'version': FORMAT_VERSION, 'source': identity, 'rate': int(rate), 'length': len(data),
+                    'channels': data.shape[1], 'dtype': data.dtype.str, 'block': block, 'nfft': nfft, 'hop': hop,
+                    'wave_levels': wave_levels, 'spec_levels': spec_levels}
+            with open(tmp_dir / 'meta.json', 'w') as meta_file:
+                json.dump(meta, meta_file)
+            if directory.exists():
+                shutil.rmtree(directory)
+            os.replace(tmp_dir, directory)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        return cls(path, directory, meta)
+
+    def _window(self, start, stop, unit):
+        # Sample range of a time window, clipped to the source
+        first = min(max(int(np.floor(start * self.rate)), 0), self.length)
+        last = self.length if stop is None else min(max(int(np.ceil(stop * self.rate)), first), self.length)
+        return first // unit, -(-last // unit)
+
+    def samples(self):
+        """
+        Memory-mapped frames of the source, (frames, channels).
+        """
+        if self._samples is None:
+            self._samples = _read_samples(self.path)[1]
+        return self._samples
+
+    def waveform(self, start=0.0, stop=None, pixels=1000):
+        """
+        Summarise the waveform over a time window.
+
+        The coarsest level with at least `pixels` blocks in the window is used, so at most about twice
+        `pixels` blocks are read. Windows shorter than `pixels` finest blocks are summarised from the samples,
+        which are then fewer than `pixels` times the finest block.
+
+        Args:
+            start (float): Start of the window in seconds.
+            stop (float): End of the window in seconds; defaults to the end of the file.
+            pixels (int): Number of values wanted across the window, usually its width in pixels.
+
+        Returns:
+            WaveformView: Block start times, minimum, maximum and RMS per block and channel.
+        """
+        first, last = self._window(start, stop, 1)
+        block = 1 << int(np.floor(np.log2(max((last - first) / max(pixels, 1), 1))))
+        if block < self.block:
+            # Finer than the finest level: summarise the few samples in the window directly
+            first = first // block * block
+            lows, highs, rms = _block_stats(np.asarray(self.samples()[first:last]), block)
+            return WaveformView((first + np.arange(len(lows)) * block) / self.rate, lows, highs, rms, block)
+        level = min(block.bit_length() - self.block.bit_length(), len(self.wave_levels) - 1)
+        block = self.block << level
+        lows, highs, rms = self.wave_levels[level]
+        first, last = first // block, -(-last // block)
+        return WaveformView(np.arange(first, last) * block / self.rate, lows[first:last], highs[first:last],
+                            rms[first:last], block)
+
+    def spectrogram(self, start=0.0, stop=None, pixels=1000):
+        """
+        Spectrogram over a time window.
+
+        The coarsest level with at least `pixels` columns in the window is used; the finest level is used
+        when even it has fewer.
+
+        Args:
+            start (float): Start of the window in seconds.
+            stop (float): End of the window in seconds; defaults to the end of the file.
+            pixels (int): Number of columns wanted across the window, usually its width in pixels.
+
+        Returns:
+            stft.Spectrogram: power (frequencies x columns) as a read-only view of the level, frequencies,
+                column centre times
+        """
+        first, last = self._window(start, stop, 1)
+        columns = max((last - first) / self.hop, 1)
+        level = min(int(np.floor(np.log2(max(columns / max(pixels, 1), 1)))), len(self.spec_levels) - 1)
+        power = self.spec_levels[level]
+        step = self.hop << level
+        first = min(max((first - self.nfft // 2) // step, 0), len(power) - 1)
+        last = min(max(-(-(last - self.nfft // 2) // step), first + 1), len(power))
+        freqs = np.fft.rfftfreq(self.nfft, 1 / self.rate)
+        # Column j of level k averages finest columns j * 2**k to (j + 1) * 2**k - 1
+        times = ((np.arange(first, last) + 0.5) * step - self.hop / 2 + self.nfft / 2) / self.rate
+        return Spectrogram(power[first:last].T, freqs, times)
+
+
+def _block_stats(samples, block):
+    # Minimum, maximum and RMS of consecutive blocks of (frames, channels) samples; the last may be partial
+    full = len(samples) // block * block
+    blocks = samples[:full].reshape(-1, block, samples.shape[1])
+    lows, highs = blocks.min(axis=1), blocks.max(axis=1)
+    squares = blocks.astype(np.float32)
+    rms = np.sqrt(np.einsum('ijk,ijk->ik', squares, squares) / block)
+    if full < len(samples):
+        tail = samples[full:]
+        lows = np.concatenate((lows, tail.min(axis=0, keepdims=True)))
+        highs = np.concatenate((highs, tail.max(axis=0, keepdims=True)))
+        tail_rms = np.sqrt(np.mean(tail.astype(np.float32) ** 2, axis=0, keepdims=True))
+        rms = np.concatenate((rms, tail_rms))
+    return lows, highs, rms
+
+
+def _build_waveform(directory, data, block, chunk):
+    length, channels = data.shape
+    counts = _block_counts(length, block)
+    levels = []
+    lows = np.lib.format.open_memmap(directory / 'min_0.npy', 'w+', data.dtype, (len(counts), channels))
+    highs = np.lib.format.open_memmap(directory / 'max_0.npy', 'w+', data.dtype, (len(counts), channels))
+    rms = np.lib.format.open_memmap(directory / 'rms_0.npy', 'w+', np.float32, (len(counts), channels))
+    with span('pyramid.waveform', level=0):
+        for start in range(0, length, chunk):
+            samples = np.asarray(data[start:start + chunk])
+            rows = slice(start // block, start // block + -(-len(samples) // block))
+            lows[rows], highs[rows], rms[rows] = _block_stats(samples, block)
+    levels.append((lows, highs, rms, counts))
+    while len(counts) > 1:
+        lows, highs, rms, counts = _halve_waveform(directory, len(levels), *levels[-1], chunk // block)
+        levels.append((lows, highs, rms, counts))
+    for lows, highs, rms, _ in levels:
+        for array in (lows, highs, rms):
+            array.flush()
+    return len(levels)
+
+
+def _halve_waveform(directory, level, lows, highs, rms, counts, chunk):
+    # Pairs of blocks merge into one; an odd last block is carried over on its own
+    size = -(-len(counts) // 2)
+    new_counts = np.add.reduceat(counts, np.arange(0, len(counts), 2))
+    new_lows = np.lib.format.open_memmap(directory / f"min_{level}.npy", 'w+', lows.dtype, (size,) + lows.shape[1:])
+    new_highs = np.lib.format.open_memmap(directory / f"max_{level}.npy", 'w+', highs.dtype, (size,) + highs.shape[1:])
+    new_rms = np.lib.format.open_memmap(directory / f"rms_{level}.npy", 'w+', np.float32, (size,) + rms.shape[1:])
+    chunk = max(chunk // 2 * 2, 2)
+    with span('pyramid.waveform', level=level):
+        for start in range(0, len(counts), chunk):
+            stop = min(start + chunk, len(counts))
+            pairs = np.arange(start, stop, 2)
+            rows = slice(start // 2, start // 2 + len(pairs))
+            new_lows[rows] = np.minimum.reduceat(lows[start:stop], pairs - start)
+            new_highs[rows] = np.maximum.reduceat(highs[start:stop], pairs - start)
+            weights = counts[start:stop, None]
+            energy = np.add.reduceat(rms[start:stop].astype(np.float64) ** 2 * weights, pairs - start)
+            new_rms[rows] = np.sqrt(energy / new_counts[rows, None])
+    return new_lows, new_highs, new_rms, new_counts
+
+
+def _build_spectrogram(directory, data, rate, nfft, hop, chunk):
+    length = len(data)
+    columns = len(spectrogram_axes(length, rate, nfft, hop)[1])
+    power = np.lib.format.open_memmap(directory / 'stft_0.npy', 'w+', np.float32, (columns, nfft // 2 + 1))
+    chunk_columns = max(chunk // hop, 1)
+    with span('pyramid.stft', level=0):
+        for first in range(0, columns, chunk_columns):
+            count = min(chunk_columns, columns - first)
+            samples = data[first * hop:(first + count - 1) * hop + nfft]
+            power[first:first + count] = spectrogram(np.asarray(samples), rate, nfft=nfft, hop=hop).power.T
+    levels = [power]
+    while len(levels[-1]) > 1:
+        previous = levels[-1]
+        level = len(levels)
+        size = -(-len(previous) // 2)
+        halved = np.lib.format.open_memmap(directory / f"stft_{level}.npy", 'w+', np.float32, (size, previous.shape[1]))
+        step = max(chunk_columns // 2 * 2, 2)
+        with span('pyramid.stft', level=level):
+            for start in range(0, len(previous), step):
+                rows = np.asarray(previous[start:start + step])
+                pairs = np.arange(0, len(rows), 2)
+                sizes = np.minimum(len(rows) - pairs, 2)[:, None]
+                halved[start // 2:start // 2 + len(pairs)] = np.add.reduceat(rows, pairs) / sizes
+        levels.append(halved)
+    for level in levels:
+        level.flush()
+    return len(levels)
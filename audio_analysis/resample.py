@@ -0,0 +1,225 @@
+"""
+resample.py
+This module provides the resampling used to change the speed of audio.
+Speed factors are turned into a rational up/down ratio and applied with a polyphase anti-aliasing
+filter whose design is cached per ratio. A block-wise resampler keeps memory bounded on long files,
+and a fast integer-decimation path trades quality for speed.
+"""
+
+from fractions import Fraction
+from functools import lru_cache
+from math import gcd
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .wavio import iter_blocks, write_blocks
+
+SPEED_METHODS = ('polyphase', 'decimate', 'nearest')
+
+
+def speed_ratio(speed_factor, max_denominator=1000):
+    """
+    Turn a speed factor into the up/down resampling ratio that plays it back.
+
+    Args:
+        speed_factor (float): Factor by which to change the speed.
+        max_denominator (int): Largest up or down factor used to approximate the speed factor.
+
+    Returns:
+        tuple: up, down
+    """
+    if speed_factor <= 0:
+        raise ValueError("speed_factor must be positive")
+    ratio = Fraction(speed_factor).limit_denominator(max_denominator)
+    return ratio.denominator, ratio.numerator
+
+
+@lru_cache(maxsize=64)
+def design_resample_filter(up, down):
+    """
+    Design the anti-aliasing filter for a resampling ratio.
+
+    Uses the same Kaiser-windowed design as scipy.signal.resample_poly, cached per ratio.
+
+    Args:
+        up (int): Upsampling factor.
+        down (int): Downsampling factor.
+
+    Returns:
+        np.ndarray: Read-only filter taps (without the gain of up).
+    """
+    from scipy.signal import firwin
+
+    max_rate = max(up, down)
+    half_len = 10 * max_rate
+    taps = firwin(2 * half_len + 1, 1 / max_rate, window=('kaiser', 5.0))
+    taps.flags.writeable = False
+    return taps
+
+
+def resample(data, up, down):
+    """
+    Resample audio data by a rational factor.
+
+    Args:
+        data (np.ndarray): Audio data, (frames,) or (frames, channels).
+        up (int): Upsampling factor.
+        down (int): Downsampling factor.
+
+    Returns:
+        np.ndarray: Resampled audio data of ceil(len(data) * up / down) frames, float32 for
+            float32 data and float64 otherwise.
+    """
+    from scipy.signal import resample_poly
+
+    divisor = gcd(up, down)
+    up, down = up // divisor, down // divisor
+    taps = design_resample_filter(up, down)
+    if np.asarray(data).dtype == np.float32:
+        taps = taps.astype(np.float32)
+    return resample_poly(data, up, down, axis=0, window=taps)
+
+
+def change_speed(data, speed_factor, method='polyphase'):
+    """
+    Change the speed of audio data played back at the same rate.
+
+    Args:
+        data (np.ndarray): Audio data, (frames,) or (frames, channels).
+        speed_factor (float): Factor by which to change the speed.
+        method (str): 'polyphase' for filtered rational resampling; 'decimate' to keep every
+            speed_factor-th sample (or repeat each sample 1 / speed_factor times), which is fast
+            but aliases and needs an integer or reciprocal-integer factor; 'nearest' to pick the
+            nearest sample at each fractional index.
+
+    Returns:
+        np.ndarray: Speed-changed audio data.
+    """
+    if method == 'polyphase':
+        return resample(data, *speed_ratio(speed_factor))
+    if method == 'decimate':
+        up, down = speed_ratio(speed_factor)
+        if up == 1:
+            return data[::down]
+        if down == 1:
+            return np.repeat(data, up, axis=0)
+        raise ValueError(f"Decimation needs an integer or reciprocal-integer speed factor, got {speed_factor}")
+    if method == 'nearest':
+        indices = np.round(np.arange(0, len(data), speed_factor)).astype(int)
+        indices = indices[indices < len(data)]
+        return data[indices]
+    raise ValueError(f"Unknown speed change method {method!r}, expected one of {SPEED_METHODS}")
+
+
+class PolyphaseResampler:
+    """
+    Rational resampler applied block by block.
+
+    Produces the same samples as resample() on the whole signal while only holding the filter
+    history between blocks.
+
+    Attributes:
+        up (int): Upsampling factor.
+        down (int): Downsampling factor.
+    """
+
+    def __init__(self, up, down) -> None:
+        divisor = gcd(up, down)
+        self.up, self.down = up // divisor, down // divisor
+        taps = design_resample_filter(self.up, self.down) * self.up
+        self._half_len = (len(taps) - 1) // 2
+        self._n_taps = -(-len(taps) // self.up)
+        padded = np.zeros(self._n_taps * self.up)
+        padded[:len(taps)] = taps
+        # _phases[phase, t] multiplies the input sample t steps before the output position
+        self._phases = padded.reshape(self._n_taps, self.up).T[:, ::-1].copy()
+        self.reset()
+
+    def reset(self):
+        """
+        Clear the carried state so the resampler can process a new signal.
+        """
+        # Sized from the first block, so (frames, channels) blocks carry per-channel history
+        self._buffer = None
+        self._buffer_start = -(self._n_taps - 1)
+        self._samples_in = 0
+        self._samples_out = 0
+
+    def process(self, block):
+        """
+        Resample the next block of the signal.
+
+        Args:
+            block (np.ndarray): Next samples of the signal, (frames,) or (frames, channels), of any length.
+
+        Returns:
+            np.ndarray: Resampled samples that are complete so far.
+        """
+        block = np.asarray(block, dtype=float)
+        channels = block.shape[1:]
+        if self._buffer is None:
+            self._buffer = np.zeros((self._n_taps - 1,) + channels)
+        elif self._buffer.shape[1:] != channels:
+            raise ValueError(f"Block of shape {block.shape} does not match the channels of the earlier blocks")
+        self._samples_in += len(block)
+        self._buffer = np.concatenate((self._buffer, block))
+
+        first = self._samples_out
+        last = (self._samples_in * self.up - 1 - self._half_len) // self.down + 1
+        count = max(last - first, 0)
+        output = np.zeros((count,) + channels)
+        # Windows run along the time axis and end up last, so each row @ phase gives one frame of every channel
+        windows = sliding_window_view(self._buffer, self._n_taps, axis=0) if count else None
+        for offset in range(min(self.up, count)):
+            position = (first + offset) * self.down + self._half_len
+            start = position // self.up - self._buffer_start - self._n_taps + 1
+            rows = windows[start::self.down][:len(range(offset, count, self.up))]
+            output[offset::self.up] = rows @ self._phases[position % self.up]
+        self._samples_out += count
+
+        keep_from = (self._samples_out * self.down + self._half_len) // self.up - self._n_taps + 1
+        drop = min(max(keep_from - self._buffer_start, 0), len(self._buffer))
+        self._buffer = self._buffer[drop:]
+        self._buffer_start += drop
+        return output
+
+    def flush(self):
+        """
+        Return the samples still held by the resampler and reset it.
+
+        Returns:
+            np.ndarray: Remaining resampled samples.
+        """
+        if self._buffer is None:
+            return np.zeros(0)
+        total = -(-self._samples_in * self.up // self.down)
+        remaining = total - self._samples_out
+        padding = np.zeros((self._half_len // self.up + self._n_taps + 1,) + self._buffer.shape[1:])
+        output = self.process(padding)[:remaining]
+        self.reset()
+        return output
+
+
+def stream_change_speed(path, out_path, speed_factor, block_size=1 << 16):
+    """
+    Change the speed of a WAV file block by block and write the result to another WAV file.
+
+    Args:
+        path (str): Path to the source audio file.
+        out_path (str): Path to save the speed-changed WAV file.
+        speed_factor (float): Factor by which to change the speed.
+        block_size (int): Number of samples read at a time.
+
+    Returns:
+        int: Number of samples written.
+    """
+    rate, dtype, blocks = iter_blocks(path, block_size)
+    resampler = PolyphaseResampler(*speed_ratio(speed_factor))
+
+    def resampled():
+        for block in blocks:
+            yield resampler.process(block)
+        yield resampler.flush()
+
+    return write_blocks(out_path, rate, dtype, resampled())
@@ -0,0 +1,651 @@
+"""
+service.py
+This module provides a local analysis service shared by tools that would otherwise each run their own analysis.
+Jobs are posted as JSON over HTTP, on a localhost port or a Unix socket, and run in a pool of warm worker
+processes. The audio of a job is read by the service and handed to the workers through shared memory rather
+than pickled. Filter jobs whose files have the same length, channels and rate that arrive within a short window
+are batched: their signals are stacked in one shared block and transformed together, each with its own mask,
+into a second shared block, from which the outputs of each job are saved as with save_outputs by its own worker. Queue depth, batch sizes and latencies are served as metrics.
+
+Usage:
+    python -m audio_analysis.service --port 8765 --workers 4
+
+    POST /jobs     {"op": "filter", "path": "in.wav", "output": "out/clean", "band_freqs": [1000],
+                    "band_widths": [14], "cutoff_freq": null, "outputs": ["wav"]}
+                   {"op": "mix", "paths": ["a.wav", "b.wav"], "output": "out/mix", "outputs": ["wav", "plots"],
+                    "plot_dpi": 300}
+    GET  /metrics  queue depth, jobs in flight, batch sizes and latencies
+    GET  /health
+
+    from audio_analysis.service import request
+    result = request('POST', '/jobs', {"op": "filter", ...}, port=8765)
+"""
+
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import socket
+import sys
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .analysis import frequency_grid, mix_voices, save_outputs, write_voice
+from .fft_backend import PRECISIONS, fft_length, irfft, precision_dtype, rfft, set_fft_options
+from .instrumentation import span
+from .sweep import band_stop_masks, low_pass_masks
+from .wavio import read_wav
+
+DEFAULT_PORT = 8765
+# Seconds the dispatcher waits for more jobs to batch with the first one
+BATCH_WINDOW = 0.005
+MAX_BATCH = 16
+# Number of finished jobs whose latencies are kept for the metrics
+LATENCY_WINDOW = 1024
+LOCAL_HOSTS = ('127.0.0.1', 'localhost', '::1')
+JOB_OPS = ('filter', 'mix')
+OUTPUT_KINDS = ('wav', 'plots')
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+def _numbers(job, key):
+    # A list of numbers of a posted job, as floats
+    values = job.get(key, [])
+    if not isinstance(values, list) or not all(isinstance(value, (int, float)) and not isinstance(value, bool)
+                                               for value in values):
+        raise ValueError(f"{key} must be a list of numbers")
+    return [float(value) for value in values]
+
+
+def load_job(job):
+    """
+    Build a validated job; any value of the wrong type raises ValueError.
+
+    Args:
+        job (dict): Job as posted: op, output, outputs and optionally plot_dpi (plotlib.OUTPUT_DPI by default),
+            with path and the filter settings for 'filter' and paths for 'mix'.
+
+    Returns:
+        dict: Job with every key of its op.
+    """
+    if not isinstance(job, dict):
+        raise ValueError("A job must be a JSON object")
+    if job.get('op') not in JOB_OPS:
+        raise ValueError(f"op must be one of {JOB_OPS}")
+    if not isinstance(job.get('output'), str):
+        raise ValueError("output must be the path of the outputs, without extension")
+    outputs = job.get('outputs', ['wav'])
+    if not isinstance(outputs, list) or not all(isinstance(kind, str) for kind in outputs) \
+            or not set(outputs) <= set(OUTPUT_KINDS):
+        raise ValueError(f"outputs must be a subset of {OUTPUT_KINDS}")
+    plot_dpi = job.get('plot_dpi')
+    if plot_dpi is not None and (not isinstance(plot_dpi, (int, float)) or isinstance(plot_dpi, bool) or plot_dpi <= 0):
+        raise ValueError("plot_dpi must be a positive number or null")
+    if job['op'] == 'mix':
+        paths = job.get('paths')
+        if not isinstance(paths, list) or not paths or not all(isinstance(path, str) for path in paths):
+            raise ValueError("paths must list the WAV files to mix")
+        return {'op': 'mix', 'paths': list(paths), 'output': job['output'], 'outputs': list(outputs),
+                'plot_dpi': plot_dpi}
+    band_freqs = _numbers(job, 'band_freqs')
+    band_widths = _numbers(job, 'band_widths')
+    if len(band_freqs) != len(band_widths):
+        raise ValueError("band_freqs and band_widths must have the same length")
+    cutoff_freq = job.get('cutoff_freq')
+    if cutoff_freq is not None and (not isinstance(cutoff_freq, (int, float)) or isinstance(cutoff_freq, bool)):
+        raise ValueError("cutoff_freq must be a number or null")
+    if not isinstance(job.get('path'), str):
+        raise ValueError("path must be the WAV file to filter")
+    return {'op': 'filter', 'path': job['path'], 'output': job['output'], 'outputs': list(outputs),
+            'plot_dpi': plot_dpi, 'band_freqs': band_freqs, 'band_widths': band_widths,
+            'cutoff_freq': None if cutoff_freq is None else float(cutoff_freq)}
+
+
+class SharedArray:
+    """
+    Array in a shared memory block, passed to worker processes by name instead of being pickled.
+
+    Attributes:
+        array (np.ndarray): View of the block.
+    """
+
+    def __init__(self, shape, dtype, name=None) -> None:
+        dtype = np.dtype(dtype)
+        size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+        self._memory = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self._memory.buf)
+
+    @property
+    def descriptor(self):
+        """
+        Name, shape and type of the block, for attach().
+        """
+        return self._memory.name, self.array.shape, self.array.dtype.str
+
+    @classmethod
+    def attach(cls, descriptor):
+        """
+        Map a block created by another process.
+        """
+        name, shape, dtype = descriptor
+        return cls(shape, dtype, name=name)
+
+    def close(self):
+        """
+        Unmap the block; views of array must not be used afterwards.
+        """
+        self.array = None
+        self._memory.close()
+
+    def unlink(self):
+        """
+        Free the block once every process has closed it.
+        """
+        self._memory.unlink()
+
+
+def _save(output, amplitude, data, frequency, rate, outputs, dpi=None):
+    # Save one result as save_outputs does, or its WAV file only
+    if 'plots' in outputs:
+        from .plotlib import OUTPUT_DPI
+
+        if amplitude is None:
+            amplitude = rfft(data, axis=0)
+            frequency = frequency_grid(len(data), rate)
+        save_outputs(amplitude, data, frequency, rate, file_dir_name=output, dpi=dpi or OUTPUT_DPI)
+        return [f"{output}{suffix}" for suffix in ('.wav', '_data.png', '_spectogram.png', '_amplitude.png')]
+    write_voice(data, rate, f"{output}.wav")
+    return [f"{output}.wav"]
+
+
+def _result(job, run):
+    # Run one job's step, turning failures into its result rather than failing the batch
+    start = time.perf_counter()
+    try:
+        result = {'status': 'done', 'files': run(), 'error': None}
+    except Exception as error:
+        result = {'status': 'failed', 'files': [], 'error': f"{type(error).__name__}: {error}",
+                  'traceback': traceback.format_exc()}
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def run_filter_batch(descriptor, output_descriptor, rate, jobs, precision=None):
+    """
+    Filter the stacked signals of a batch with one forward and one inverse transform; runs in a worker.
+
+    The filtered signals are left in the output block for save_filtered, so that the outputs of the jobs,
+    whose plots take far longer than the transforms, are saved in parallel by several workers.
+
+    Args:
+        descriptor (tuple): SharedArray descriptor of the signals, (jobs, frames) or (jobs, frames, channels).
+        output_descriptor (tuple): SharedArray descriptor of the filtered signals, of the same shape.
+        rate (int): Sampling rate of every signal.
+        jobs (list): Filter jobs, in the order of the signals.
+        precision (str): Working precision, see fft_backend.precision_dtype.
+    """
+    shared = SharedArray.attach(descriptor)
+    output = SharedArray.attach(output_descriptor)
+    try:
+        signals = shared.array
+        frames = signals.shape[1]
+        n_fft = fft_length(frames)
+        with span('service.filter_batch', jobs=len(jobs), frames=frames) as stage:
+            spectra = rfft(signals, n=n_fft, axis=1, precision=precision)
+            frequency = frequency_grid(n_fft, rate)
+            masks = band_stop_masks(frequency, [(job['band_freqs'], job['band_widths']) for job in jobs])
+            masks |= low_pass_masks(frequency, [np.inf if job['cutoff_freq'] is None else job['cutoff_freq']
+                                                for job in jobs])
+            spectra *= ~masks.reshape(masks.shape + (1,) * (spectra.ndim - 2))
+            output.array[:] = irfft(spectra, n=n_fft, length=frames, axis=1, precision=precision)
+            stage.arrays(amplitude=spectra, data=output.array)
+    finally:
+        shared.close()
+        output.close()
+
+
+def save_filtered(descriptor, index, rate, job):
+    """
+    Save the outputs of one job of a filtered batch; runs in a worker.
+
+    Args:
+        descriptor (tuple): SharedArray descriptor of the filtered signals, see run_filter_batch.
+        index (int): Position of the job's signal in the batch.
+        rate (int): Sampling rate of the signal.
+        job (dict): Filter job.
+
+    Returns:
+        dict: The job's result: status, files, error and seconds.
+    """
+    shared = SharedArray.attach(descriptor)
+    try:
+        return _result(job, partial(_save, job['output'], None, shared.array[index], None, rate, job['outputs'],
+                                    job['plot_dpi']))
+    finally:
+        shared.close()
+
+
+def run_mix(descriptors, rates, job):
+    """
+    Mix the signals of a job and save the mix; runs in a worker.
+
+    Args:
+        descriptors (list): SharedArray descriptor of each source.
+        rates (list): Sampling rate of each source.
+        job (dict): Mix job.
+
+    Returns:
+        list: The job's result: status, files, error and seconds.
+    """
+    sources = [SharedArray.attach(descriptor) for descriptor in descriptors]
+    try:
+        rate, data = mix_voices([source.array for source in sources], rates)
+    finally:
+        for source in sources:
+            source.close()
+    return [_result(job, partial(_save, job['output'], None, data, None, rate, job['outputs'], job['plot_dpi']))]
+
+
+def _read_sources(paths):
+    # Copy the samples of WAV files into shared memory, one block per file
+    shared = []
+    rates = []
+    try:
+        for path in paths:
+            rate, data = read_wav(path)
+            block = SharedArray(data.shape, data.dtype)
+            block.array[:] = data
+            shared.append(block)
+            rates.append(int(rate))
+    except BaseException:
+        _release(shared)
+        raise
+    return shared, rates
+
+
+def _stack_sources(entries):
+    # Copy the samples of a batch of same-shaped files into one shared block
+    shape = (len(entries),) + entries[0]['data'].shape
+    block = SharedArray(shape, entries[0]['data'].dtype)
+    try:
+        for index, entry in enumerate(entries):
+            block.array[index] = entry['data']
+    except BaseException:
+        _release([block])
+        raise
+    return block
+
+
+def _release(blocks):
+    for block in blocks:
+        block.close()
+        block.unlink()
+
+
+class LatencyWindow:
+    """
+    Latencies of the most recent jobs.
+    """
+
+    def __init__(self, size=LATENCY_WINDOW) -> None:
+        self._values = deque(maxlen=size)
+
+    def add(self, seconds):
+        self._values.append(seconds)
+
+    def summary(self):
+        """
+        count, mean, p50, p95 and max of the recorded latencies, in seconds.
+        """
+        if not self._values:
+            return {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+        values = np.fromiter(self._values, dtype=float)
+        p50, p95 = np.percentile(values, [50, 95])
+        return {'count': len(values), 'mean': float(values.mean()), 'p50': float(p50), 'p95': float(p95),
+                'max': float(values.max())}
+
+
+class AnalysisService:
+    """
+    Asyncio service that batches analysis jobs onto a process pool.
+
+    Attributes:
+        workers (int): Number of worker processes.
+        batch_window (float): Seconds to wait for more jobs to batch with the first queued one.
+        max_batch (int): Largest number of jobs transformed together.
+        precision (str): Working precision of the workers, see fft_backend.precision_dtype.
+        fft_workers (int): Threads each worker uses per transform.
+    """
+
+    def __init__(self, workers=None, batch_window=BATCH_WINDOW, max_batch=MAX_BATCH, precision=None,
+                 fft_workers=None) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_window = batch_window
+        self.max_batch = max(max_batch, 1)
+        self.precision = precision
+        self.fft_workers = fft_workers
+        self._executor = None
+        self._queue = None
+        self._dispatcher = None
+        self._servers = []
+        self._unix_socket = None
+        self._tasks = set()
+        self._in_flight = 0
+        self._counts = {'done': 0, 'failed': 0, 'batches': 0, 'batched_jobs': 0}
+        self._latency = LatencyWindow()
+        self._queue_wait = LatencyWindow()
+        self._started = None
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT, unix_socket=None):
+        """
+        Start the workers and listen for requests.
+
+        Args:
+            host (str): Loopback address to listen on; the service only accepts local connections.
+            port (int): TCP port, 0 for any free port, or None to listen on the Unix socket only.
+            unix_socket (str): Path of a Unix socket to listen on as well, or None.
+
+        Returns:
+            AnalysisService: The service, for chaining.
+        """
+        if host not in LOCAL_HOSTS:
+            raise ValueError(f"The service only listens on localhost, not {host}")
+        self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                             initializer=partial(set_fft_options, workers=self.fft_workers))
+        self._queue = asyncio.Queue()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        self._started = time.perf_counter()
+        if port is not None:
+            self._servers.append(await asyncio.start_server(self._handle, host, port))
+        if unix_socket is not None:
+            self._servers.append(await asyncio.start_unix_server(self._handle, unix_socket))
+            self._unix_socket = unix_socket
+        return self
+
+    @property
+    def port(self):
+        """
+        TCP port the service listens on, or None.
+        """
+        for server in self._servers:
+            for listener in server.sockets:
+                if listener.family in (socket.AF_INET, socket.AF_INET6):
+                    return listener.getsockname()[1]
+        return None
+
+    async def close(self):
+        """
+        Stop listening, cancel queued jobs and shut the workers down.
+        """
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        self._servers = []
+        if self._unix_socket is not None:
+            # The socket file outlives its server, and would make the next start on the path fail
+            try:
+                os.unlink(self._unix_socket)
+            except FileNotFoundError:
+                pass
+            self._unix_socket = None
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            await asyncio.gather(self._dispatcher, return_exceptions=True)
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            self._queue.get_nowait()['future'].cancel()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    async def submit(self, job):
+        """
+        Queue a job and wait for its result.
+
+        Args:
+            job (dict): Job, see load_job.
+
+        Returns:
+            dict: status, files, error, seconds (in the worker), queue_wait and latency.
+        """
+        job = load_job(job)
+        loop = asyncio.get_running_loop()
+        entry = {'job': job, 'future': loop.create_future(), 'queued': time.perf_counter(), 'key': None}
+        if job['op'] == 'filter':
+            # The header gives the batch key; the samples stay mapped until the batch is copied
+            rate, data = await loop.run_in_executor(None, read_wav, job['path'])
+            entry.update(rate=int(rate), data=data, key=('filter', int(rate), data.shape, data.dtype.str))
+        await self._queue.put(entry)
+        result = await entry['future']
+        result['latency'] = time.perf_counter() - entry['queued']
+        self._latency.add(result['latency'])
+        self._counts[result['status']] += 1
+        return result
+
+    def metrics(self):
+        """
+        Current state and recent latencies of the service.
+
+        Returns:
+            dict: queue_depth, in_flight, done, failed, batches, mean_batch, latency and queue_wait
+                summaries (see LatencyWindow.summary), workers and uptime.
+        """
+        batches = self._counts['batches']
+        return {
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+            'in_flight': self._in_flight,
+            'done': self._counts['done'],
+            'failed': self._counts['failed'],
+            'batches': batches,
+            'mean_batch': self._counts['batched_jobs'] / batches if batches else 0.0,
+            'latency': self._latency.summary(),
+            'queue_wait': self._queue_wait.summary(),
+            'workers': self.workers,
+            'uptime': time.perf_counter() - self._started if self._started else 0.0,
+        }
+
+    async def _dispatch(self):
+        # Collect the jobs that arrive within the batch window and run them grouped by batch key
+        loop = asyncio.get_running_loop()
+        while True:
+            entries = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(entries) < self.max_batch * self.workers:
+                try:
+                    entries.append(await asyncio.wait_for(self._queue.get(), deadline - loop.time()))
+                except asyncio.TimeoutError:
+                    break
+            groups = {}
+            for entry in entries:
+                key = entry['key'] or id(entry)
+                groups.setdefault(key, []).append(entry)
+            for group in groups.values():
+                for start in range(0, len(group), self.max_batch):
+                    task = asyncio.create_task(self._run(group[start:start + self.max_batch]))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, entries):
+        # Place the audio of a batch in shared memory, run it in a worker and resolve its jobs
+        loop = asyncio.get_running_loop()
+        dispatched = time.perf_counter()
+        for entry in entries:
+            self._queue_wait.add(dispatched - entry['queued'])
+        self._in_flight += len(entries)
+        self._counts['batches'] += 1
+        self._counts['batched_jobs'] += len(entries)
+        blocks = []
+        try:
+            job = entries[0]['job']
+            if job['op'] == 'filter':
+                rate = entries[0]['rate']
+                blocks = [await loop.run_in_executor(None, _stack_sources, entries)]
+                blocks.append(SharedArray(blocks[0].array.shape, precision_dtype(self.precision)))
+                await loop.run_in_executor(self._executor, run_filter_batch, blocks[0].descriptor,
+                                           blocks[1].descriptor, rate, [entry['job'] for entry in entries],
+                                           self.precision)
+                results = await asyncio.gather(*(
+                    loop.run_in_executor(self._executor, save_filtered, blocks[1].descriptor, index, rate, entry['job'])
+                    for index, entry in enumerate(entries)))
+            else:
+                blocks, rates = await loop.run_in_executor(None, _read_sources, job['paths'])
+                results = await loop.run_in_executor(self._executor, run_mix, [block.descriptor for block in blocks],
+                                                     rates, job)
+        except Exception as error:
+            results = [{'status': 'failed', 'files': [], 'error': f"{type(error).__name__}: {error}", 'seconds': 0.0}
+                       for _ in entries]
+        finally:
+            _release(blocks)
+            self._in_flight -= len(entries)
+        for entry, result in zip(entries, results):
+            result['queue_wait'] = dispatched - entry['queued']
+            result['batch_size'] = len(entries)
+            if not entry['future'].done():
+                entry['future'].set_result(result)
+
+    async def _route(self, method, target, body):
+        path = target.split('?', 1)[0]
+        if path == '/jobs':
+            if method != 'POST':
+                return 405, {'error': "Use POST to submit a job"}
+            try:
+                job = json.loads(body or b'null')
+                result = await self.submit(job)
+            except (ValueError, OSError) as error:
+                return 400, {'error': f"{type(error).__name__}: {error}"}
+            return (200 if result['status'] == 'done' else 500), result
+        if path in ('/metrics', '/health'):
+            if method != 'GET':
+                return 405, {'error': f"Use GET for {path}"}
+            return 200, self.metrics() if path == '/metrics' else {'status': 'ok'}
+        return 404, {'error': f"Unknown path {path}"}
+
+    async def _handle(self, reader, writer):
+        # Minimal HTTP/1.1: one JSON request and response per connection
+        try:
+            method, target, _ = (await reader.readline()).decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+        except ConnectionError:
+            # The client went away before sending its request
+            writer.close()
+            return
+        except (ValueError, asyncio.IncompleteReadError):
+            status, payload = 400, {'error': "Malformed request"}
+        else:
+            try:
+                status, payload = await self._route(method, target, body)
+            except Exception as error:
+                # The client always gets a response, even for a failure the routes did not expect
+                status, payload = 500, {'error': f"{type(error).__name__}: {error}"}
+        content = json.dumps(payload).encode()
+        try:
+            writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(content)}\r\nConnection: close\r\n\r\n".encode('latin-1') + content)
+            await writer.drain()
+        except (ConnectionResetError, BrokenPipeError):
+            # The client went away while its job ran; the job's outputs are saved all the same
+            pass
+        finally:
+            writer.close()
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    HTTP connection over a Unix socket.
+    """
+
+    def __init__(self, path, timeout=None) -> None:
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def request(method, path, payload=None, host='127.0.0.1', port=DEFAULT_PORT, unix_socket=None, timeout=None):
+    """
+    Send a request to a running service.
+
+    Args:
+        method (str): 'GET' or 'POST'.
+        path (str): '/jobs', '/metrics' or '/health'.
+        payload (dict): JSON body, such as a job.
+        host (str): Host of the service.
+        port (int): Port of the service.
+        unix_socket (str): Path of the service's Unix socket, used instead of host and port.
+        timeout (float): Seconds to wait for the response.
+
+    Returns:
+        tuple: HTTP status and decoded JSON response.
+    """
+    if unix_socket is not None:
+        connection = UnixHTTPConnection(unix_socket, timeout=timeout)
+    else:
+        connection = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        body = None if payload is None else json.dumps(payload)
+        connection.request(method, path, body=body, headers={'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+async def serve(host='127.0.0.1', port=DEFAULT_PORT, unix_socket=None, **options):
+    """
+    Run the service until it is cancelled.
+
+    Args:
+        host (str): Loopback address to listen on.
+        port (int): TCP port, or None to listen on the Unix socket only.
+        unix_socket (str): Path of a Unix socket to listen on, or None.
+        **options: Arguments of AnalysisService.
+    """
+    service = await AnalysisService(**options).start(host, port, unix_socket)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve audio analysis jobs on localhost.")
+    parser.add_argument('--host', default='127.0.0.1', choices=LOCAL_HOSTS, help="Loopback address to listen on.")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"TCP port (default: {DEFAULT_PORT}).")
+    parser.add_argument('--unix-socket', help="Listen on this Unix socket instead of the TCP port.")
+    parser.add_argument('-j', '--workers', type=int, help="Number of worker processes (default: CPU count).")
+    parser.add_argument('--batch-window', type=float, default=BATCH_WINDOW * 1000,
+                        help=f"Milliseconds to wait for jobs to batch together (default: {BATCH_WINDOW * 1000:g}).")
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help="Largest number of jobs transformed together.")
+    parser.add_argument('--fft-workers', type=int, help="Threads per transform in each worker process.")
+    parser.add_argument('--precision', choices=sorted(PRECISIONS), help="Working precision of transforms and outputs.")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, None if args.unix_socket else args.port, args.unix_socket, workers=args.workers,
+                          batch_window=args.batch_window / 1000, max_batch=args.max_batch,
+                          precision=args.precision, fft_workers=args.fft_workers))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
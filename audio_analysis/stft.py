@@ -0,0 +1,166 @@
+"""
+stft.py
+This module provides the short-time Fourier transform used for spectrograms.
+Frames are strided views of the signal rather than copies, windows are designed once per length and
+shared, and frames are transformed in batches of rows with one rfft call per batch. The batch size bounds
+the temporary memory, so long signals are processed in chunks while the result is written into one
+preallocated power array.
+"""
+
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .fft_backend import as_real, rfft
+from .instrumentation import span
+
+NFFT = 256
+CHUNK_FRAMES = 4096
+
+
+class Spectrogram(NamedTuple):
+    """
+    Power spectral density over time.
+
+    Attributes:
+        power (np.ndarray): Power, frequencies x frames.
+        freqs (np.ndarray): Frequency of each row.
+        times (np.ndarray): Centre time of each column in seconds.
+    """
+    power: np.ndarray
+    freqs: np.ndarray
+    times: np.ndarray
+
+    def to_db(self, floor=1e-300):
+        """
+        Power in decibels.
+        """
+        return 10 * np.log10(np.maximum(self.power, floor))
+
+    def extent(self):
+        """
+        Image extent (left, right, bottom, top) with each column centred on its time.
+        """
+        # A single column is centred on its frame, which starts at time 0
+        half_step = (self.times[1] - self.times[0]) / 2 if len(self.times) > 1 else self.times[0]
+        return (self.times[0] - half_step, self.times[-1] + half_step, self.freqs[0], self.freqs[-1])
+
+
+@lru_cache(maxsize=32)
+def stft_window(name, nfft):
+    """
+    Symmetric analysis window, shared between calls.
+
+    Args:
+        name (str): Window name understood by scipy.signal.get_window.
+        nfft (int): Window length.
+
+    Returns:
+        np.ndarray: Read-only window.
+    """
+    from scipy.signal import get_window
+
+    window = get_window(name, nfft, fftbins=False)
+    window.flags.writeable = False
+    return window
+
+
+def resolve_hop(length, nfft=NFFT, hop=None, max_columns=None):
+    """
+    Hop between frames.
+
+    Args:
+        length (int): Number of samples in the signal.
+        nfft (int): Frame length.
+        hop (int): Requested hop; defaults to nfft / 2.
+        max_columns (int): Largest number of frames; the hop grows beyond the requested one to respect it.
+
+    Returns:
+        int: Hop in samples.
+    """
+    hop = hop or nfft // 2
+    if max_columns:
+        hop = max(hop, -(-(max(length, nfft) - nfft) // max(max_columns - 1, 1)))
+    return hop
+
+
+def spectrogram_axes(length, rate, nfft=NFFT, hop=None):
+    """
+    Frequencies and segment centre times of a spectrogram, without computing it.
+
+    Args:
+        length (int): Number of samples in the signal.
+        rate (int): Sampling rate.
+        nfft (int): Length of each segment.
+        hop (int): Hop between segments; defaults to nfft / 2.
+
+    Returns:
+        tuple: frequencies, times
+    """
+    hop = hop or nfft // 2
+    columns = (max(length, nfft) - nfft) // hop + 1
+    return np.fft.rfftfreq(nfft, 1 / rate), (np.arange(columns) * hop + nfft / 2) / rate
+
+
+def stft_frames(data, nfft=NFFT, hop=None):
+    """
+    Frames of a signal as a strided view; signals shorter than one frame are zero-padded.
+
+    Args:
+        data (np.ndarray): 1-D signal.
+        nfft (int): Frame length.
+        hop (int): Hop between frames; defaults to nfft / 2.
+
+    Returns:
+        np.ndarray: Read-only (frames, nfft) view.
+    """
+    if len(data) < nfft:
+        data = np.pad(data, (0, nfft - len(data)))
+    return sliding_window_view(data, nfft)[::hop or nfft // 2]
+
+
+def spectrogram(data, rate, nfft=NFFT, hop=None, window='hann', max_columns=None, chunk_frames=CHUNK_FRAMES,
+                precision=None):
+    """
+    Compute a power spectral density spectrogram like matplotlib's specgram.
+
+    Each frame is windowed and transformed without removing its mean, as specgram does by default. The
+    samples are converted to the working precision, and multi-channel data averaged to mono, one chunk of
+    frames at a time, so no converted copy of the whole signal is made.
+
+    Args:
+        data (np.ndarray): Audio data, (frames,) or (frames, channels).
+        rate (int): Sampling rate.
+        nfft (int): Length of each segment.
+        hop (int): Hop between segments; defaults to nfft / 2.
+        window (str): Window name.
+        max_columns (int): Largest number of segments; the hop grows to respect it.
+        chunk_frames (int): Number of segments transformed per call; bounds the temporary memory.
+        precision (str): Working precision, see fft_backend.precision_dtype; sets the type of the power.
+
+    Returns:
+        Spectrogram: power (frequencies x segments), frequencies, segment centre times
+    """
+    data = np.asarray(data)
+    hop = resolve_hop(len(data), nfft, hop, max_columns)
+    freqs, times = spectrogram_axes(len(data), rate, nfft, hop)
+    dtype = as_real(data[:0], precision).dtype
+    taps = stft_window(window, nfft).astype(dtype, copy=False)
+    scale = 1 / (rate * (taps ** 2).sum())
+    power = np.empty((nfft // 2 + 1, len(times)), dtype=dtype)
+    with span('stft', nfft=nfft, hop=hop) as stage:
+        for start in range(0, len(times), chunk_frames):
+            count = min(chunk_frames, len(times) - start)
+            samples = as_real(data[start * hop:(start + count - 1) * hop + nfft], precision)
+            if samples.ndim > 1:
+                samples = samples.mean(axis=1, dtype=samples.dtype)
+            spectrum = rfft(stft_frames(samples, nfft, hop)[:count] * taps, axis=1, precision=precision)
+            chunk = power[:, start:start + count]
+            np.multiply(spectrum.real, spectrum.real, out=chunk.T)
+            chunk += (spectrum.imag ** 2).T
+            chunk *= scale
+        power[1:-1 if nfft % 2 == 0 else None] *= 2
+        stage.arrays(power=power)
+    return Spectrogram(power, freqs, times)
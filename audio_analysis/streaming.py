@@ -0,0 +1,273 @@
+"""
+streaming.py
+This module provides block-wise processing of audio files that are too long to hold in memory.
+It turns the frequency-domain masks used by AudioAnalysis into FIR filters and applies them with
+overlap-add convolution, or runs the equivalent notch and low-pass sections of iir.py, reading the source in
+blocks and writing the result as it is produced.
+"""
+
+import numpy as np
+from scipy.signal import get_window
+
+from .analysis import low_pass_mask, band_stop_mask
+from .fft_backend import rfft, irfft, rfftfreq
+from .iir import LOW_PASS_ORDER, SOSFilter
+from .wavio import iter_blocks, write_blocks
+
+
+class OverlapAddFilter:
+    """
+    FIR filter applied block by block with overlap-add convolution.
+
+    The input is cut into segments of `block_size` samples, each segment is convolved with the
+    filter taps through one `frame_size` transform, and the tails are added onto the following
+    segment. The linear-phase delay of the taps is removed, so the output lines up with the input.
+
+    Attributes:
+        taps (np.ndarray): Impulse response of the filter (odd length, linear phase).
+        frame_size (int): Length of each transform.
+        block_size (int): Number of input samples consumed per transform.
+        delay (int): Group delay of the taps in samples.
+    """
+
+    def __init__(self, taps, frame_size=None) -> None:
+        taps = np.asarray(taps, dtype=float)
+        if frame_size is None:
+            frame_size = 1 << int(np.ceil(np.log2(4 * len(taps))))
+        if frame_size < 2 * len(taps):
+            raise ValueError("frame_size must be at least twice the number of taps")
+        self.taps = taps
+        self.frame_size = frame_size
+        self.block_size = frame_size - len(taps) + 1
+        self.delay = (len(taps) - 1) // 2
+        self._taps_spectrum = rfft(taps, frame_size)
+        self.reset()
+
+    def reset(self):
+        """
+        Clear the carried state so the filter can process a new signal.
+        """
+        # Sized from the first block, so (frames, channels) blocks carry per-channel state
+        self._tail = None
+        self._pending = None
+        self._skip = self.delay
+        self._samples_in = 0
+        self._samples_out = 0
+
+    def process(self, block):
+        """
+        Filter the next block of the signal.
+
+        Args:
+            block (np.ndarray): Next samples of the signal, (frames,) or (frames, channels), of any length.
+
+        Returns:
+            np.ndarray: Filtered samples that are complete so far. Over the whole stream the
+                output is aligned with the input; call flush() to get the remaining samples.
+        """
+        block = np.asarray(block, dtype=float)
+        channels = block.shape[1:]
+        if self._pending is None:
+            self._pending = np.zeros((0,) + channels)
+            self._tail = np.zeros((len(self.taps) - 1,) + channels)
+        elif self._pending.shape[1:] != channels:
+            raise ValueError(f"Block of shape {block.shape} does not match the channels of the earlier blocks")
+        self._samples_in += len(block)
+        samples = np.concatenate((self._pending, block))
+        n_segments = len(samples) // self.block_size
+        used = n_segments * self.block_size
+        self._pending = samples[used:]
+        if n_segments == 0:
+            return np.zeros((0,) + channels)
+
+        segments = samples[:used].reshape((n_segments, self.block_size) + channels)
+        spectrum = rfft(segments, n=self.frame_size, axis=1)
+        spectrum *= self._taps_spectrum.reshape((-1,) + (1,) * len(channels))
+        convolved = irfft(spectrum, n=self.frame_size, axis=1)
+
+        tail_length = len(self._tail)
+        output = convolved[:, :self.block_size].copy()
+        output[0, :tail_length] += self._tail
+        output[1:, :tail_length] += convolved[:-1, self.block_size:]
+        self._tail = convolved[-1, self.block_size:].copy()
+
+        output = output.reshape((-1,) + channels)
+        skip = min(self._skip, len(output))
+        self._skip -= skip
+        output = output[skip:]
+        self._samples_out += len(output)
+        return output
+
+    def flush(self):
+        """
+        Return the samples still held by the filter and reset it.
+
+        Returns:
+            np.ndarray: Remaining filtered samples.
+        """
+        if self._pending is None:
+            return np.zeros(0)
+        remaining = self._samples_in - self._samples_out
+        output = self.process(np.zeros((self.delay + self.block_size,) + self._pending.shape[1:]))[:remaining]
+        self.reset()
+        return output
+
+
+def design_fir(gain, numtaps=8191, beta=12.0):
+    """
+    Design a linear-phase FIR filter from a per-bin gain with the window method.
+
+    Args:
+        gain (np.ndarray): Desired gain on an rfftfreq grid much finer than numtaps.
+        numtaps (int): Number of taps (odd).
+        beta (float): Kaiser window shape; higher gives more stop-band rejection.
+
+    Returns:
+        np.ndarray: Filter taps.
+    """
+    if numtaps % 2 == 0:
+        raise ValueError("numtaps must be odd")
+    impulse = irfft(gain, n=2 * (len(gain) - 1))
+    impulse = np.roll(impulse, numtaps // 2)[:numtaps]
+    return impulse * get_window(('kaiser', beta), numtaps, fftbins=False)
+
+
+def filter_gain(frequency, cutoff_freq=None, band_freqs=(), band_widths=()):
+    """
+    Build the per-bin gain of a combined low-pass and band-stop filter.
+
+    Args:
+        frequency (np.ndarray): Frequency grid of a frame.
+        cutoff_freq (float): Cutoff frequency for the low-pass filter, or None.
+        band_freqs (list): List of central frequencies for the stop bands.
+        band_widths (list): List of widths for the stop bands.
+
+    Returns:
+        np.ndarray: Gain of each bin (0 or 1).
+    """
+    stop = band_stop_mask(frequency, band_freqs, band_widths)
+    if cutoff_freq is not None:
+        stop |= low_pass_mask(frequency, cutoff_freq)
+    return np.where(stop, 0.0, 1.0)
+
+
+FILTER_BACKENDS = ('fir', 'iir')
+MIN_NUMTAPS = 8191
+# Taps per rate / width of the narrowest stop band; 8 puts a tone at a band centre about 110 dB down
+TAPS_PER_BAND_RESOLUTION = 8
+
+
+def fir_length(rate, band_widths=(), numtaps=None):
+    """
+    Number of FIR taps needed to resolve the narrowest stop band.
+
+    A windowed FIR only stops a band that is several times wider than its resolution, rate / numtaps; a
+    shorter filter leaves most of a narrow notch in place (8191 taps keep a 1 kHz tone at about 0.24 of its
+    level for 14 Hz bands at 44.1 kHz).
+
+    Args:
+        rate (int): Sampling rate.
+        band_widths (list): List of widths for the stop bands.
+        numtaps (int): Requested length, or None to size it from the narrowest band.
+
+    Returns:
+        int: Odd number of taps, at least MIN_NUMTAPS when sized automatically.
+    """
+    if numtaps is not None:
+        return numtaps
+    needed = int(np.ceil(TAPS_PER_BAND_RESOLUTION * rate / min(band_widths))) if len(band_widths) else 0
+    return max(MIN_NUMTAPS, needed) | 1
+
+
+def stream_filter(path, out_path, cutoff_freq=None, band_freqs=(), band_widths=(),
+                  numtaps=None, block_size=1 << 16, backend='fir', order=LOW_PASS_ORDER):
+    """
+    Filter a WAV file block by block and write the result to another WAV file.
+
+    The 'fir' backend approximates the masks of AudioAnalysis with a windowed linear-phase filter sized from
+    the narrowest stop band (see fir_length): a tone at the centre of a 14 Hz band at 44.1 kHz comes out
+    about 110 dB down (2.4e-6 of its level), against about 2.6e-6 for the 'iir' notches. The spectral masks
+    zero their bins exactly, which a finite filter cannot, and the band edges roll off over about
+    8 * rate / numtaps Hz instead of being sharp.
+
+    Args:
+        path (str): Path to the source audio file.
+        out_path (str): Path to save the filtered WAV file.
+        cutoff_freq (float): Cutoff frequency for the low-pass filter, or None.
+        band_freqs (list): List of central frequencies for the stop bands.
+        band_widths (list): List of widths for the stop bands.
+        numtaps (int): Length of the FIR filter (odd); None sizes it from the narrowest band, see fir_length.
+            Shorter filters leave narrow bands partly in place.
+        block_size (int): Number of samples read and written at a time.
+        backend (str): 'fir' for linear-phase FIR filters applied with overlap-add, or 'iir' for notch and
+            low-pass sections with carried state, which cost a few operations per sample and band.
+        order (int): Order of the low-pass filter of the 'iir' backend.
+
+    Returns:
+        int: Number of samples written.
+    """
+    if backend not in FILTER_BACKENDS:
+        raise ValueError(f"backend must be one of {FILTER_BACKENDS}")
+    rate, dtype, blocks = iter_blocks(path, block_size)
+    if backend == 'iir':
+        audio_filter = SOSFilter.design(rate, cutoff_freq, band_freqs, band_widths, order)
+    else:
+        numtaps = fir_length(rate, band_widths, numtaps)
+        grid_size = 1 << int(np.ceil(np.log2(16 * numtaps)))
+        gain = filter_gain(rfftfreq(grid_size, rate), cutoff_freq, band_freqs, band_widths)
+        audio_filter = OverlapAddFilter(design_fir(gain, numtaps))
+
+    def filtered():
+        for block in blocks:
+            yield audio_filter.process(block)
+        yield audio_filter.flush()
+
+    return write_blocks(out_path, rate, dtype, filtered())
+
+
+def stream_low_pass_filter(path, out_path, cutoff_freq, **kwargs):
+    """
+    Apply a low-pass filter to a WAV file block by block.
+
+    Args:
+        path (str): Path to the source audio file.
+        out_path (str): Path to save the filtered WAV file.
+        cutoff_freq (float): Cutoff frequency for the low-pass filter.
+
+    Returns:
+        int: Number of samples written.
+    """
+    return stream_filter(path, out_path, cutoff_freq=cutoff_freq, **kwargs)
+
+
+def stream_band_stop_filter(path, out_path, band_freq, band_width, **kwargs):
+    """
+    Apply a band-stop filter to a WAV file block by block.
+
+    Args:
+        path (str): Path to the source audio file.
+        out_path (str): Path to save the filtered WAV file.
+        band_freq (float): Central frequency of the stop band.
+        band_width (float): Width of the stop band.
+
+    Returns:
+        int: Number of samples written.
+    """
+    return stream_filter(path, out_path, band_freqs=[band_freq], band_widths=[band_width], **kwargs)
+
+
+def stream_multi_band_stop_filter(path, out_path, band_freqs, band_widths, **kwargs):
+    """
+    Apply multiple band-stop filters to a WAV file block by block.
+
+    Args:
+        path (str): Path to the source audio file.
+        out_path (str): Path to save the filtered WAV file.
+        band_freqs (list): List of central frequencies for the stop bands.
+        band_widths (list): List of widths for the stop bands.
+
+    Returns:
+        int: Number of samples written.
+    """
+    return stream_filter(path, out_path, band_freqs=band_freqs, band_widths=band_widths, **kwargs)
+
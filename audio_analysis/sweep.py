@@ -0,0 +1,144 @@
+"""
+sweep.py
+This module provides batched parameter sweeps of the spectral filters.
+Instead of filtering the spectrum once per setting, the stop masks of every point of a sweep are built
+together as one (points, bins) array from sorted bin ranges, applied to the shared spectrum into a reused
+buffer, and transformed back by one multi-threaded inverse transform along the sweep axis. Points are processed
+in chunks that fit a memory budget, and the results come back as one stacked array or one signal at a time.
+
+Usage:
+    audio = AudioAnalysis(path='recording.wav')
+    filtered = audio.sweep_low_pass(range(500, 8000, 100))           # (points, frames[, channels])
+    for data in audio.sweep_band_stop(settings, lazy=True): ...    # settings: [(band_freqs, band_widths), ...]
+"""
+
+import numpy as np
+
+from .fft_backend import as_complex, fft_options, get_fft_options, irfft, precision_dtype
+from .instrumentation import span
+
+# Bytes of the spectra and signals of one chunk of a sweep
+MEMORY_BUDGET = 256 << 20
+
+
+def low_pass_masks(frequency, cutoff_freqs):
+    """
+    Build the stop masks of a sweep of low-pass filters, see analysis.low_pass_mask.
+
+    Args:
+        frequency (np.ndarray): Frequency grid of the spectrum.
+        cutoff_freqs (list): Cutoff frequency of each point.
+
+    Returns:
+        np.ndarray: Boolean masks, (points, bins), True for the bins to zero.
+    """
+    cutoff_freqs = np.asarray(cutoff_freqs, dtype=float)
+    return frequency[None, :] > cutoff_freqs[:, None]
+
+
+def band_stop_masks(frequency, band_settings):
+    """
+    Build the stop masks of a sweep of band-stop filters, see analysis.band_stop_mask.
+
+    Every band of every point is resolved to a range of bins with one sorted search, and the ranges are
+    drawn into the masks through a running sum of their edges, so the cost does not grow with the number
+    of bands.
+
+    Args:
+        frequency (np.ndarray): Frequency grid of the spectrum.
+        band_settings (list): (band_freqs, band_widths) of each point.
+
+    Returns:
+        np.ndarray: Boolean masks, (points, bins), True for the bins to zero.
+    """
+    points, lows, highs = [], [], []
+    for point, (band_freqs, band_widths) in enumerate(band_settings):
+        if len(band_freqs) != len(band_widths):
+            raise ValueError("band_freqs and band_widths must have the same length")
+        band_freqs = np.asarray(band_freqs, dtype=float)
+        band_widths = np.asarray(band_widths, dtype=float)
+        points += [point] * len(band_freqs)
+        lows.append(band_freqs - band_widths / 2)
+        highs.append(band_freqs + band_widths / 2)
+    edges = np.zeros((len(band_settings), len(frequency) + 1), dtype=np.int32)
+    if points:
+        # Band edges are inclusive, as in band_stop_mask
+        starts = np.searchsorted(frequency, np.concatenate(lows), side='left')
+        stops = np.searchsorted(frequency, np.concatenate(highs), side='right')
+        np.add.at(edges, (points, starts), 1)
+        np.add.at(edges, (points, stops), -1)
+    return np.cumsum(edges[:, :-1], axis=1) > 0
+
+
+def chunk_points(bins, length, channels, precision=None, memory_budget=MEMORY_BUDGET):
+    """
+    Number of sweep points transformed together within a memory budget.
+
+    Args:
+        bins (int): Bins of the spectrum.
+        length (int): Samples of each filtered signal.
+        channels (int): Number of channels.
+        precision (str): Working precision, see fft_backend.precision_dtype.
+        memory_budget (int): Bytes allowed for the spectra and signals of one chunk; None for no limit.
+
+    Returns:
+        int: Points per chunk, at least 1; None when there is no limit.
+    """
+    if memory_budget is None:
+        return None
+    real = precision_dtype(precision).itemsize
+    per_point = channels * (2 * bins * 2 * real + length * real)
+    return max(int(memory_budget // per_point), 1)
+
+
+def sweep_spectrum(amplitude, masks, n=None, length=None, precision=None, memory_budget=MEMORY_BUDGET,
+                   workers=-1, lazy=False):
+    """
+    Filter one spectrum with every mask of a sweep and transform the results back.
+
+    Args:
+        amplitude (np.ndarray): Amplitude spectrum, (bins,) or (bins, channels).
+        masks (np.ndarray): Stop masks, (points, bins).
+        n (int): Transform length of the spectrum; defaults to 2 * (bins - 1).
+        length (int): Number of samples to keep, to remove padding.
+        precision (str): Working precision, see fft_backend.precision_dtype.
+        memory_budget (int): Bytes allowed for the spectra and signals of one chunk; None for no limit.
+        workers (int): Threads of the inverse transform; -1 uses all cores, None keeps the fft_backend option.
+        lazy (bool): Return an iterator over the filtered signals instead of one stacked array.
+
+    Returns:
+        np.ndarray or iterator: Filtered signals, (points, length) or (points, length, channels).
+    """
+    amplitude = as_complex(amplitude, precision)
+    n = n or 2 * (len(amplitude) - 1)
+    length = length or n
+    keep = ~masks.reshape(masks.shape + (1,) * (amplitude.ndim - 1))
+    channels = int(np.prod(amplitude.shape[1:]))
+    chunk = chunk_points(len(amplitude), length, channels, precision, memory_budget) or len(masks)
+    workers = get_fft_options()['workers'] if workers is None else workers
+    chunks = _sweep_chunks(amplitude, keep, n, length, precision, chunk, workers)
+    if lazy:
+        return (data for block in chunks for data in block)
+    output = None
+    start = 0
+    for block in chunks:
+        if output is None:
+            output = np.empty((len(masks),) + block.shape[1:], dtype=block.dtype)
+        output[start:start + len(block)] = block
+        start += len(block)
+    if output is None:
+        output = np.empty((0, length) + amplitude.shape[1:], dtype=precision_dtype(precision))
+    return output
+
+
+def _sweep_chunks(amplitude, keep, n, length, precision, chunk, workers):
+    # Filtered signals of chunk points at a time, the masked spectra built in one reused buffer
+    buffer = np.empty((min(chunk, len(keep)),) + amplitude.shape, dtype=amplitude.dtype)
+    with fft_options(workers=workers):
+        for start in range(0, len(keep), chunk):
+            with span('sweep', points=min(chunk, len(keep) - start), bins=len(amplitude)) as stage:
+                spectra = buffer[:min(chunk, len(keep) - start)]
+                np.multiply(amplitude, keep[start:start + len(spectra)], out=spectra)
+                data = irfft(spectra, n=n, length=length, axis=1, precision=precision)
+                stage.arrays(data=data)
+            yield data
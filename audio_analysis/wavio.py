@@ -0,0 +1,318 @@
+"""
+wavio.py
+This module provides memory-mapped reading and streaming writing of WAV files, so that long recordings can be
+processed without holding them in memory.
+Sample data is mapped straight from the file and exposed as read-only array views, whole or block by block,
+without being copied. The WavWriter appends blocks as they are produced, scaling, rounding and clipping them
+in a reused buffer instead of converting whole signals, and patches the header when it is closed. It writes to
+a temporary file next to the target and renames it into place on close, so a file can be rewritten from a
+mapping of itself. Files whose data outgrows the 4 GiB limit of RIFF are written and read as RF64.
+"""
+
+import os
+import struct
+import weakref
+from typing import NamedTuple
+
+import numpy as np
+from scipy.io import wavfile
+
+# Largest chunk or file size a RIFF header can hold; larger sizes are stored in the ds64 chunk of RF64
+MAX_RIFF_SIZE = 0xFFFFFFFF
+# Size of the JUNK chunk written ahead of fmt, reserved for the ds64 chunk of RF64
+DS64_SIZE = 28
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class WavInfo(NamedTuple):
+    """
+    Layout of the sample data of a WAV file.
+    """
+    rate: int
+    channels: int
+    dtype: np.dtype
+    frames: int
+    offset: int
+
+
+def _sample_dtype(format_tag, bits):
+    # Little-endian sample type of a format, or None when the samples cannot be mapped (24-bit PCM)
+    if format_tag == WAVE_FORMAT_PCM:
+        return {8: np.dtype('u1'), 16: np.dtype('<i2'), 32: np.dtype('<i4'), 64: np.dtype('<i8')}.get(bits)
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT:
+        return {32: np.dtype('<f4'), 64: np.dtype('<f8')}.get(bits)
+    return None
+
+
+def read_info(path):
+    """
+    Read the header of a RIFF or RF64 WAV file.
+
+    Args:
+        path (str): Path to the audio file.
+
+    Returns:
+        WavInfo: rate, channels, dtype, frames and byte offset of the sample data.
+    """
+    with open(path, 'rb') as wav_file:
+        riff, _, wave = struct.unpack('<4sI4s', wav_file.read(12))
+        if riff not in (b'RIFF', b'RF64') or wave != b'WAVE':
+            raise ValueError(f"{path} is not a WAV file")
+        file_size = wav_file.seek(0, 2)
+        position = 12
+        data_size64 = None
+        fmt = None
+        while position + 8 <= file_size:
+            wav_file.seek(position)
+            chunk_id, size = struct.unpack('<4sI', wav_file.read(8))
+            if chunk_id == b'ds64':
+                _, data_size64 = struct.unpack('<QQ', wav_file.read(16))
+            elif chunk_id == b'fmt ':
+                fmt = wav_file.read(size)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise ValueError(f"{path} has no fmt chunk before its data")
+                format_tag, channels, rate, _, block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                    format_tag = struct.unpack('<H', fmt[24:26])[0]
+                dtype = _sample_dtype(format_tag, bits)
+                if dtype is None:
+                    raise ValueError(f"{bits}-bit samples of format {format_tag:#x} cannot be memory-mapped")
+                if size == MAX_RIFF_SIZE and data_size64 is not None:
+                    size = data_size64
+                # A file whose writer did not finish has a size of 0 or one past its end
+                available = file_size - position - 8
+                if size == 0 or size > available:
+                    size = available
+                return WavInfo(rate, channels, dtype, size // block_align, position + 8)
+            position += 8 + size + (size & 1)
+    raise ValueError(f"{path} has no data chunk")
+
+
+def read_wav(path, mmap=True):
+    """
+    Read a WAV file as a view of its samples.
+
+    Args:
+        path (str): Path to the audio file.
+        mmap (bool): Map the samples from the file instead of reading them into memory.
+
+    Returns:
+        tuple: rate, data ((frames,) for mono, (frames, channels) otherwise; read-only when mapped)
+    """
+    try:
+        info = read_info(path)
+    except ValueError:
+        # Sample formats that cannot be mapped, such as 24-bit PCM
+        return wavfile.read(path)
+    shape = (info.frames,) if info.channels == 1 else (info.frames, info.channels)
+    if not info.frames:
+        return info.rate, np.zeros(shape, dtype=info.dtype)
+    data = np.memmap(path, dtype=info.dtype, mode='r', offset=info.offset, shape=shape)
+    return info.rate, data if mmap else np.array(data)
+
+
+def iter_blocks(path, block_size=1 << 16):
+    """
+    Read a WAV file block by block without loading it into memory.
+
+    The blocks are read-only views of the mapped file; copy a block to modify it.
+
+    Args:
+        path (str): Path to the audio file.
+        block_size (int): Number of samples per block.
+
+    Returns:
+        tuple: rate, dtype, generator of np.ndarray blocks
+    """
+    rate, data = read_wav(path)
+
+    def blocks():
+        for start in range(0, len(data), block_size):
+            yield data[start:start + block_size]
+
+    return rate, data.dtype, blocks()
+
+
+class WavWriter:
+    """
+    WAV file written block by block.
+
+    Blocks are scaled, rounded and clipped to the range of the sample type in a buffer that is reused from
+    block to block, and blocks already in the file's type are written as they are. The header is written
+    with placeholder sizes and patched by close(); a file whose data exceeds 4 GiB becomes RF64.
+
+    The samples go to a temporary file in the target's directory, which close() renames over the target.
+    The target can therefore be the file the samples are mapped from, as read_wav returns it, and it is left
+    as it was when the writer is discarded by an exception inside a with block. A writer that is neither
+    closed nor discarded removes its temporary file when it is garbage collected or at exit.
+
+    Attributes:
+        path (str): Path of the WAV file.
+        rate (int): Sampling rate.
+        channels (int): Number of channels; blocks are (frames,) for one channel and (frames, channels) otherwise.
+        dtype (np.dtype): Sample type of the file: uint8, int16, int32, float32 or float64.
+        scale (float): Factor applied to the samples before they are converted.
+        frames (int): Number of frames written so far.
+    """
+
+    def __init__(self, path, rate, channels=1, dtype=np.int16, scale=1.0) -> None:
+        self.dtype = np.dtype(dtype).newbyteorder('<')
+        format_tag = WAVE_FORMAT_IEEE_FLOAT if self.dtype.kind == 'f' else WAVE_FORMAT_PCM
+        if _sample_dtype(format_tag, 8 * self.dtype.itemsize) != self.dtype:
+            raise ValueError(f"Cannot write {self.dtype} samples, expected uint8, int16, int32, float32 or float64")
+        self.path = path
+        self.rate = int(rate)
+        self.channels = int(channels)
+        self.scale = scale
+        self.frames = 0
+        self._work = None
+        self._samples = None
+        self._tmp_path = f"{os.fspath(path)}.{os.getpid()}.{id(self):x}.tmp"
+        self._file = open(self._tmp_path, 'xb')
+        self._cleanup = weakref.finalize(self, _remove_unclosed, self._file, self._tmp_path)
+        block_align = self.channels * self.dtype.itemsize
+        fmt = struct.pack('<HHIIHH', format_tag, self.channels, self.rate, self.rate * block_align, block_align,
+                          8 * self.dtype.itemsize)
+        if format_tag == WAVE_FORMAT_IEEE_FLOAT:
+            fmt += struct.pack('<H', 0)
+        self._file.write(struct.pack('<4sI4s', b'RIFF', 0, b'WAVE'))
+        self._file.write(struct.pack('<4sI', b'JUNK', DS64_SIZE) + bytes(DS64_SIZE))
+        self._file.write(struct.pack('<4sI', b'fmt ', len(fmt)) + fmt)
+        self._file.write(struct.pack('<4sI', b'data', 0))
+        self._data_offset = self._file.tell()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def write(self, block):
+        """
+        Append a block of samples.
+
+        Args:
+            block (np.ndarray): Samples, (frames,) or (frames, channels).
+
+        Returns:
+            int: Number of frames written.
+        """
+        block = np.asarray(block)
+        if not len(block):
+            return 0
+        if (1 if block.ndim == 1 else block.shape[1]) != self.channels:
+            raise ValueError(f"Block of shape {block.shape} does not have {self.channels} channels")
+        if block.dtype == self.dtype and self.scale == 1:
+            samples = np.ascontiguousarray(block)
+        else:
+            samples = self._convert(block)
+        self._file.write(memoryview(samples).cast('B'))
+        self.frames += len(block)
+        return len(block)
+
+    def _convert(self, block):
+        # Scale, round and clip into the reused buffers, grown to the largest block so far
+        size = block.size
+        if self._work is None or len(self._work) < size:
+            self._work = np.empty(size, dtype=np.float64)
+            self._samples = np.empty(size, dtype=self.dtype)
+        work = self._work[:size].reshape(block.shape)
+        samples = self._samples[:size].reshape(block.shape)
+        np.multiply(block, self.scale, out=work)
+        if self.dtype.kind != 'f':
+            info = np.iinfo(self.dtype)
+            np.rint(work, out=work)
+            np.clip(work, info.min, info.max, out=work)
+        np.copyto(samples, work, casting='unsafe')
+        return samples
+
+    def close(self):
+        """
+        Patch the sizes into the header, close the file and move it into place.
+        """
+        if self._file.closed:
+            return
+        data_size = self.frames * self.channels * self.dtype.itemsize
+        if data_size & 1:
+            self._file.write(b'\0')
+        riff_size = self._file.tell() - 8
+        if riff_size > MAX_RIFF_SIZE:
+            self._file.seek(0)
+            self._file.write(struct.pack('<4sI', b'RF64', MAX_RIFF_SIZE))
+            self._file.seek(12)
+            self._file.write(struct.pack('<4sIQQQI', b'ds64', DS64_SIZE, riff_size, data_size,
+                                         self.frames, 0))
+            data_size = MAX_RIFF_SIZE
+        else:
+            self._file.seek(4)
+            self._file.write(struct.pack('<I', riff_size))
+        self._file.seek(self._data_offset - 4)
+        self._file.write(struct.pack('<I', data_size))
+        self._file.close()
+        self._cleanup.detach()
+        os.replace(self._tmp_path, self.path)
+
+    def discard(self):
+        """
+        Close and remove the file written so far, leaving the target untouched.
+        """
+        self._cleanup()
+
+
+def _remove_unclosed(file, path):
+    # Discard the temporary file of a writer; holds no reference to the writer, so that it can be collected
+    if not file.closed:
+        file.close()
+        os.remove(path)
+
+
+def write_wav(path, rate, data, dtype=np.int16, scale=1.0, block_size=1 << 16):
+    """
+    Write audio data to a WAV file in blocks, without converting the whole signal at once.
+
+    Args:
+        path (str): Path to save the WAV file.
+        rate (int): Sampling rate.
+        data (np.ndarray): Audio data, (frames,) or (frames, channels).
+        dtype (np.dtype): Sample type of the file; integer samples are rounded and clipped to its range.
+        scale (float): Factor applied to the samples before they are converted.
+        block_size (int): Number of samples converted at a time.
+
+    Returns:
+        int: Number of samples written.
+    """
+    channels = 1 if np.ndim(data) == 1 else data.shape[1]
+    with WavWriter(path, rate, channels, dtype, scale) as writer:
+        for start in range(0, len(data), block_size):
+            writer.write(data[start:start + block_size])
+    return writer.frames
+
+
+def write_blocks(out_path, rate, dtype, blocks):
+    """
+    Write blocks of samples to a WAV file as they are produced.
+
+    Args:
+        out_path (str): Path to save the WAV file.
+        rate (int): Sampling rate.
+        dtype (np.dtype): Sample type of the file; integer samples are rounded and clipped to its range.
+        blocks (iterable): Blocks of samples, (frames,) or (frames, channels); the first block sets the channels.
+
+    Returns:
+        int: Number of samples written.
+    """
+    blocks = iter(blocks)
+    first = np.asarray(next(blocks, np.zeros(0)))
+    channels = 1 if first.ndim == 1 else first.shape[1]
+    with WavWriter(out_path, rate, channels, dtype) as writer:
+        writer.write(first)
+        for block in blocks:
+            writer.write(block)
+    return writer.frames
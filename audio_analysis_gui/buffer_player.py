@@ -0,0 +1,96 @@
+"""
+buffer_player.py
+This module provides playback of audio held in NumPy arrays.
+An ArrayDevice exposes an int16 array to Qt as a read-only QIODevice without copying it, and a BufferPlayer
+plays such arrays through a QAudioOutput, so nothing has to be written to disk before it can be heard.
+"""
+
+import numpy as np
+from PyQt5.QtCore import QIODevice, QObject
+from PyQt5.QtMultimedia import QAudio, QAudioFormat, QAudioOutput
+
+
+class ArrayDevice(QIODevice):
+    """
+    Read-only QIODevice over the bytes of a NumPy array.
+    """
+
+    def __init__(self, samples, parent=None) -> None:
+        super().__init__(parent)
+        self.samples = np.ascontiguousarray(samples)
+        self._bytes = memoryview(self.samples).cast('B')
+        self._position = 0
+
+    def readData(self, max_size):
+        chunk = self._bytes[self._position:self._position + max_size]
+        self._position += len(chunk)
+        return chunk.tobytes()
+
+    def writeData(self, data):
+        return -1
+
+    def isSequential(self):
+        return False
+
+    def size(self):
+        return len(self._bytes)
+
+    def seek(self, position):
+        super().seek(position)
+        self._position = max(0, min(position, len(self._bytes)))
+        return True
+
+
+class BufferPlayer(QObject):
+    """
+    Play/pause int16 arrays through the default audio output.
+    """
+
+    def __init__(self, parent=None) -> None:
+        super().__init__(parent)
+        self._output = None
+        self._device = None
+        self._key = None
+
+    def toggle(self, key, samples, rate):
+        """
+        Start playing samples, or pause/resume them if they are the ones already playing.
+
+        Args:
+            key (str): Identifier of the track.
+            samples (np.ndarray): int16 samples, (frames,) or interleaved (frames, channels).
+            rate (int): Sampling rate.
+        """
+        if self._output and self._key == key:
+            state = self._output.state()
+            if state == QAudio.ActiveState:
+                self._output.suspend()
+                return
+            if state == QAudio.SuspendedState:
+                self._output.resume()
+                return
+        self.stop()
+        audio_format = QAudioFormat()
+        audio_format.setSampleRate(int(rate))
+        audio_format.setChannelCount(samples.shape[1] if samples.ndim > 1 else 1)
+        audio_format.setSampleSize(16)
+        audio_format.setCodec("audio/pcm")
+        audio_format.setByteOrder(QAudioFormat.LittleEndian)
+        audio_format.setSampleType(QAudioFormat.SignedInt)
+        self._device = ArrayDevice(samples.astype('<i2', copy=False), self)
+        self._device.open(QIODevice.ReadOnly)
+        self._output = QAudioOutput(audio_format, self)
+        self._output.start(self._device)
+        self._key = key
+
+    def stop(self):
+        """
+        Stop playback and release the current buffer.
+        """
+        if self._output:
+            self._output.stop()
+            self._output.deleteLater()
+        if self._device:
+            self._device.close()
+            self._device.deleteLater()
+        self._output = self._device = self._key = None
@@ -1,40 +1,20 @@
 import sys
-import numpy as np
-import matplotlib.pyplot as plt
-from scipy.io.wavfile import read, write
-from scipy.fft import rfft, rfftfreq, irfft
-from PyQt5.QtWidgets import (QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget, 
-                             QFileDialog, QSlider, QLabel, QHBoxLayout, QStyle, QSplitter, QFrame)
-from PyQt5.QtMultimedia import QMediaPlayer, QMediaContent
-from PyQt5.QtCore import QUrl, Qt
+from PyQt5.QtWidgets import (QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget,
+                             QFileDialog, QLabel, QHBoxLayout, QSplitter, QFrame, QProgressBar)
+from PyQt5.QtCore import Qt, QThreadPool
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
+from matplotlib.figure import Figure
 
-# Function to read audio file
-def read_voice(path):
-    rate, data = read(path)
-    amplitude = np.abs(rfft(data))
-    frequency = rfftfreq(len(data), 1 / rate)
-    return rate, data, amplitude, frequency
-
-# Function to apply low-pass filter
-def low_pass_filter(frequency, amplitude, cutoff):
-    filtered_amplitude = np.where(frequency > cutoff, 0, amplitude)
-    return filtered_amplitude
-
-# Function to change speed
-def change_speed(data, speed_factor):
-    indices = np.round(np.arange(0, len(data), speed_factor))
-    indices = indices[indices < len(data)].astype(int)
-    return data[indices]
-
-# Function to plot spectrogram
-def plot_spectrogram(data, rate, title="Spectrogram"):
-    fig, ax = plt.subplots()
-    ax.specgram(data, Fs=rate)
-    ax.set_xlabel('Time')
-    ax.set_ylabel('Frequency')
-    ax.set_title(title)
-    return fig
+from audio_analysis.plotlib import draw_spectrogram as draw_spectrogram_axes
+from audio_analysis_gui.buffer_player import BufferPlayer
+from audio_analysis_gui.pyramid_view import PyramidView
+from audio_analysis_gui.workers import ProcessingJob, TrackJob
+
+# Function to draw a precomputed spectrogram into a figure
+def draw_spectrogram(figure, spec, title="Spectrogram"):
+    figure.clear()
+    draw_spectrogram_axes(figure.add_subplot(), spec, title, colorbar=False)
 
 # Function to create a frame with title and button
 def create_audio_frame(title, play_callback):
@@ -57,21 +37,23 @@ class MainWindow(QMainWindow):
         super().__init__()
         self.setWindowTitle("Audio Signal Analysis")
 
-        self.rate = None
-        self.data = None
-        self.filtered_data = None
-        self.speed_data = None
-        self.reversed_data = None
+        self.audio = None
+        self.overview = None
         self.original_file_path = None
+        self.tracks = {}
+        self.pending_tracks = {}
 
-        self.player = QMediaPlayer()
+        self.player = BufferPlayer(self)
+        self.thread_pool = QThreadPool.globalInstance()
+        self.job = None
+        self.job_id = 0
 
         # Create main layout
         main_layout = QHBoxLayout()
-        
+
         # Create splitter
         splitter = QSplitter(Qt.Horizontal)
-        
+
         # Left widget with buttons and audio controls
         left_widget = QWidget()
         left_layout = QVBoxLayout()
@@ -80,12 +62,23 @@ class MainWindow(QMainWindow):
         load_button.clicked.connect(self.load_audio)
         left_layout.addWidget(load_button)
 
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.status_label = QLabel("")
+        left_layout.addWidget(self.progress_bar)
+        left_layout.addWidget(self.status_label)
+
         # Create frames for each audio type
         self.original_frame, self.play_original_button = create_audio_frame("Original Audio", self.play_original_audio)
         self.filtered_frame, self.play_filtered_button = create_audio_frame("Filtered Audio", self.play_filtered_audio)
         self.speed_frame, self.play_speed_button = create_audio_frame("Speed Changed Audio", self.play_speed_audio)
         self.reversed_frame, self.play_reversed_button = create_audio_frame("Reversed Audio", self.play_reversed_audio)
-        
+        self.track_buttons = {
+            'filtered': self.play_filtered_button,
+            'speed': self.play_speed_button,
+            'reversed': self.play_reversed_button,
+        }
+
         left_layout.addWidget(self.original_frame)
         left_layout.addWidget(self.filtered_frame)
         left_layout.addWidget(self.speed_frame)
@@ -93,75 +86,113 @@ class MainWindow(QMainWindow):
 
         left_widget.setLayout(left_layout)
         splitter.addWidget(left_widget)
-        
-        # Right widget with plot
-        self.canvas = FigureCanvas(plt.figure())
-        splitter.addWidget(self.canvas)
+
+        # Right widget with plot; zooming and panning redraw the overview at screen resolution
+        plot_widget = QWidget()
+        plot_layout = QVBoxLayout()
+        self.canvas = FigureCanvas(Figure())
+        plot_layout.addWidget(NavigationToolbar(self.canvas, plot_widget))
+        plot_layout.addWidget(self.canvas)
+        plot_widget.setLayout(plot_layout)
+        splitter.addWidget(plot_widget)
 
         main_layout.addWidget(splitter)
-        
+
         # Set splitter sizes
         splitter.setSizes([200, 800])
-        
+
         container = QWidget()
         container.setLayout(main_layout)
         self.setCentralWidget(container)
-    
+
     def load_audio(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Load Audio File", "", "WAV files (*.wav)")
         if file_path:
-            self.original_file_path = file_path
-            self.rate, self.data, amplitude, frequency = read_voice(file_path)
-
-            # Low-pass filter
-            filtered_amplitude = low_pass_filter(frequency, amplitude, cutoff=1000)
-            self.filtered_data = irfft(filtered_amplitude)
-            self.filtered_file_path = file_path.replace('.wav', '_filtered.wav')
-            write(self.filtered_file_path, self.rate, self.filtered_data.astype(np.int16))
-            
-            # Change speed
-            self.speed_data = change_speed(self.data, speed_factor=1.5)
-            self.speed_file_path = file_path.replace('.wav', '_speed.wav')
-            write(self.speed_file_path, self.rate, self.speed_data.astype(np.int16))
-            
-            # Reverse audio
-            self.reversed_data = self.data[::-1]
-            self.reversed_file_path = file_path.replace('.wav', '_reversed.wav')
-            write(self.reversed_file_path, self.rate, self.reversed_data.astype(np.int16))
-
-            # Enable buttons
+            self.start_job(file_path)
+
+    def start_job(self, file_path):
+        # Cancel the previous file's processing; its late signals are ignored by job id
+        for job in [self.job, *self.pending_tracks.values()]:
+            if job:
+                job.cancel()
+        self.player.stop()
+        self.job_id += 1
+        self.original_file_path = file_path
+        self.audio = None
+        self.overview = None
+        self.tracks = {}
+        self.pending_tracks = {}
+        self.play_original_button.setEnabled(False)
+        for button in self.track_buttons.values():
+            button.setEnabled(False)
+        self.canvas.figure.clear()
+        self.canvas.draw_idle()
+
+        self.job = ProcessingJob(self.job_id, file_path)
+        self.job.signals.progress.connect(self.on_progress)
+        self.job.signals.loaded.connect(self.on_loaded)
+        self.job.signals.spectrogram_ready.connect(self.on_spectrogram_ready)
+        self.job.signals.pyramid_ready.connect(self.on_pyramid_ready)
+        self.job.signals.failed.connect(self.on_failed)
+        self.thread_pool.start(self.job)
+
+    def on_progress(self, job_id, percent, message):
+        if job_id == self.job_id:
+            self.progress_bar.setValue(percent)
+            self.status_label.setText(message)
+
+    def on_loaded(self, job_id, audio, samples):
+        if job_id == self.job_id:
+            self.audio = audio
+            self.tracks['original'] = samples
             self.play_original_button.setEnabled(True)
-            self.play_filtered_button.setEnabled(True)
-            self.play_speed_button.setEnabled(True)
-            self.play_reversed_button.setEnabled(True)
-
-            # Plot spectrogram of the original audio
-            fig = plot_spectrogram(self.data, self.rate, title="Original Spectrogram")
-            self.canvas.figure = fig
-            self.canvas.draw()
-
-    def play_audio(self, file_path):
-        if self.player.state() == QMediaPlayer.PlayingState:
-            self.player.pause()
-        else:
-            self.player.setMedia(QMediaContent(QUrl.fromLocalFile(file_path)))
-            self.player.play()
-        
+            for button in self.track_buttons.values():
+                button.setEnabled(True)
+
+    def on_spectrogram_ready(self, job_id, spec):
+        if job_id == self.job_id:
+            draw_spectrogram(self.canvas.figure, spec, title="Original Spectrogram")
+            self.canvas.draw_idle()
+
+    def on_pyramid_ready(self, job_id, pyramid):
+        if job_id == self.job_id:
+            self.overview = PyramidView(self.canvas.figure, pyramid, title="Original Audio")
+
+    def on_track_ready(self, job_id, name, samples):
+        if job_id == self.job_id:
+            self.pending_tracks.pop(name, None)
+            self.tracks[name] = samples
+            self.track_buttons[name].setEnabled(True)
+            self.play_audio(name)
+
+    def on_failed(self, job_id, message):
+        if job_id == self.job_id:
+            self.status_label.setText(message.splitlines()[0])
+
+    def play_audio(self, name):
+        # Derived tracks are built in the background the first time they are played
+        if name in self.tracks:
+            self.player.toggle(name, self.tracks[name], self.audio.rate)
+        elif self.audio is not None and name not in self.pending_tracks:
+            job = TrackJob(self.job_id, name, self.audio)
+            job.signals.progress.connect(self.on_progress)
+            job.signals.track_ready.connect(self.on_track_ready)
+            job.signals.failed.connect(self.on_failed)
+            self.pending_tracks[name] = job
+            self.track_buttons[name].setEnabled(False)
+            self.thread_pool.start(job)
+
     def play_original_audio(self):
-        if self.original_file_path:
-            self.play_audio(self.original_file_path)
+        self.play_audio('original')
 
     def play_filtered_audio(self):
-        if self.filtered_file_path:
-            self.play_audio(self.filtered_file_path)
+        self.play_audio('filtered')
 
     def play_speed_audio(self):
-        if self.speed_file_path:
-            self.play_audio(self.speed_file_path)
+        self.play_audio('speed')
 
     def play_reversed_audio(self):
-        if self.reversed_file_path:
-            self.play_audio(self.reversed_file_path)
+        self.play_audio('reversed')
 
 # Main entry point
 if __name__ == '__main__':
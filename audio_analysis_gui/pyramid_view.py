@@ -0,0 +1,54 @@
+"""
+pyramid_view.py
+This module provides the zoomable overview of a recording shown by the GUI.
+A PyramidView draws the waveform and spectrogram of a level-of-detail pyramid into a figure and redraws both
+from the pyramid whenever the time axis is zoomed or panned, at the resolution of the axes on screen, so
+browsing a recording of several hours costs the same as browsing a few seconds.
+"""
+
+from audio_analysis.plotlib import draw_spectrogram, draw_waveform
+
+
+class PyramidView:
+    """
+    Waveform above spectrogram of a pyramid, sharing the time axis.
+
+    Attributes:
+        figure (matplotlib.figure.Figure): Figure drawn into; it is cleared first.
+        pyramid (pyramid.Pyramid): Pyramid of the recording.
+        title (str): Title above the waveform.
+    """
+
+    def __init__(self, figure, pyramid, title="Waveform") -> None:
+        self.figure = figure
+        self.pyramid = pyramid
+        self.title = title
+        self._updating = False
+        figure.clear()
+        self.wave_ax, self.spec_ax = figure.subplots(2, 1, sharex=True)
+        self.spec_ax.callbacks.connect('xlim_changed', self._on_xlim_changed)
+        self.show(0.0, pyramid.duration)
+
+    def _pixels(self):
+        return max(int(self.spec_ax.get_window_extent().width), 1)
+
+    def show(self, start, stop):
+        """
+        Redraw the window between start and stop seconds.
+        """
+        self._updating = True
+        try:
+            for artist in [*self.wave_ax.collections, *self.wave_ax.lines, *self.spec_ax.images]:
+                artist.remove()
+            pixels = self._pixels()
+            draw_waveform(self.wave_ax, self.pyramid.waveform(start, stop, pixels), self.title)
+            draw_spectrogram(self.spec_ax, self.pyramid.spectrogram(start, stop, pixels), "", colorbar=False)
+            self.wave_ax.set_xlabel('')
+            self.spec_ax.set_xlim(start, stop)
+        finally:
+            self._updating = False
+        self.figure.canvas.draw_idle()
+
+    def _on_xlim_changed(self, ax):
+        if not self._updating:
+            self.show(*ax.get_xlim())
@@ -0,0 +1,182 @@
+"""
+workers.py
+This module provides the background processing used by the GUI.
+A ProcessingJob runs on a QThreadPool thread, reads the audio file and opens, or builds, its level-of-detail
+pyramid for the overview, falling back to a spectrogram when the pyramid cannot be stored; a TrackJob
+builds one derived track in memory the first time it is needed. Results are reported through Qt signals as
+soon as they are ready. Jobs can be cancelled; a cancelled job stops at the next stage boundary and emits
+nothing further.
+"""
+
+import traceback
+
+import numpy as np
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from audio_analysis.analysis import AudioAnalysis
+from audio_analysis.pyramid import Pyramid
+from audio_analysis.resample import change_speed
+
+CUTOFF_FREQ = 1000
+SPEED_FACTOR = 1.5
+SPECTROGRAM_COLUMNS = 2000
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a job when it has been cancelled.
+    """
+
+
+class JobSignals(QObject):
+    """
+    Signals emitted by the jobs. Every signal carries the job id first so that
+    receivers can ignore results of jobs that were replaced.
+    """
+    progress = pyqtSignal(int, int, str)
+    loaded = pyqtSignal(int, object, object)
+    spectrogram_ready = pyqtSignal(int, object)
+    pyramid_ready = pyqtSignal(int, object)
+    track_ready = pyqtSignal(int, str, object)
+    failed = pyqtSignal(int, str)
+    finished = pyqtSignal(int)
+
+
+def filtered_track(audio):
+    return audio.amp_to_data(audio.low_pass_filter(CUTOFF_FREQ))
+
+
+def speed_track(audio):
+    return change_speed(audio.data, SPEED_FACTOR)
+
+
+def reversed_track(audio):
+    return audio.data[::-1]
+
+
+TRACK_BUILDERS = {
+    'filtered': filtered_track,
+    'speed': speed_track,
+    'reversed': reversed_track,
+}
+
+
+def to_pcm16(data, source_dtype=None):
+    """
+    Convert audio data to contiguous 16-bit PCM.
+
+    Args:
+        data (np.ndarray): Audio data, in the value range of source_dtype.
+        source_dtype (np.dtype): Integer type the data's values come from; wider types are scaled down.
+
+    Returns:
+        np.ndarray: int16 samples.
+    """
+    source_dtype = np.dtype(source_dtype or data.dtype)
+    if data.dtype == np.int16 and source_dtype == np.int16:
+        return np.ascontiguousarray(data)
+    scale = 2.0 ** (8 * source_dtype.itemsize - 16) if source_dtype.kind in 'iu' else 1.0
+    samples = np.asarray(data, dtype=np.float32) / scale
+    np.clip(samples, -32768, 32767, out=samples)
+    return samples.astype(np.int16)
+
+
+class _Job(QRunnable):
+    """
+    Base of the cancellable jobs run on the thread pool.
+
+    Attributes:
+        job_id (int): Identifier passed with every signal.
+        signals (JobSignals): Signals reporting progress and results.
+    """
+
+    def __init__(self, job_id) -> None:
+        super().__init__()
+        self.job_id = job_id
+        self.signals = JobSignals()
+        self._cancelled = False
+
+    def cancel(self):
+        """
+        Ask the job to stop at the next stage boundary.
+        """
+        self._cancelled = True
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def _stage(self, percent, message):
+        if self._cancelled:
+            raise JobCancelled()
+        self.signals.progress.emit(self.job_id, percent, message)
+
+    def work(self):
+        raise NotImplementedError
+
+    def run(self):
+        try:
+            self.work()
+        except JobCancelled:
+            return
+        except Exception as error:
+            if not self._cancelled:
+                self.signals.failed.emit(self.job_id, f"{type(error).__name__}: {error}\n{traceback.format_exc()}")
+            return
+        self.signals.finished.emit(self.job_id)
+
+
+class ProcessingJob(_Job):
+    """
+    Load an audio file and prepare its overview.
+
+    Emits `loaded` with the analysis and the 16-bit samples for playback, then `pyramid_ready` with the
+    file's pyramid, or `spectrogram_ready` when no pyramid can be stored next to the file.
+
+    Attributes:
+        path (str): Path to the audio file.
+    """
+
+    def __init__(self, job_id, path) -> None:
+        super().__init__(job_id)
+        self.path = path
+
+    def work(self):
+        self._stage(0, "Reading audio")
+        audio = AudioAnalysis(path=self.path)
+        self.signals.loaded.emit(self.job_id, audio, to_pcm16(audio.data))
+        self._stage(40, "Building overview")
+        try:
+            pyramid = Pyramid.load(self.path)
+        except (OSError, ValueError):
+            # Read-only directory or a sample format that cannot be summarised: draw the whole file once
+            pyramid = None
+        self._stage(90, "Building overview")
+        if pyramid is not None:
+            self.signals.pyramid_ready.emit(self.job_id, pyramid)
+        else:
+            self.signals.spectrogram_ready.emit(self.job_id, audio.spectrogram(max_columns=SPECTROGRAM_COLUMNS))
+        self._stage(100, "Ready")
+
+
+class TrackJob(_Job):
+    """
+    Build one derived track of a loaded file and emit it as 16-bit samples.
+
+    Attributes:
+        name (str): Key of TRACK_BUILDERS.
+        audio (AudioAnalysis): Analysis of the loaded file.
+    """
+
+    def __init__(self, job_id, name, audio) -> None:
+        super().__init__(job_id)
+        self.name = name
+        self.audio = audio
+
+    def work(self):
+        self._stage(0, f"Preparing {self.name} audio")
+        data = TRACK_BUILDERS[self.name](self.audio)
+        self._stage(80, f"Preparing {self.name} audio")
+        self.signals.track_ready.emit(self.job_id, self.name, to_pcm16(data, self.audio.data.dtype))
+        self._stage(100, "Ready")
@@ -0,0 +1,3 @@
+"""
+Benchmarks of the audio_analysis hot paths. Run them with `python -m benchmarks.run`.
+"""
@@ -0,0 +1,125 @@
+"""
+cases.py
+This module provides the synthetic signals and the benchmark cases run by benchmarks.run.
+Signals are deterministic mixes of tones and noise, so results of different runs and machines are
+comparable. Each case has a setup, which is not timed, and a call that is timed and whose peak
+memory is recorded.
+"""
+
+import os
+
+import numpy as np
+from scipy.io import wavfile
+
+from audio_analysis.analysis import AudioAnalysis, amp_to_data, mix_voices, save_outputs, write_voice
+
+BAND_FREQS = [1000, 5000, 7000]
+BAND_WIDTHS = [14, 14, 14]
+CUTOFF_FREQ = 1000
+SPEED_FACTOR = 1.5
+SWEEP_CUTOFFS = list(range(500, 8000, 500))
+
+PROFILES = {
+    'quick': {'durations': [1, 10], 'rates': [44100], 'channels': [1, 2]},
+    'full': {'durations': [1, 10, 60, 600, 3600], 'rates': [22050, 44100, 48000], 'channels': [1, 2, 8]},
+}
+
+
+def make_signal(duration, rate, channels=1, seed=0):
+    """
+    Generate a 16-bit test signal: a few tones per channel plus white noise.
+
+    Args:
+        duration (float): Length in seconds.
+        rate (int): Sampling rate.
+        channels (int): Number of channels.
+        seed (int): Seed of the noise.
+
+    Returns:
+        np.ndarray: int16 samples, (frames,) for one channel and (frames, channels) otherwise.
+    """
+    frames = int(duration * rate)
+    rng = np.random.default_rng(seed)
+    time = np.arange(frames) / rate
+    data = np.empty((frames, channels), dtype=np.int16)
+    for channel in range(channels):
+        tones = sum(np.sin(2 * np.pi * freq * (channel + 1) * time) for freq in (220, 1000, 5000))
+        noise = rng.standard_normal(frames)
+        data[:, channel] = np.clip(3000 * tones + 1000 * noise, -32768, 32767)
+    return data[:, 0] if channels == 1 else data
+
+
+class Case:
+    """
+    A benchmark case.
+
+    Attributes:
+        name (str): Identifier used in the results.
+        setup (callable): Called with (data, rate, workdir); returns the arguments of call. Not timed.
+        call (callable): The timed operation.
+    """
+
+    def __init__(self, name, setup, call) -> None:
+        self.name = name
+        self.setup = setup
+        self.call = call
+
+
+def _analysis(data, rate, workdir):
+    return (AudioAnalysis(audio_data={'rate': rate, 'data': data}),)
+
+
+def _spectrum(data, rate, workdir):
+    audio = AudioAnalysis(audio_data={'rate': rate, 'data': data})
+    return audio.amplitude, len(data)
+
+
+def _wav_file(data, rate, workdir):
+    path = os.path.join(workdir, 'input.wav')
+    wavfile.write(path, rate, data)
+    return (path,)
+
+
+def _voices(data, rate, workdir):
+    return [data, data[::-1]], [rate, rate]
+
+
+def _output(data, rate, workdir):
+    audio = AudioAnalysis(audio_data={'rate': rate, 'data': data})
+    return audio, os.path.join(workdir, 'output')
+
+
+CASES = [
+    # The samples are mapped from the file, so they are summed to read every page of it
+    Case('read', _wav_file, lambda path: AudioAnalysis(path=path).data.sum()),
+    Case('amplitude', _analysis, lambda audio: audio.amplitude),
+    Case('low_pass_filter', _analysis, lambda audio: audio.low_pass_filter(CUTOFF_FREQ)),
+    Case('band_stop_filter', _analysis, lambda audio: audio.band_stop_filter(BAND_FREQS[0], BAND_WIDTHS[0])),
+    Case('multi_band_stop_filter', _analysis, lambda audio: audio.multi_band_stop_filter(BAND_FREQS, BAND_WIDTHS)),
+    Case('sweep_low_pass', _analysis, lambda audio: audio.sweep_low_pass(SWEEP_CUTOFFS)),
+    Case('change_speed', _analysis, lambda audio: audio.change_speed(SPEED_FACTOR)),
+    Case('reverse_voice', _analysis, lambda audio: audio.reverse_voice()),
+    Case('amp_to_data', _spectrum, amp_to_data),
+    Case('mix_voices', _voices, mix_voices),
+    Case('write_voice', _output, lambda audio, path: write_voice(audio.data, audio.rate, f"{path}.wav")),
+    Case('save_outputs', _output,
+         lambda audio, path: save_outputs(audio.amplitude, audio.data, audio.frequency, audio.rate, path)),
+]
+
+
+def select_cases(names=None):
+    """
+    Select cases by name.
+
+    Args:
+        names (list): Case names; None selects every case.
+
+    Returns:
+        list: Selected cases, in definition order.
+    """
+    if not names:
+        return list(CASES)
+    unknown = set(names) - {case.name for case in CASES}
+    if unknown:
+        raise ValueError(f"Unknown benchmark cases: {', '.join(sorted(unknown))}")
+    return [case for case in CASES if case.name in names]
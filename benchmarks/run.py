@@ -0,0 +1,220 @@
+"""
+run.py
+This module runs the benchmark suite and compares results against a baseline.
+Every case is run once untimed, to load lazy imports and warm caches, then timed over several repetitions
+on each signal size, then run once more under tracemalloc to record the peak memory allocated through
+Python and NumPy. Results are written as JSON; given a baseline file, cases that became slower or use
+more memory than the tolerance allows are reported and the exit status is non-zero. A slowdown must also
+exceed a minimum absolute time, so that cases of a few microseconds do not fail on timer noise.
+
+Usage:
+    python -m benchmarks.run --profile quick -o results.json
+    python -m benchmarks.run --profile quick --baseline baseline.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import scipy
+
+from .cases import PROFILES, make_signal, select_cases
+
+
+def measure(case, data, rate, workdir, repeat=5, warmup=1):
+    """
+    Time a case and record its peak memory.
+
+    Args:
+        case (Case): Case to run.
+        data (np.ndarray): Input signal.
+        rate (int): Sampling rate.
+        workdir (str): Directory for files the case reads or writes.
+        repeat (int): Number of timed runs; each gets a fresh setup.
+        warmup (int): Number of untimed runs before the timed ones.
+
+    Returns:
+        dict: seconds_min, seconds_median and peak_bytes.
+    """
+    for _ in range(warmup):
+        case.call(*case.setup(data, rate, workdir))
+
+    timings = []
+    for _ in range(repeat):
+        args = case.setup(data, rate, workdir)
+        gc.collect()
+        start = time.perf_counter()
+        case.call(*args)
+        timings.append(time.perf_counter() - start)
+        del args
+
+    args = case.setup(data, rate, workdir)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        case.call(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'seconds_min': min(timings),
+        'seconds_median': statistics.median(timings),
+        'peak_bytes': peak,
+    }
+
+
+def run_suite(durations, rates, channels, cases, repeat=5, on_result=None):
+    """
+    Run the cases on every combination of signal duration, rate and channel count.
+
+    Args:
+        durations (list): Signal lengths in seconds.
+        rates (list): Sampling rates.
+        channels (list): Channel counts.
+        cases (list): Cases to run.
+        repeat (int): Number of timed runs per case and signal.
+        on_result (callable): Called with each result as it becomes available.
+
+    Returns:
+        list: Result records.
+    """
+    results = []
+    with tempfile.TemporaryDirectory(prefix='audio_bench_') as workdir:
+        for duration in durations:
+            for rate in rates:
+                for channel_count in channels:
+                    data = make_signal(duration, rate, channel_count)
+                    for case in cases:
+                        result = {'case': case.name, 'duration': duration, 'rate': rate,
+                                  'channels': channel_count, 'repeat': repeat}
+                        result.update(measure(case, data, rate, workdir, repeat))
+                        results.append(result)
+                        if on_result:
+                            on_result(result)
+                    del data
+    return results
+
+
+def environment():
+    """
+    Describe the machine and library versions the results were measured with.
+
+    Returns:
+        dict: Environment record.
+    """
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'scipy': scipy.__version__,
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def result_key(result):
+    return result['case'], result['duration'], result['rate'], result['channels']
+
+
+def compare(results, baseline, time_tolerance=0.2, memory_tolerance=0.1, min_time_delta=0.001):
+    """
+    Compare results with a baseline.
+
+    Times are compared on the fastest run, which is the least sensitive to noise from other processes.
+
+    Args:
+        results (list): Result records.
+        baseline (list): Result records of the baseline run.
+        time_tolerance (float): Allowed relative slowdown.
+        memory_tolerance (float): Allowed relative increase of peak memory.
+        min_time_delta (float): Slowdown in seconds below which no time regression is reported.
+
+    Returns:
+        list: One record per result found in the baseline, with time_ratio, memory_ratio and regression.
+    """
+    previous = {result_key(result): result for result in baseline}
+    comparisons = []
+    for result in results:
+        old = previous.get(result_key(result))
+        if old is None:
+            continue
+        time_ratio = result['seconds_min'] / old['seconds_min'] if old['seconds_min'] else 1.0
+        memory_ratio = result['peak_bytes'] / old['peak_bytes'] if old['peak_bytes'] else 1.0
+        regression = []
+        if time_ratio > 1 + time_tolerance and result['seconds_min'] - old['seconds_min'] > min_time_delta:
+            regression.append('time')
+        if memory_ratio > 1 + memory_tolerance:
+            regression.append('memory')
+        comparisons.append({'case': result['case'], 'duration': result['duration'], 'rate': result['rate'],
+                            'channels': result['channels'], 'time_ratio': time_ratio,
+                            'memory_ratio': memory_ratio, 'regression': regression})
+    return comparisons
+
+
+def format_result(result):
+    return (f"{result['case']:<24} {result['duration']:>6g}s {result['rate']:>6}Hz {result['channels']:>2}ch "
+            f"{result['seconds_min'] * 1000:>10.2f}ms {result['peak_bytes'] / 2 ** 20:>9.1f}MiB")
+
+
+def parse_list(kind):
+    return lambda text: [kind(value) for value in text.split(',') if value.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run', description=__doc__.split('\n\n')[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--profile', choices=sorted(PROFILES), default='quick', help="Signal sizes to run.")
+    parser.add_argument('--durations', type=parse_list(float), help="Comma-separated signal lengths (s).")
+    parser.add_argument('--rates', type=parse_list(int), help="Comma-separated sampling rates (Hz).")
+    parser.add_argument('--channels', type=parse_list(int), help="Comma-separated channel counts.")
+    parser.add_argument('--cases', type=parse_list(str), help="Comma-separated case names (default: all).")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per case and signal.")
+    parser.add_argument('-o', '--output', help="Write the results to this JSON file.")
+    parser.add_argument('--baseline', help="Compare with the results in this JSON file.")
+    parser.add_argument('--time-tolerance', type=float, default=0.2, help="Allowed relative slowdown.")
+    parser.add_argument('--min-time-delta', type=float, default=0.001,
+                        help="Slowdown in seconds a case must also exceed to regress (default: 0.001).")
+    parser.add_argument('--memory-tolerance', type=float, default=0.1, help="Allowed relative memory increase.")
+    args = parser.parse_args(argv)
+
+    try:
+        cases = select_cases(args.cases)
+    except ValueError as error:
+        parser.error(str(error))
+    profile = PROFILES[args.profile]
+    results = run_suite(args.durations or profile['durations'], args.rates or profile['rates'],
+                        args.channels or profile['channels'], cases, args.repeat,
+                        on_result=lambda result: print(format_result(result), flush=True))
+    report = {'environment': environment(), 'results': results}
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    comparisons = compare(results, baseline['results'], args.time_tolerance, args.memory_tolerance,
+                          args.min_time_delta)
+    regressions = [comparison for comparison in comparisons if comparison['regression']]
+    for comparison in regressions:
+        print(f"REGRESSION {comparison['case']} {comparison['duration']:g}s {comparison['rate']}Hz "
+              f"{comparison['channels']}ch: time x{comparison['time_ratio']:.2f}, "
+              f"memory x{comparison['memory_ratio']:.2f}")
+    print(f"{len(comparisons)} compared, {len(regressions)} regressed")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
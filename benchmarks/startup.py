@@ -0,0 +1,153 @@
+"""
+startup.py
+This module measures the cold import time of the package's entry points.
+Each target is imported in a fresh interpreter, several times, and the modules it pulls in are checked
+against the ones it must not load, such as matplotlib for the numerical core, so that worker processes and
+short-lived jobs keep starting quickly. Results are written as JSON; given a baseline file, targets that
+import more slowly than the tolerance allows are reported, and the exit status is non-zero on a slowdown
+or a forbidden import.
+
+Usage:
+    python -m benchmarks.startup -o startup.json
+    python -m benchmarks.startup --baseline startup.json
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+from .run import environment, parse_list
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules that only plotting and the resampling filters need
+HEAVY_MODULES = ['matplotlib', 'scipy.signal']
+
+TARGETS = {
+    'analysis': {'module': 'audio_analysis.analysis', 'forbidden': HEAVY_MODULES},
+    'pipeline': {'module': 'audio_analysis.pipeline', 'forbidden': HEAVY_MODULES},
+    'features': {'module': 'audio_analysis.features', 'forbidden': HEAVY_MODULES},
+    'batch': {'module': 'audio_analysis.batch', 'forbidden': HEAVY_MODULES},
+    'service': {'module': 'audio_analysis.service', 'forbidden': HEAVY_MODULES},
+    'plotlib': {'module': 'audio_analysis.plotlib', 'forbidden': []},
+}
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'modules': sorted(sys.modules)}}))
+"""
+
+
+def import_once(module):
+    """
+    Import a module in a fresh interpreter.
+
+    Args:
+        module (str): Module to import.
+
+    Returns:
+        dict: seconds the import took and the names of every module loaded afterwards.
+    """
+    output = subprocess.run([sys.executable, '-c', SCRIPT.format(module=module)], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def measure(target, repeat=5):
+    """
+    Time the cold import of a target and check what it loads.
+
+    Args:
+        target (dict): Entry of TARGETS.
+        repeat (int): Number of fresh interpreters.
+
+    Returns:
+        dict: seconds_min, seconds_median, module_count and forbidden (the forbidden modules that were loaded).
+    """
+    runs = [import_once(target['module']) for _ in range(repeat)]
+    timings = [run['seconds'] for run in runs]
+    modules = runs[-1]['modules']
+    forbidden = [name for name in target['forbidden']
+                 if any(module == name or module.startswith(f"{name}.") for module in modules)]
+    return {
+        'seconds_min': min(timings),
+        'seconds_median': statistics.median(timings),
+        'module_count': len(modules),
+        'forbidden': forbidden,
+    }
+
+
+def compare(results, baseline, time_tolerance=0.2):
+    """
+    Compare import times with a baseline, on the fastest run.
+
+    Args:
+        results (list): Result records.
+        baseline (list): Result records of the baseline run.
+        time_tolerance (float): Allowed relative slowdown.
+
+    Returns:
+        list: One record per target found in the baseline, with time_ratio and regression.
+    """
+    previous = {result['target']: result for result in baseline}
+    comparisons = []
+    for result in results:
+        old = previous.get(result['target'])
+        if old is None:
+            continue
+        time_ratio = result['seconds_min'] / old['seconds_min'] if old['seconds_min'] else 1.0
+        comparisons.append({'target': result['target'], 'time_ratio': time_ratio,
+                            'regression': time_ratio > 1 + time_tolerance})
+    return comparisons
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.startup', description=__doc__.split('\n\n')[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--targets', type=parse_list(str), help=f"Comma-separated targets (default: all of {', '.join(TARGETS)}).")
+    parser.add_argument('--repeat', type=int, default=5, help="Fresh interpreters per target.")
+    parser.add_argument('-o', '--output', help="Write the results to this JSON file.")
+    parser.add_argument('--baseline', help="Compare with the results in this JSON file.")
+    parser.add_argument('--time-tolerance', type=float, default=0.2, help="Allowed relative slowdown.")
+    args = parser.parse_args(argv)
+
+    names = args.targets or list(TARGETS)
+    unknown = set(names) - set(TARGETS)
+    if unknown:
+        parser.error(f"Unknown targets: {', '.join(sorted(unknown))}")
+    results = []
+    for name in names:
+        result = {'target': name, 'module': TARGETS[name]['module'], 'repeat': args.repeat}
+        result.update(measure(TARGETS[name], args.repeat))
+        results.append(result)
+        line = f"{name:<12} {result['seconds_min'] * 1000:>9.1f}ms {result['module_count']:>6} modules"
+        if result['forbidden']:
+            line += f"  FORBIDDEN {', '.join(result['forbidden'])}"
+        print(line, flush=True)
+    report = {'environment': environment(), 'results': results}
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+    failed = any(result['forbidden'] for result in results)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        comparisons = compare(results, baseline['results'], args.time_tolerance)
+        regressions = [comparison for comparison in comparisons if comparison['regression']]
+        for comparison in regressions:
+            print(f"REGRESSION {comparison['target']}: import time x{comparison['time_ratio']:.2f}")
+        print(f"{len(comparisons)} compared, {len(regressions)} regressed")
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import numpy as np
+import scipy.fft
+from scipy.io import wavfile
+
+from audio_analysis.analysis import AudioAnalysis, BandStopFilterBank, band_stop_mask
+from audio_analysis.cache import AnalysisCache
+from audio_analysis.fft_backend import rfftfreq
+
+
+def test_single_precision_spectrogram(tmp_path):
+    rng = np.random.default_rng(0)
+    wavfile.write(tmp_path / 'noise.wav', 8000, (1000 * rng.standard_normal((8000, 2))).astype(np.int16))
+    cache = AnalysisCache(tmp_path / 'cache')
+    for _ in range(2):
+        audio = AudioAnalysis(path=tmp_path / 'noise.wav', precision='single', cache=cache)
+        assert audio.amplitude.dtype == np.complex64
+        assert audio.spectrogram().power.dtype == np.float32
+    double = AudioAnalysis(path=tmp_path / 'noise.wav', precision='double', cache=cache).spectrogram().power
+    assert double.dtype == np.float64
+    assert np.allclose(audio.spectrogram().power, double, rtol=1e-4)
+
+
+def test_filter_bank_bins_match_the_band_stop_mask():
+    rng = np.random.default_rng(0)
+    for length, rate in [(8000, 8000), (8011, 44100), (44100, 44100), (1 << 16, 48000), (12345, 22050)]:
+        frequency = rfftfreq(length, rate)
+        # Bands centred on bins with widths of whole bins put their edges exactly on bins
+        centres = np.concatenate((rng.uniform(-100, rate / 2 + 100, 20), frequency[rng.integers(0, len(frequency), 20)]))
+        widths = np.concatenate((rng.uniform(0, 200, 20), 2 * frequency[rng.integers(0, 5, 20)]))
+        for band_freq, band_width in zip(centres, widths):
+            bank = BandStopFilterBank([band_freq], [band_width])
+            mask = np.zeros(len(frequency), dtype=bool)
+            for start, stop in bank.bin_ranges(length, rate):
+                mask[start:stop] = True
+            assert np.array_equal(mask, band_stop_mask(frequency, [band_freq], [band_width]))
+
+
+def test_spectrum_is_computed_on_read_and_matches_scipy(tmp_path):
+    rng = np.random.default_rng(1)
+    data = (1000 * rng.standard_normal(8001)).astype(np.int16)
+    wavfile.write(tmp_path / 'noise.wav', 8000, data)
+    audio = AudioAnalysis(path=tmp_path / 'noise.wav')
+    assert audio._amplitude is None and audio._frequency is None
+    assert np.allclose(audio.amplitude, scipy.fft.rfft(data))
+    assert np.array_equal(audio.frequency, scipy.fft.rfftfreq(len(data), 1 / 8000))
+    assert np.allclose(audio.reverse_voice()[1], np.abs(scipy.fft.rfft(data[::-1])))
+    # Assigning new samples forgets the spectrum of the old ones
+    audio.data = data[:4000]
+    assert np.allclose(audio.amplitude, scipy.fft.rfft(data[:4000]))
+    assert len(audio.frequency) == 2001
+
+
+def test_multi_band_stop_matches_masking_each_band():
+    rng = np.random.default_rng(2)
+    audio = AudioAnalysis(audio_data={'rate': 8000, 'data': rng.standard_normal(8000)})
+    # Overlapping bands are merged by the bank
+    band_freqs, band_widths = [1000, 1010, 3000, 500], [40, 40, 14, 100]
+    expected = scipy.fft.rfft(audio.data)
+    frequency = scipy.fft.rfftfreq(8000, 1 / 8000)
+    for band_freq, band_width in zip(band_freqs, band_widths):
+        expected[(frequency >= band_freq - band_width / 2) & (frequency <= band_freq + band_width / 2)] = 0
+    filtered_amplitude, filtered_data = audio.multi_band_stop_filter(band_freqs, band_widths)
+    assert np.allclose(filtered_amplitude, expected)
+    assert np.allclose(filtered_data, np.fft.irfft(expected))
+    assert np.allclose(audio.band_stop_filter(3000, 14)[0][frequency == 3000], 0)
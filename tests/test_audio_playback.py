@@ -0,0 +1,61 @@
+import time
+
+import numpy as np
+
+from audio_analysis.audio_playback import FilterStage, Gain, MixStage, ProcessingStream, SimulatedIO
+from audio_analysis.iir import sos_filter
+from audio_analysis.mixer import Mixer
+
+
+def noise(frames, channels, seed=0):
+    return (0.1 * np.random.default_rng(seed).standard_normal((frames, channels))).astype(np.float32)
+
+
+def test_filter_stage_matches_offline_filter():
+    data = noise(10000, 2)
+    io = SimulatedIO(data)
+    ProcessingStream([FilterStage(band_freqs=[1000], band_widths=[50])], rate=8000, block_size=256, channels=2).run(io)
+    expected = sos_filter(data, 8000, band_freqs=[1000], band_widths=[50], precision='single')
+    assert io.output.shape == data.shape
+    assert np.allclose(io.output, expected, atol=1e-5)
+
+
+def test_mix_stage_matches_mixer():
+    data = noise(10000, 2)
+    source = noise(3000, 1, seed=1)[:, 0]
+    io = SimulatedIO(data)
+    ProcessingStream([MixStage(source, rate=6000, gain=0.5)], rate=8000, block_size=256, channels=2).run(io)
+    mixer = Mixer(8000, block_size=256, length='longest')
+    mixer.add_source(data)
+    mixer.add_source(source, rate=6000, gain=0.5)
+    assert np.allclose(io.output, mixer.mix(), atol=1e-6)
+
+
+def test_stream_ends_with_its_input():
+    data = noise(1000, 1)
+    io = SimulatedIO(data)
+    stats = ProcessingStream([Gain(2)], rate=8000, block_size=256).run(io)
+    # The last callback gets the 232 frames that are left
+    assert stats.blocks == 4 and stats.frames == 1000
+    assert np.allclose(io.output, 2 * data)
+    io = SimulatedIO(data)
+    stats = ProcessingStream([Gain(2)], rate=8000, block_size=256).run(io, duration=0.05)
+    assert stats.frames == 400 and len(io.output) == 400
+
+
+class Slow:
+    # Takes longer than a block period on every callback
+    def prepare(self, rate, block_size, channels):
+        self.period = block_size / rate
+
+    def process(self, block, out):
+        time.sleep(2 * self.period)
+        out[:] = block
+
+
+def test_late_callbacks_are_reported_as_underruns():
+    io = SimulatedIO(noise(8 * 64, 1), realtime=True)
+    stats = ProcessingStream([Slow()], rate=8000, block_size=64).run(io)
+    assert stats.late == 8
+    # Each late callback is flagged on the next one, as a device would
+    assert stats.underruns == 7
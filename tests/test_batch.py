@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+from scipy.io import wavfile
+
+from audio_analysis.batch import load_spec, run_batch
+
+
+def write_tone(path, frequency):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    t = np.arange(8000) / 8000
+    wavfile.write(path, 8000, (1000 * np.sin(2 * np.pi * frequency * t)).astype(np.int16))
+
+
+def test_same_name_in_different_directories(tmp_path):
+    write_tone(tmp_path / 'in' / 'a' / 'x.wav', 440)
+    write_tone(tmp_path / 'in' / 'b' / 'x.wav', 880)
+    spec = load_spec(reverse=True, outputs=['wav'])
+    inputs = [tmp_path / 'in' / 'a' / 'x.wav', tmp_path / 'in' / 'b' / 'x.wav']
+    records = run_batch(inputs, tmp_path / 'out', spec, workers=1)
+    assert [record['status'] for record in records] == ['done', 'done']
+    for name in ('a', 'b'):
+        _, source = wavfile.read(tmp_path / 'in' / name / 'x.wav')
+        _, reversed_data = wavfile.read(tmp_path / 'out' / name / 'x_reversed.wav')
+        assert np.array_equal(reversed_data, source[::-1])
+    records = run_batch(inputs, tmp_path / 'out', spec, workers=1)
+    assert [record['status'] for record in records] == ['skipped', 'skipped']
+
+
+def test_changed_source_is_processed_again(tmp_path):
+    write_tone(tmp_path / 'x.wav', 440)
+    spec = load_spec(reverse=True, outputs=['wav'])
+    assert run_batch([tmp_path / 'x.wav'], tmp_path / 'out', spec, workers=1)[0]['status'] == 'done'
+    write_tone(tmp_path / 'x.wav', 880)
+    assert run_batch([tmp_path / 'x.wav'], tmp_path / 'out', spec, workers=1)[0]['status'] == 'done'
+    _, reversed_data = wavfile.read(tmp_path / 'out' / 'x_reversed.wav')
+    _, source = wavfile.read(tmp_path / 'x.wav')
+    assert np.array_equal(reversed_data, source[::-1])
+    assert run_batch([tmp_path / 'x.wav'], tmp_path / 'out', spec, workers=1)[0]['status'] == 'skipped'
+
+
+class CrashWorker:
+    # Unpickling it in a worker process kills the worker, which breaks the pool
+    def __reduce__(self):
+        return os._exit, (1,)
+
+
+def test_dead_worker_fails_files_without_stopping_the_batch(tmp_path):
+    inputs = [tmp_path / f'{name}.wav' for name in 'abc']
+    for path in inputs:
+        write_tone(path, 440)
+    spec = load_spec(reverse=True, outputs=['wav'])
+    records = run_batch(inputs, tmp_path / 'out', spec, workers=1, max_in_flight=1, cache=CrashWorker())
+    assert [record['file'] for record in records] == [str(path) for path in inputs]
+    assert all(record['status'] == 'failed' and 'BrokenProcessPool' in record['error'] for record in records)
+
+
+def test_plots_use_the_output_resolution(tmp_path):
+    from PIL import Image
+
+    write_tone(tmp_path / 'x.wav', 440)
+    spec = load_spec(band_freqs=[1000], band_widths=[50], outputs=['wav', 'plots'])
+    assert run_batch([tmp_path / 'x.wav'], tmp_path / 'out', spec, workers=1)[0]['status'] == 'done'
+    low = Image.open(tmp_path / 'out' / 'x_clean_spectogram.png').size[0]
+    spec = load_spec(spec, plot_dpi=300)
+    run_batch([tmp_path / 'x.wav'], tmp_path / 'out', spec, workers=1)
+    assert Image.open(tmp_path / 'out' / 'x_clean_spectogram.png').size[0] > 2.5 * low
+
+
+def test_features_of_wide_sources_are_relative_to_their_full_scale(tmp_path):
+    t = np.arange(8000) / 8000
+    wavfile.write(tmp_path / 'x.wav', 8000, (2 ** 30 * np.sin(2 * np.pi * 440 * t)).astype(np.int32))
+    spec = load_spec(band_freqs=[1000], band_widths=[50], outputs=['features'])
+    assert run_batch([tmp_path / 'x.wav'], tmp_path / 'out', spec, workers=1)[0]['status'] == 'done'
+    features = np.load(tmp_path / 'out' / 'x_clean_features.npz')
+    # A half-scale tone peaks at 0.5, whatever the width of its samples
+    assert np.allclose(features['peak'], 0.5, atol=0.01)
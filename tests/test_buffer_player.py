@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from PyQt5.QtCore import QIODevice
+from scipy.io import wavfile
+
+# QtMultimedia needs the system's audio libraries
+pytest.importorskip('PyQt5.QtMultimedia', exc_type=ImportError)
+
+from audio_analysis_gui.buffer_player import ArrayDevice  # noqa: E402
+
+
+def test_device_reads_the_samples_a_wav_file_would_hold(tmp_path):
+    samples = (3000 * np.random.default_rng(0).standard_normal((5001, 2))).astype(np.int16)
+    # The GUI used to write each track to a WAV file and play that
+    wavfile.write(tmp_path / 'track.wav', 8000, samples)
+    with open(tmp_path / 'track.wav', 'rb') as file:
+        file_bytes = file.read()[-samples.nbytes:]
+    device = ArrayDevice(samples)
+    assert device.open(QIODevice.ReadOnly)
+    assert device.size() == device.bytesAvailable() == samples.nbytes
+    chunks = []
+    while not device.atEnd():
+        chunks.append(bytes(device.read(4096)))
+    assert b''.join(chunks) == file_bytes and device.bytesAvailable() == 0
+    assert device.seek(8) and bytes(device.read(4)) == file_bytes[8:12]
+    assert device.bytesAvailable() == samples.nbytes - 12
+
+
+def test_device_shares_the_samples():
+    samples = np.arange(100, dtype=np.int16)
+    assert np.shares_memory(ArrayDevice(samples).samples, samples)
@@ -0,0 +1,21 @@
+import numpy as np
+
+from audio_analysis.cache import AnalysisCache
+
+
+def test_size_is_counted_without_scanning(tmp_path, monkeypatch):
+    cache = AnalysisCache(tmp_path, max_bytes=10 * 8192)
+    scans = []
+    entries = AnalysisCache._entries
+    monkeypatch.setattr(AnalysisCache, '_entries', lambda self: scans.append(1) or entries(self))
+    for index in range(8):
+        cache.put(f'entry{index}', np.zeros(1000))
+    cache.put('entry0', np.zeros(2000))
+    # Only the first write counts the directory; the others update the running count
+    assert len(scans) == 1
+    assert int((tmp_path / '.size').read_text()) == cache.size()
+    for index in range(8, 16):
+        cache.put(f'entry{index}', np.zeros(1000))
+    assert cache.size() <= cache.max_bytes
+    assert int((tmp_path / '.size').read_text()) == cache.size()
+    assert cache.get('entry15') is not None
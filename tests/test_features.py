@@ -0,0 +1,24 @@
+import numpy as np
+
+from audio_analysis.features import FeatureExtractor
+
+
+def test_narrow_band_measures_tone_at_its_centre():
+    # 14 Hz bands are narrower than the 21.5 Hz bins of 2048-sample frames at 44.1 kHz
+    rate = 44100
+    time = np.arange(rate) / rate
+    data = (10000 * np.sin(2 * np.pi * 1000 * time)).astype(np.int16)
+    extractor = FeatureExtractor(features=['bands'], band_freqs=[1000, 5000], band_widths=[14, 14])
+    table = extractor.extract(data, rate)
+    assert np.all(table['band_1000'] > 0.01)
+    assert np.all(table['band_1000'] > 1000 * table['band_5000'])
+
+
+def test_frame_spectra_leave_the_analysis_grid_cache_alone():
+    from audio_analysis.analysis import frequency_grid
+
+    frequency_grid.cache_clear()
+    grid = frequency_grid(44100, 44100)
+    FeatureExtractor().extract(np.ones(8192, dtype=np.int16), 44100)
+    assert frequency_grid.cache_info().currsize == 1
+    assert frequency_grid(44100, 44100) is grid
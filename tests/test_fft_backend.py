@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from audio_analysis.analysis import AudioAnalysis, amp_to_data
+from audio_analysis.fft_backend import fft_length, fft_options, get_fft_options, irfft, rfft
+
+
+def test_transforms_match_numpy_in_both_precisions():
+    rng = np.random.default_rng(0)
+    data = (1000 * rng.standard_normal((8011, 2))).astype(np.int16)
+    expected = np.fft.rfft(data, axis=0)
+    with fft_options(workers=2):
+        double = rfft(data, axis=0)
+        single = rfft(data, axis=0, precision='single')
+    assert double.dtype == np.complex128 and single.dtype == np.complex64
+    assert np.allclose(double, expected)
+    assert np.allclose(single, expected, atol=1e-5 * np.abs(expected).max())
+    # Odd lengths need the transform length to come back whole
+    assert np.allclose(irfft(double, n=len(data), axis=0), data)
+    assert irfft(single, n=len(data), axis=0).dtype == np.float32
+
+
+def test_options_are_restored():
+    before = get_fft_options()
+    with fft_options(pad=True, real_dtype='single'):
+        assert get_fft_options()['real_dtype'] is np.float32
+    assert get_fft_options() == before
+    with pytest.raises(ValueError):
+        with fft_options(threads=2):
+            pass
+
+
+def test_padded_spectrum_filters_without_changing_the_length():
+    rng = np.random.default_rng(1)
+    data = rng.standard_normal(8011)
+    with fft_options(pad=True):
+        audio = AudioAnalysis(audio_data={'rate': 8000, 'data': data})
+        assert audio.n_fft == fft_length(8011) == 8100
+        assert len(audio.frequency) == len(audio.amplitude) == 8100 // 2 + 1
+        # An empty stop band leaves the signal as it was
+        filtered = audio.multi_band_stop_filter([100000], [1])[1]
+        assert len(filtered) == 8011 and np.allclose(filtered, data)
+        assert np.allclose(amp_to_data(audio.amplitude, length=8011), data)
@@ -0,0 +1,74 @@
+import numpy as np
+from scipy.fft import irfft, rfft, rfftfreq
+from scipy.io import wavfile
+
+from audio_analysis.analysis import AudioAnalysis
+from audio_analysis_gui.workers import CUTOFF_FREQ, ProcessingJob, TrackJob, to_pcm16
+
+
+def record(job):
+    # Collect the signals of a job run on the calling thread
+    emitted = []
+    for name in ('progress', 'loaded', 'spectrogram_ready', 'pyramid_ready', 'track_ready', 'failed', 'finished'):
+        getattr(job.signals, name).connect(lambda *args, name=name: emitted.append((name,) + args))
+    return emitted
+
+
+def write_noise(path, frames=20000, rate=8000):
+    data = (3000 * np.random.default_rng(0).standard_normal(frames)).astype(np.int16)
+    wavfile.write(path, rate, data)
+    return data
+
+
+def test_processing_job_reports_the_file_and_its_overview(tmp_path):
+    data = write_noise(tmp_path / 'in.wav')
+    job = ProcessingJob(7, str(tmp_path / 'in.wav'))
+    emitted = record(job)
+    job.run()
+    names = [signal[0] for signal in emitted]
+    assert names[-1] == 'finished' and 'failed' not in names
+    assert all(signal[1] == 7 for signal in emitted)
+    loaded = emitted[names.index('loaded')]
+    assert np.array_equal(loaded[3], data)
+    assert 'pyramid_ready' in names or 'spectrogram_ready' in names
+    assert emitted[names.index('finished') - 1][2] == 100
+
+
+def test_cancelled_job_emits_nothing_further(tmp_path):
+    write_noise(tmp_path / 'in.wav')
+    job = ProcessingJob(1, str(tmp_path / 'in.wav'))
+    emitted = record(job)
+    job.cancel()
+    job.run()
+    assert emitted == []
+
+
+def test_failed_job_reports_the_error(tmp_path):
+    job = ProcessingJob(2, str(tmp_path / 'missing.wav'))
+    emitted = record(job)
+    job.run()
+    assert [signal[0] for signal in emitted] == ['progress', 'failed']
+    assert 'missing.wav' in emitted[-1][2]
+
+
+def test_tracks_match_the_files_the_gui_used_to_write(tmp_path):
+    data = write_noise(tmp_path / 'in.wav')
+    audio = AudioAnalysis(path=tmp_path / 'in.wav')
+    tracks = {}
+    for name in ('filtered', 'speed', 'reversed'):
+        job = TrackJob(3, name, audio)
+        job.signals.track_ready.connect(lambda job_id, name, samples: tracks.update({name: samples}))
+        job.run()
+    assert all(samples.dtype == np.int16 for samples in tracks.values())
+    assert np.array_equal(tracks['reversed'], data[::-1])
+    # The samples go through float32 on their way to 16 bits, which can move them by one step
+    amplitude = rfft(data)
+    expected = irfft(np.where(rfftfreq(len(data), 1 / 8000) > CUTOFF_FREQ, 0, amplitude), len(data))
+    assert np.abs(tracks['filtered'] - expected).max() <= 1
+    assert len(tracks['speed']) == -(-len(data) * 2 // 3)
+
+
+def test_wide_samples_are_scaled_to_16_bits():
+    samples = np.array([-2 ** 31, -2 ** 16, 0, 2 ** 16, 2 ** 31 - 1], dtype=np.int32)
+    assert np.array_equal(to_pcm16(samples), [-32768, -1, 0, 1, 32767])
+    assert to_pcm16(samples.astype(float), np.int32).dtype == np.int16
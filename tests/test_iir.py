@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from scipy.io import wavfile
+from scipy.signal import sosfilt
+
+from audio_analysis.analysis import AudioAnalysis
+from audio_analysis.iir import SOSFilter, design_sos, sos_filter
+from audio_analysis.streaming import stream_filter
+
+
+def test_blocks_match_filtering_the_whole_signal():
+    data = np.random.default_rng(0).standard_normal((20001, 2))
+    sos = design_sos(8000, cutoff_freq=3000, band_freqs=[1000, 2000], band_widths=[50, 14])
+    expected = sosfilt(sos, data, axis=0)
+    audio_filter = SOSFilter(sos)
+    edges = [0, 1, 300, 301, 9999, 20001]
+    blocks = [audio_filter.process(data[start:stop]) for start, stop in zip(edges, edges[1:])]
+    assert np.allclose(np.concatenate(blocks), expected)
+    assert np.allclose(sos_filter(data, 8000, 3000, [1000, 2000], [50, 14], block_size=777), expected)
+    single = sos_filter(data, 8000, 3000, [1000, 2000], [50, 14], precision='single')
+    assert single.dtype == np.float32 and np.allclose(single, expected, atol=1e-4)
+
+
+def test_notches_remove_tones_as_the_spectral_mask_does():
+    rate = 8000
+    time = np.arange(4 * rate) / rate
+    data = 1000 * np.sin(2 * np.pi * 1000 * time) + 1000 * np.sin(2 * np.pi * 2500 * time)
+    audio = AudioAnalysis(audio_data={'rate': rate, 'data': data})
+    spectral = audio.multi_band_stop_filter([1000], [14])[1]
+    notched = audio.sos_filter(band_freqs=[1000], band_widths=[14])
+    kept = 1000 * np.sin(2 * np.pi * 2500 * time)
+    # Past the notch's settling time both leave the other tone nearly as it was
+    assert np.abs(spectral - kept).max() < 1
+    assert np.abs(notched[rate:] - kept[rate:]).max() < 10
+
+
+def test_stream_matches_filtering_in_memory(tmp_path):
+    data = (3000 * np.random.default_rng(1).standard_normal((30000, 2))).astype(np.int16)
+    wavfile.write(tmp_path / 'in.wav', 8000, data)
+    stream_filter(tmp_path / 'in.wav', tmp_path / 'out.wav', 1500, [1000], [50], block_size=4096, backend='iir')
+    _, streamed = wavfile.read(tmp_path / 'out.wav')
+    expected = sos_filter(data, 8000, 1500, [1000], [50])
+    assert np.abs(streamed - np.clip(np.rint(expected), -32768, 32767)).max() <= 1
+
+
+@pytest.mark.parametrize('options', [{'cutoff_freq': 4000}, {'band_freqs': [0], 'band_widths': [10]},
+                                     {'band_freqs': [1000], 'band_widths': [0]},
+                                     {'band_freqs': [1000], 'band_widths': []}])
+def test_designs_outside_the_band_are_rejected(options):
+    with pytest.raises(ValueError):
+        design_sos(8000, **options)
@@ -0,0 +1,67 @@
+import json
+import threading
+
+import numpy as np
+
+from audio_analysis.analysis import AudioAnalysis
+from audio_analysis.instrumentation import chrome_trace, recording, span, write_chrome_trace
+
+
+def test_recording_leaves_results_unchanged():
+    data = np.random.default_rng(0).standard_normal(8000)
+    expected = AudioAnalysis(audio_data={'rate': 8000, 'data': data}).multi_band_stop_filter([1000], [50])[1]
+    with recording() as recorder:
+        filtered = AudioAnalysis(audio_data={'rate': 8000, 'data': data}).multi_band_stop_filter([1000], [50])[1]
+    assert np.array_equal(filtered, expected)
+    names = [record['name'] for record in recorder.to_records()]
+    assert names == ['rfft', 'mask', 'irfft']
+    mask = recorder.to_records()[1]
+    assert mask['attrs']['kind'] == 'band_stop' and mask['attrs']['amplitude']['nbytes'] == 4001 * 16
+    # Nothing is recorded once the block is left
+    with span('outside') as outside:
+        outside.arrays(data=data)
+    assert len(recorder.records) == 3
+
+
+def other_stage():
+    with span('other'):
+        pass
+
+
+def test_spans_nest_per_thread():
+    with recording() as recorder:
+        with span('outer'):
+            with span('inner'):
+                thread = threading.Thread(target=other_stage)
+                thread.start()
+                thread.join()
+    records = {record['name']: record for record in recorder.to_records()}
+    assert records['inner']['parent'] == records['outer']['id'] and records['inner']['depth'] == 1
+    assert records['other']['parent'] is None and records['other']['depth'] == 0
+    assert records['outer']['seconds'] >= records['inner']['seconds']
+
+
+def test_peak_memory_includes_the_peaks_of_nested_spans():
+    with recording(memory=True) as recorder:
+        with span('outer'):
+            with span('inner'):
+                block = np.ones(1 << 20)
+                del block
+    records = {record['name']: record for record in recorder.to_records()}
+    assert records['inner']['peak_bytes'] >= 8 << 20 and records['outer']['peak_bytes'] >= 8 << 20
+    assert records['inner']['allocated_bytes'] < 1 << 20
+
+
+def test_chrome_trace_has_one_event_per_span(tmp_path):
+    with recording() as recorder:
+        with span('outer', frames=10):
+            with span('inner'):
+                pass
+    write_chrome_trace(recorder.to_records(), tmp_path / 'trace.json')
+    with open(tmp_path / 'trace.json') as trace_file:
+        trace = json.load(trace_file)
+    assert trace == chrome_trace(recorder.to_records())
+    events = trace['traceEvents']
+    assert [event['name'] for event in events] == ['outer', 'inner']
+    assert events[0]['ts'] == 0 and events[0]['args'] == {'frames': 10}
+    assert events[0]['dur'] >= events[1]['dur'] and all(event['ph'] == 'X' for event in events)
@@ -0,0 +1,25 @@
+import numpy as np
+from scipy.io import wavfile
+
+from audio_analysis.analysis import mix_voices
+from audio_analysis.mixer import Mixer
+
+
+def test_mix_voices_mixes_channels():
+    rng = np.random.default_rng(0)
+    first = (1000 * rng.standard_normal((44100, 2))).astype(np.int16)
+    second = (1000 * rng.standard_normal((44100, 2))).astype(np.int16)
+    rate, mixed = mix_voices([first, second], [44100, 44100])
+    assert rate == 44100
+    assert np.allclose(mixed, (first.astype(np.float32) + second) / 2, atol=1e-3)
+
+
+def test_mixer_adds_mono_source_to_every_channel(tmp_path):
+    stereo = np.ones((1000, 2), dtype=np.float32)
+    wavfile.write(tmp_path / 'mono.wav', 8000, np.full(800, 2, dtype=np.int16))
+    mixer = Mixer(8000, block_size=256)
+    mixer.add_source(stereo)
+    mixer.add_source(str(tmp_path / 'mono.wav'))
+    mixed = mixer.mix()
+    assert mixed.shape == (800, 2)
+    assert np.all(mixed == 3)
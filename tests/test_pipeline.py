@@ -0,0 +1,67 @@
+import numpy as np
+
+from audio_analysis.analysis import AudioAnalysis, get_filter_bank
+from audio_analysis.fft_backend import fft_options
+from audio_analysis.pipeline import Pipeline
+
+
+def make_audio(length=8000, channels=None):
+    rng = np.random.default_rng(0)
+    shape = (length,) if channels is None else (length, channels)
+    return AudioAnalysis(audio_data={'rate': 8000, 'data': rng.standard_normal(shape)})
+
+
+def test_reverse_spectrum_comes_from_the_source_spectrum():
+    pipeline = Pipeline(make_audio())
+    source = pipeline.source
+    reverse = source.reverse()
+    pipeline.output('c', source, 'data')
+    pipeline.output('r', reverse, 'amplitude')
+    pipeline.output('f', source.band_stop([1000], [50]), 'data')
+    pipeline.output('rr', reverse.band_stop([1000], [50]), 'data')
+    # rfft of the source, irfft of each filtered branch
+    assert pipeline.transform_count() == 3
+    assert 'reverse_spectrum' in [action for action, _, _ in pipeline.plan()]
+
+
+def test_fused_masks_match_eager_filters():
+    audio = make_audio(channels=2)
+    pipeline = Pipeline(audio)
+    filtered = pipeline.source.low_pass(3000).band_stop([1000, 2000], [50, 50])
+    pipeline.output('filtered', filtered, 'data', 'amplitude')
+    assert pipeline.transform_count() == 2
+    results = pipeline.run()['filtered']
+
+    amplitude = get_filter_bank([1000, 2000], [50, 50]).apply(audio.low_pass_filter(3000).copy(), audio.n_fft,
+                                                              audio.rate)
+    assert np.allclose(results['amplitude'], amplitude)
+    assert np.allclose(results['data'], audio.amp_to_data(amplitude))
+
+
+def test_padded_pipeline_matches_eager_filters():
+    with fft_options(pad=True):
+        audio = make_audio(8011)
+        assert audio.n_fft != len(audio.data)
+        pipeline = Pipeline(audio)
+        filtered = pipeline.source.band_stop([1000], [50])
+        pipeline.output('filtered', filtered, 'data')
+        pipeline.output('reversed', filtered.reverse(), 'data', 'magnitude')
+        results = pipeline.run()
+        _, data = audio.multi_band_stop_filter([1000], [50])
+        reversed_audio = AudioAnalysis(audio_data={'rate': audio.rate, 'data': data[::-1]})
+        assert np.allclose(results['filtered']['data'], data)
+        assert np.allclose(results['reversed']['data'], data[::-1])
+        assert np.allclose(results['reversed']['magnitude'], reversed_audio.magnitude)
+
+
+def test_reverse_spectrum_matches_transform_of_reversed_data():
+    audio = make_audio(channels=2)
+    pipeline = Pipeline(audio)
+    reverse = pipeline.source.reverse()
+    pipeline.output('source', pipeline.source, 'amplitude')
+    pipeline.output('reversed', reverse, 'amplitude', 'magnitude')
+    assert pipeline.transform_count() == 1
+    results = pipeline.run()['reversed']
+    data, magnitude = audio.reverse_voice()
+    assert np.allclose(results['amplitude'], AudioAnalysis(audio_data={'rate': audio.rate, 'data': data}).amplitude)
+    assert np.allclose(results['magnitude'], magnitude)
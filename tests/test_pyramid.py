@@ -0,0 +1,61 @@
+import os
+
+import numpy as np
+from scipy.io import wavfile
+
+from audio_analysis.pyramid import Pyramid
+from audio_analysis.stft import spectrogram
+
+
+def write_noise(path, frames=50001, rate=8000, seed=0):
+    data = (3000 * np.random.default_rng(seed).standard_normal((frames, 2))).astype(np.int16)
+    wavfile.write(path, rate, data)
+    return data
+
+
+def block_summary(data, block):
+    # Summary of every block computed from all of its samples at once
+    blocks = [data[start:start + block].astype(np.float64) for start in range(0, len(data), block)]
+    return (np.array([values.min(axis=0) for values in blocks]), np.array([values.max(axis=0) for values in blocks]),
+            np.array([np.sqrt(np.mean(values ** 2, axis=0)) for values in blocks]))
+
+
+def test_waveform_levels_match_summaries_of_the_samples(tmp_path):
+    data = write_noise(tmp_path / 'in.wav')
+    # A chunk that is not a multiple of the level sizes builds every level in several steps
+    pyramid = Pyramid.build(tmp_path / 'in.wav', block=64, chunk=3000)
+    for pixels in (700, 100, 3):
+        view = pyramid.waveform(pixels=pixels)
+        lows, highs, rms = block_summary(data, view.block)
+        assert view.block >= 64 and len(view.lows) >= pixels
+        assert np.array_equal(view.lows, lows) and np.array_equal(view.highs, highs)
+        assert np.allclose(view.rms, rms, rtol=1e-5)
+        assert np.array_equal(view.times, np.arange(len(lows)) * view.block / 8000)
+    # Windows too short for the finest level are summarised from the samples
+    view = pyramid.waveform(1.0, 1.01, pixels=40)
+    assert view.block == 2 and np.array_equal(view.highs, block_summary(data[8000:8080], 2)[1])
+
+
+def test_spectrogram_levels_average_the_full_spectrogram(tmp_path):
+    data = write_noise(tmp_path / 'in.wav')
+    pyramid = Pyramid.build(tmp_path / 'in.wav', nfft=256, chunk=5000)
+    expected = spectrogram(data, 8000, nfft=256, hop=128)
+    finest = pyramid.spectrogram(pixels=10000)
+    assert np.allclose(finest.power, expected.power, rtol=1e-4)
+    assert np.allclose(finest.times, expected.times) and np.allclose(finest.freqs, expected.freqs)
+    coarse = pyramid.spectrogram(pixels=90)
+    columns = expected.power.shape[1]
+    step = -(-columns // coarse.power.shape[1])
+    averaged = np.stack([expected.power[:, start:start + step].mean(axis=1) for start in range(0, columns, step)], 1)
+    assert step == 4 and np.allclose(coarse.power, averaged, rtol=1e-4)
+
+
+def test_changed_source_is_built_again(tmp_path):
+    write_noise(tmp_path / 'in.wav')
+    Pyramid.build(tmp_path / 'in.wav')
+    assert Pyramid.open(tmp_path / 'in.wav') is not None
+    data = write_noise(tmp_path / 'in.wav', frames=20000, seed=1)
+    os.utime(tmp_path / 'in.wav', ns=(0, 0))
+    assert Pyramid.open(tmp_path / 'in.wav') is None
+    pyramid = Pyramid.load(tmp_path / 'in.wav')
+    assert pyramid.length == 20000 and np.array_equal(pyramid.waveform(pixels=1).highs.max(axis=0), data.max(axis=0))
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from scipy.io import wavfile
+from scipy.signal import resample_poly
+
+from audio_analysis.resample import PolyphaseResampler, change_speed, resample, speed_ratio, stream_change_speed
+
+
+def test_matches_scipy_resample_poly():
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((5000, 2))
+    assert speed_ratio(1.5) == (2, 3)
+    assert np.allclose(change_speed(data, 1.5), resample_poly(data, 2, 3, axis=0))
+    assert np.allclose(resample(data[:, 0], 6, 4), resample_poly(data[:, 0], 3, 2))
+
+
+def test_blocks_give_the_samples_of_the_whole_signal():
+    rng = np.random.default_rng(1)
+    data = rng.standard_normal((5001, 2))
+    for up, down in [(2, 3), (3, 2), (1, 4), (147, 160)]:
+        resampler = PolyphaseResampler(up, down)
+        edges = [0, 1, 7, 400, 401, 2999, 5001]
+        blocks = [resampler.process(data[start:stop]) for start, stop in zip(edges, edges[1:])]
+        assert np.allclose(np.concatenate(blocks + [resampler.flush()]), resample(data, up, down))
+
+
+def test_stream_matches_resampling_in_memory(tmp_path):
+    rng = np.random.default_rng(2)
+    data = (3000 * rng.standard_normal(20000)).astype(np.int16)
+    wavfile.write(tmp_path / 'in.wav', 8000, data)
+    stream_change_speed(tmp_path / 'in.wav', tmp_path / 'out.wav', 0.75, block_size=3000)
+    rate, streamed = wavfile.read(tmp_path / 'out.wav')
+    assert rate == 8000 and streamed.dtype == np.int16
+    assert np.abs(streamed - np.rint(change_speed(data, 0.75))).max() <= 1
+
+
+def test_fast_methods_match_index_picking():
+    data = np.arange(1000)
+    # The index rounding change_speed used before it resampled
+    indices = np.round(np.arange(0, len(data), 1.5)).astype(int)
+    assert np.array_equal(change_speed(data, 1.5, 'nearest'), data[indices[indices < len(data)]])
+    assert np.array_equal(change_speed(data, 2, 'decimate'), data[::2])
+    assert np.array_equal(change_speed(data, 0.5, 'decimate'), np.repeat(data, 2))
+    with pytest.raises(ValueError):
+        change_speed(data, 1.5, 'decimate')
+
+
+def test_speeding_up_does_not_alias_tones():
+    rate = 8000
+    tone = np.sin(2 * np.pi * 3300 * np.arange(rate) / rate)
+    # At 1.5x the tone lands above the Nyquist frequency, and index picking folds it back to 3050 Hz
+    levels = {method: np.abs(np.fft.rfft(change_speed(tone, 1.5, method)[500:-500])).max()
+              for method in ('polyphase', 'nearest')}
+    assert levels['polyphase'] < 0.01 * levels['nearest']
@@ -0,0 +1,123 @@
+import asyncio
+import json
+import os
+from functools import partial
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+from scipy.io import wavfile
+
+from audio_analysis.service import AnalysisService, SharedArray, _stack_sources, load_job, request
+
+BAD_JOBS = [
+    {'op': 'filter', 'path': 'in.wav', 'output': 'out', 'band_freqs': 5, 'band_widths': 5},
+    {'op': 'filter', 'path': 'in.wav', 'output': 'out', 'band_freqs': [None], 'band_widths': [14]},
+    {'op': 'filter', 'path': 'in.wav', 'output': 'out', 'cutoff_freq': [1000]},
+    {'op': 'filter', 'path': 'in.wav', 'output': 'out', 'outputs': 'wav'},
+    {'op': 'filter', 'path': 'in.wav', 'output': 'out', 'outputs': [['wav']]},
+    {'op': 'mix', 'paths': 'a.wav', 'output': 'out'},
+]
+
+
+@pytest.mark.parametrize('job', BAD_JOBS)
+def test_wrong_types_are_bad_requests(job):
+    with pytest.raises(ValueError):
+        load_job(job)
+    status, payload = asyncio.run(AnalysisService()._route('POST', '/jobs', json.dumps(job).encode()))
+    assert status == 400
+
+
+def test_job_defaults():
+    job = load_job({'op': 'filter', 'path': 'in.wav', 'output': 'out', 'band_freqs': [1000], 'band_widths': [14]})
+    assert job['band_freqs'] == [1000.0] and job['cutoff_freq'] is None and job['outputs'] == ['wav']
+
+
+def test_batched_filter_jobs_save_every_output(tmp_path):
+    rate = 8000
+    time = np.arange(rate) / rate
+    tones = {'a': 1000, 'b': 2000}
+    for name, frequency in tones.items():
+        wavfile.write(tmp_path / f'{name}.wav', rate, (10000 * np.sin(2 * np.pi * frequency * time)).astype(np.int16))
+
+    async def run():
+        service = await AnalysisService(workers=1, batch_window=0.5).start(port=0)
+        try:
+            return await asyncio.gather(*(
+                service.submit({'op': 'filter', 'path': str(tmp_path / f'{name}.wav'),
+                                'output': str(tmp_path / f'{name}_clean'), 'band_freqs': [frequency],
+                                'band_widths': [50]})
+                for name, frequency in tones.items()))
+        finally:
+            await service.close()
+
+    results = asyncio.run(run())
+    assert [(result['status'], result['batch_size']) for result in results] == [('done', 2), ('done', 2)]
+    for name in tones:
+        _, filtered = wavfile.read(tmp_path / f'{name}_clean.wav')
+        assert np.abs(filtered).max() <= 2
+
+
+def test_plot_dpi_must_be_positive():
+    with pytest.raises(ValueError):
+        load_job({'op': 'mix', 'paths': ['a.wav'], 'output': 'out', 'plot_dpi': 0})
+    assert load_job({'op': 'mix', 'paths': ['a.wav'], 'output': 'out', 'plot_dpi': 300})['plot_dpi'] == 300
+
+
+def test_unix_socket_is_removed_on_close(tmp_path):
+    path = str(tmp_path / 'service.sock')
+
+    async def run():
+        for _ in range(2):
+            service = await AnalysisService(workers=1).start(port=None, unix_socket=path)
+            try:
+                loop = asyncio.get_running_loop()
+                health = partial(request, 'GET', '/health', unix_socket=path)
+                assert await loop.run_in_executor(None, health) == (200, {'status': 'ok'})
+            finally:
+                await service.close()
+            assert not os.path.exists(path)
+
+    asyncio.run(run())
+
+
+class GoneWriter:
+    # Writer of a client that hung up before reading its response
+    closed = False
+
+    def write(self, data):
+        pass
+
+    async def drain(self):
+        raise ConnectionResetError
+
+    def close(self):
+        self.closed = True
+
+
+def test_client_hanging_up_does_not_fail_the_handler():
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b'GET /health HTTP/1.1\r\n\r\n')
+        reader.feed_eof()
+        writer = GoneWriter()
+        await AnalysisService()._handle(reader, writer)
+        return writer.closed
+
+    assert asyncio.run(run())
+
+
+def test_failed_stack_frees_its_block(monkeypatch):
+    blocks = []
+
+    class RecordedArray(SharedArray):
+        def __init__(self, *args, **kwargs) -> None:
+            super().__init__(*args, **kwargs)
+            blocks.append(self)
+
+    monkeypatch.setattr('audio_analysis.service.SharedArray', RecordedArray)
+    entries = [{'data': np.zeros(100, dtype=np.int16)}, {'data': np.zeros(99, dtype=np.int16)}]
+    with pytest.raises(ValueError):
+        _stack_sources(entries)
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=blocks[0]._memory.name)
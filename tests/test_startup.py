@@ -0,0 +1,29 @@
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.startup import ROOT, TARGETS, import_once
+
+SAVE_SCRIPT = """
+import sys
+import numpy as np
+from audio_analysis.analysis import AudioAnalysis, save_outputs
+audio = AudioAnalysis(audio_data={'rate': 8000, 'data': np.random.default_rng(0).standard_normal(8000)})
+save_outputs(audio.magnitude, audio.data, audio.frequency, audio.rate, sys.argv[1], dpi=50)
+print('matplotlib.pyplot' in sys.modules)
+"""
+
+
+@pytest.mark.parametrize('target', [name for name, target in TARGETS.items() if target['forbidden']])
+def test_core_modules_import_without_plotting(target):
+    modules = import_once(TARGETS[target]['module'])['modules']
+    assert not [module for module in TARGETS[target]['forbidden'] if module in modules]
+
+
+def test_saved_plots_do_not_load_pyplot(tmp_path):
+    output = subprocess.run([sys.executable, '-c', SAVE_SCRIPT, str(tmp_path / 'out')], cwd=ROOT, check=True,
+                            capture_output=True, text=True).stdout
+    assert output.split() == ['False']
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['out.wav', 'out_amplitude.png', 'out_data.png',
+                                                                'out_spectogram.png']
@@ -0,0 +1,30 @@
+import numpy as np
+from matplotlib import mlab
+
+from audio_analysis.stft import spectrogram
+
+
+def test_matches_specgram_in_chunks():
+    rng = np.random.default_rng(0)
+    data = (1000 * rng.standard_normal(50000) + 300).astype(np.int16)
+    spec = spectrogram(data, 8000, chunk_frames=37)
+    power, freqs, times = mlab.specgram(data.astype(float), NFFT=256, Fs=8000, noverlap=128, window=np.hanning(256))
+    assert np.allclose(spec.power, power, rtol=1e-10, atol=0)
+    assert np.allclose(spec.freqs, freqs) and np.allclose(spec.times, times)
+
+
+def test_channels_are_averaged_per_chunk():
+    rng = np.random.default_rng(0)
+    data = (1000 * rng.standard_normal((20000, 2))).astype(np.int16)
+    expected = spectrogram(data.astype(float).mean(axis=1), 8000).power
+    assert np.allclose(spectrogram(data, 8000, chunk_frames=50).power, expected)
+
+
+def test_matches_default_specgram_without_detrending():
+    # An offset signal: removing each frame's mean would change every low bin
+    rng = np.random.default_rng(1)
+    data = 0.5 + rng.standard_normal(30000)
+    spec = spectrogram(data, 2)
+    power, freqs, times = mlab.specgram(data)
+    assert np.allclose(spec.power, power, rtol=1e-10, atol=0)
+    assert np.allclose(spec.freqs, freqs) and np.allclose(spec.times, times)
@@ -0,0 +1,27 @@
+import numpy as np
+from scipy.io import wavfile
+
+from audio_analysis.resample import resample, stream_change_speed
+from audio_analysis.streaming import stream_multi_band_stop_filter
+
+
+def test_fir_notch_removes_tone_at_narrow_band_centre(tmp_path):
+    rate = 44100
+    time = np.arange(2 * rate) / rate
+    wavfile.write(tmp_path / 'tone.wav', rate, (10000 * np.sin(2 * np.pi * 1000 * time)).astype(np.int16))
+    stream_multi_band_stop_filter(tmp_path / 'tone.wav', tmp_path / 'out.wav', [1000, 5000, 7000], [14, 14, 14])
+    _, filtered = wavfile.read(tmp_path / 'out.wav')
+    assert np.abs(filtered[rate // 2:-rate // 2]).max() <= 2
+
+
+def test_streaming_keeps_channels(tmp_path):
+    rate = 8000
+    rng = np.random.default_rng(0)
+    data = (1000 * rng.standard_normal((3 * rate, 2))).astype(np.int16)
+    wavfile.write(tmp_path / 'stereo.wav', rate, data)
+    stream_multi_band_stop_filter(tmp_path / 'stereo.wav', tmp_path / 'fir.wav', [1000], [50], block_size=5000)
+    stream_change_speed(tmp_path / 'stereo.wav', tmp_path / 'fast.wav', 2, block_size=5000)
+    _, filtered = wavfile.read(tmp_path / 'fir.wav')
+    _, fast = wavfile.read(tmp_path / 'fast.wav')
+    assert filtered.shape == data.shape
+    assert np.array_equal(fast, np.clip(np.rint(resample(data, 1, 2)), -32768, 32767).astype(np.int16))
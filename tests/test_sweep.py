@@ -0,0 +1,40 @@
+import numpy as np
+
+from audio_analysis.analysis import AudioAnalysis
+
+CUTOFFS = [200, 1000, 1000.5, 3999]
+BAND_SETTINGS = [([1000], [14]), ([500, 2000], [50, 100]), ([], [])]
+
+
+def noise_analysis(precision=None):
+    data = np.random.default_rng(0).standard_normal((8001, 2))
+    return AudioAnalysis(audio_data={'rate': 8000, 'data': data}, precision=precision)
+
+
+def test_sweeps_match_filtering_each_point():
+    audio = noise_analysis()
+    low_pass = audio.sweep_low_pass(CUTOFFS)
+    assert low_pass.shape == (len(CUTOFFS), 8001, 2)
+    for data, cutoff in zip(low_pass, CUTOFFS):
+        assert np.allclose(data, audio.amp_to_data(audio.low_pass_filter(cutoff)))
+    band_stop = audio.sweep_band_stop(BAND_SETTINGS)
+    for data, (band_freqs, band_widths) in zip(band_stop, BAND_SETTINGS):
+        expected = audio.multi_band_stop_filter(band_freqs, band_widths)[1] if band_freqs else audio.data
+        assert np.allclose(data, expected)
+
+
+def test_chunked_and_lazy_sweeps_give_the_same_signals():
+    audio = noise_analysis()
+    expected = audio.sweep_low_pass(CUTOFFS, memory_budget=None)
+    # Room for about one point at a time
+    budget = 8001 * 2 * (16 + 8)
+    assert np.allclose(audio.sweep_low_pass(CUTOFFS, memory_budget=budget), expected)
+    lazy = audio.sweep_low_pass(CUTOFFS, memory_budget=budget, lazy=True)
+    assert not isinstance(lazy, np.ndarray)
+    assert np.allclose(np.stack(list(lazy)), expected)
+
+
+def test_single_precision_sweep():
+    double = noise_analysis().sweep_band_stop(BAND_SETTINGS)
+    single = noise_analysis('single').sweep_band_stop(BAND_SETTINGS)
+    assert single.dtype == np.float32 and np.allclose(single, double, atol=1e-5)
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from scipy.io import wavfile
+
+from audio_analysis.analysis import AudioAnalysis, write_voice
+from audio_analysis.wavio import WavWriter
+
+
+def test_rewrite_a_file_from_its_own_mapping(tmp_path):
+    path = tmp_path / 'voice.wav'
+    data = (np.arange(50000) % 2000 - 1000).astype(np.int16)
+    wavfile.write(path, 8000, data)
+    audio = AudioAnalysis(path=path)
+    write_voice(audio.data[::-1], audio.rate, path)
+    rate, written = wavfile.read(path)
+    assert rate == 8000 and np.array_equal(written, data[::-1])
+    assert [entry.name for entry in tmp_path.iterdir()] == ['voice.wav']
+
+
+def test_failed_write_leaves_target(tmp_path):
+    path = tmp_path / 'voice.wav'
+    wavfile.write(path, 8000, np.ones(100, dtype=np.int16))
+    with pytest.raises(ValueError):
+        with WavWriter(path, 8000) as writer:
+            writer.write(np.zeros(50))
+            writer.write(np.zeros((50, 2)))
+    assert np.array_equal(wavfile.read(path)[1], np.ones(100, dtype=np.int16))
+    assert [entry.name for entry in tmp_path.iterdir()] == ['voice.wav']
+
+
+def test_abandoned_writer_removes_its_temporary_file(tmp_path):
+    writer = WavWriter(tmp_path / 'voice.wav', 8000)
+    writer.write(np.zeros(100, dtype=np.int16))
+    del writer
+    assert list(tmp_path.iterdir()) == []
+    with WavWriter(tmp_path / 'voice.wav', 8000) as writer:
+        writer.write(np.zeros(100, dtype=np.int16))
+    del writer
+    assert [path.name for path in tmp_path.iterdir()] == ['voice.wav']